@@ -1,24 +1,52 @@
-import csv
-import io
-from flask import Blueprint, request, jsonify, make_response
+from flask import Blueprint, request, jsonify, make_response, current_app
 from services.input_services import (
     validate_batch_csv_file, 
+    validate_batch_zip_file,
     read_csv,
+    list_zip_pdfs,
+    iter_zip_pdf_texts,
     InvalidFileTypeError,
     FileTooLargeError,
     FileSaveError,
-    CSVReadError
+    CSVReadError,
+    ZipReadError
     )
-from services.analysis_services import batch_analysis
+from services.analysis_services import batch_analysis, batch_pdf_analysis
+from services.offline_batch_services import (
+    submit_offline_job,
+    get_offline_job,
+    get_job_store,
+    OfflineJobNotFoundError,
+)
+from services.bitable_batch_services import (
+    batch_bitable_analysis,
+    parse_bitable_url,
+    BitableReadError,
+    BitableTooManyRowsError,
+    BITABLE_BATCH_APP_TOKEN,
+    BITABLE_BATCH_TABLE_ID,
+    BITABLE_BATCH_VIEW_ID,
+    BITABLE_BATCH_RESULT_TABLE_ID,
+    BITABLE_BATCH_LINK_FIELD,
+)
+from services.client_services import dowei_client
+from services.output_services import write_batch_csv
+from services.tracing_services import trace_request
+from services.admission_services import admission_control, batch_admission
 from urllib.parse import quote
 import logging
+import os
+
+logger = logging.getLogger(__name__)
 
 batch_input_analysis_bp = Blueprint('batch_input_analysis', __name__, url_prefix='/api')
 
 @batch_input_analysis_bp.route('/llm/batch/input/analysis', methods=['POST'])
+@trace_request("llm_batch_input_analysis")
+@admission_control(batch_admission)
 def llm_batch_input_analysis():
     """
-    批量输入分析接口，接收CSV文件，进行批量分析。
+    批量输入分析接口，接收CSV文件（论文链接）或ZIP压缩包（PDF简历/论文），进行批量分析。
     """
     data = []
     result = {}
@@ -37,45 +65,21 @@ def llm_batch_input_analysis():
             "message": "好像没有上传文件呢，请重新选择一下吧~"
         }), 400
     
-    if file and file.filename:
-        try:
-            file_temp_path = validate_batch_csv_file(file)
-        except InvalidFileTypeError as e:
-            return jsonify({
-                "status": "fail", 
-                "message": str(e)
-            }), 400  
-        except FileTooLargeError as e:
-            return jsonify({
-                "status": "fail", 
-                "message": str(e)
-            }), 400
-        except FileSaveError as e:
-            return jsonify({
-                "status": "fail", 
-                "message": str(e)
-            }), 500
-        except Exception as e:
-            logging.error(f"文件处理错误: {str(e)}")
-            return jsonify({
-                "status": "fail", 
-                "message": "上传文件时出了点小问题，请重试或联系技术同学。"
-            }), 500
-        
-        try:
-            data = read_csv(file_temp_path)
-        except CSVReadError as e:
-            return jsonify({
-                "status": "fail",
-                "message": str(e)
-            }), 400
-        except Exception as e:
-            logging.error(f"批量分析失败: {str(e)}", exc_info=True)
-            return jsonify({
-                "status": "fail",
-                "message": "批量分析时出了点小问题，请重试或联系技术同学。"
-            }), 500
+    if file and file.filename and file.filename.lower().endswith('.zip'):
+        return llm_batch_zip_analysis(file)
+
+    data, error_response = read_uploaded_csv(file)
+    if error_response:
+        return error_response
         
+    # 单次批量的行数上限（行数过多时拆分后分批上传）
+    max_rows = current_app.config.get('MAX_BATCH_ROWS', 1000)
+    if len(data) > max_rows:
+        return jsonify({
+            "status": "fail",
+            "message": f"一次最多只能分析{max_rows}行哦，请拆分后分批上传~"
+        }), 413
+
     try:
         result = batch_analysis(data)
         # 检查分析结果是否有效
@@ -85,50 +89,271 @@ def llm_batch_input_analysis():
                 "message": "分析结果为空或格式不正确，请重试。"
             }), 500
         
-        # 准备CSV输出
-        output = io.StringIO()
-        output.write('\ufeff')
-        # 定义CSV表头
-        fieldnames = [
-            'index', 'link', 'score', 'summary', 
-            'tag_primary', 'contact_tag_primary',
-            'tag_secondary', 'contact_tag_secondary'
-        ]
-        
-        writer = csv.DictWriter(output, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # 写入分析结果
-        for idx, item in result.items():
-            # 确保每个条目都包含所有必要的字段
-            row = {
-                'index': idx,
-                'link': item.get('link', ''),
-                'score': item.get('score', ''),
-                'summary': item.get('summary', ''),
-                'tag_primary': item.get('tag_primary', ''),
-                'contact_tag_primary': item.get('contact_tag_primary', ''),
-                'tag_secondary': item.get('tag_secondary', ''),
-                'contact_tag_secondary': item.get('contact_tag_secondary', '')
-            }
-            writer.writerow(row)
-        
-        # 创建响应
-        response = make_response(output.getvalue())
-        
-        # 处理文件名
-        filename = "analysis_results.csv"
-        encoded_filename = quote(filename)
-
-        # 设置响应头，指定为CSV文件并提示下载
-        response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{encoded_filename}"
-        response.headers["Content-type"] = "text/csv; charset=utf-8"
-        
-        return response
+        return build_csv_response(result)
         
     except Exception as e:
-        logging.error(f"生成分析结果时出错: {str(e)}", exc_info=True)
+        logger.error(f"生成分析结果时出错: {str(e)}", exc_info=True)
         return jsonify({
             "status": "fail",
             "message": "生成分析结果时出了点小问题，请重试或联系技术同学。"
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+def read_uploaded_csv(file):
+    """
+    校验上传的CSV文件并读取第一列的论文链接
+    :return: (data, error_response)，失败时error_response为(jsonify结果, 状态码)
+    """
+    try:
+        file_temp_path = validate_batch_csv_file(file)
+    except InvalidFileTypeError as e:
+        return None, (jsonify({
+            "status": "fail", 
+            "message": str(e)
+        }), 400)
+    except FileTooLargeError as e:
+        return None, (jsonify({
+            "status": "fail", 
+            "message": str(e)
+        }), 400)
+    except FileSaveError as e:
+        return None, (jsonify({
+            "status": "fail", 
+            "message": str(e)
+        }), 500)
+    except Exception as e:
+        logger.error(f"文件处理错误: {str(e)}")
+        return None, (jsonify({
+            "status": "fail", 
+            "message": "上传文件时出了点小问题，请重试或联系技术同学。"
+        }), 500)
+    
+    try:
+        return read_csv(file_temp_path), None
+    except CSVReadError as e:
+        return None, (jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 400)
+    except Exception as e:
+        logger.error(f"批量分析失败: {str(e)}", exc_info=True)
+        return None, (jsonify({
+            "status": "fail",
+            "message": "批量分析时出了点小问题，请重试或联系技术同学。"
+        }), 500)
+
+
+def llm_batch_zip_analysis(file):
+    """
+    ZIP批量分析：逐个读取压缩包内的PDF并行解析后送入大模型，输出CSV（额外包含filename列）
+    """
+    try:
+        zip_temp_path = validate_batch_zip_file(file)
+    except (InvalidFileTypeError, FileTooLargeError) as e:
+        return jsonify({
+            "status": "fail", 
+            "message": str(e)
+        }), 400
+    except FileSaveError as e:
+        return jsonify({
+            "status": "fail", 
+            "message": str(e)
+        }), 500
+    except Exception as e:
+        logger.error(f"文件处理错误: {str(e)}")
+        return jsonify({
+            "status": "fail", 
+            "message": "上传文件时出了点小问题，请重试或联系技术同学。"
+        }), 500
+
+    try:
+        infos = list_zip_pdfs(zip_temp_path)
+        pdf_texts = iter_zip_pdf_texts(
+            zip_temp_path,
+            infos,
+            max_entry_mb=current_app.config.get('MAX_FILE_SIZE', 10),
+        )
+        result = batch_pdf_analysis(pdf_texts)
+        if not result or not isinstance(result, dict):
+            return jsonify({
+                "status": "fail",
+                "message": "分析结果为空或格式不正确，请重试。"
+            }), 500
+        return build_csv_response(result)
+    except ZipReadError as e:
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"ZIP批量分析失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": "批量分析时出了点小问题，请重试或联系技术同学。"
+        }), 500
+    finally:
+        if os.path.exists(zip_temp_path):
+            os.remove(zip_temp_path)
+
+
+@batch_input_analysis_bp.route('/llm/batch/offline/analysis', methods=['POST'])
+@trace_request("llm_batch_offline_analysis")
+def llm_batch_offline_analysis():
+    """
+    离线批量分析接口（适合上万行、不急于拿结果的任务）：接收CSV文件（论文链接），
+    提交到大模型的批量推理接口后立即返回任务编号，通过状态接口查询进度，完成后下载CSV
+    """
+    if 'batchContent' not in request.files:
+        return jsonify({
+            "status": "fail",
+            "message": "程序出错啦，请联系技术同学哟~"
+        }), 400
+
+    file = request.files['batchContent']
+    if not file.filename:
+        return jsonify({
+            "status": "fail",
+            "message": "好像没有上传文件呢，请重新选择一下吧~"
+        }), 400
+
+    data, error_response = read_uploaded_csv(file)
+    if error_response:
+        return error_response
+
+    max_rows = current_app.config.get('OFFLINE_MAX_BATCH_ROWS', 100000)
+    if len(data) > max_rows:
+        return jsonify({
+            "status": "fail",
+            "message": f"一次最多只能提交{max_rows}行哦，请拆分后分批上传~"
+        }), 413
+    if not data:
+        return jsonify({
+            "status": "fail",
+            "message": "文件里没有找到论文链接哦，请检查一下~"
+        }), 400
+
+    try:
+        job = submit_offline_job(data)
+        return jsonify({
+            "status": "success",
+            "message": "离线分析任务已提交，完成后即可下载结果~",
+            "data": {"job_id": job["job_id"], "status": job["status"], "counts": job["counts"]},
+        }), 202
+    except Exception as e:
+        logger.error(f"提交离线分析任务失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": "提交离线分析任务时出了点小问题，请重试或联系技术同学。"
+        }), 500
+
+
+@batch_input_analysis_bp.route('/llm/batch/offline/<job_id>', methods=['GET'])
+def llm_batch_offline_status(job_id):
+    """查询离线批量分析任务的状态（preparing/submitted/collecting/completed/failed）"""
+    try:
+        return jsonify({
+            "status": "success",
+            "message": "查询成功",
+            "data": get_offline_job(job_id),
+        }), 200
+    except OfflineJobNotFoundError as e:
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 404
+    except Exception as e:
+        logger.error(f"查询离线分析任务失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": "查询任务时出了点小问题，请稍后再试~"
+        }), 500
+
+
+@batch_input_analysis_bp.route('/llm/batch/offline/<job_id>/result', methods=['GET'])
+def llm_batch_offline_result(job_id):
+    """下载已完成的离线批量分析结果（CSV格式与在线批量分析一致）"""
+    try:
+        job = get_offline_job(job_id)
+    except OfflineJobNotFoundError as e:
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 404
+    if job["status"] != "completed":
+        return jsonify({
+            "status": "fail",
+            "message": job["message"] or "任务还没有完成哦，请稍后再来下载~",
+            "data": {"status": job["status"]},
+        }), 409
+
+    with open(get_job_store().result_path(job_id), "r", encoding="utf-8") as f:
+        response = make_response(f.read())
+    response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(f'analysis_results_{job_id[:8]}.csv')}"
+    response.headers["Content-type"] = "text/csv; charset=utf-8"
+    return response
+
+
+@batch_input_analysis_bp.route('/llm/batch/bitable/analysis', methods=['POST'])
+@trace_request("llm_batch_bitable_analysis")
+@admission_control(batch_admission)
+def llm_batch_bitable_analysis():
+    """
+    多维表格批量分析接口：直接从飞书多维表格的视图中分页读取候选人链接进行分析，结果分批写回多维表格
+    （回写到来源记录，或配置了result_table_id时写入单独的结果表），不需要导出/导入CSV。
+    参数（JSON或表单，均可省略而使用Config中的默认值）：url（多维表格链接）或 app_token/table_id/view_id，
+    以及 result_table_id、link_field
+    """
+    params = request.get_json(silent=True) or request.form.to_dict()
+    source = parse_bitable_url(params.get("url"))
+    app_token = params.get("app_token") or source["app_token"] or BITABLE_BATCH_APP_TOKEN
+    table_id = params.get("table_id") or source["table_id"] or BITABLE_BATCH_TABLE_ID
+    view_id = params.get("view_id") or source["view_id"] or BITABLE_BATCH_VIEW_ID
+    result_table_id = params.get("result_table_id") or BITABLE_BATCH_RESULT_TABLE_ID
+    link_field = params.get("link_field") or BITABLE_BATCH_LINK_FIELD
+
+    if not app_token or not table_id:
+        return jsonify({
+            "status": "fail",
+            "message": "没有识别出多维表格哦，请粘贴完整的多维表格链接（包含数据表）~"
+        }), 400
+
+    # 整个视图在一个请求内同步分析完，行数上限默认与CSV共用MAX_BATCH_ROWS（更大的表请用视图筛选后分批分析）
+    max_rows = current_app.config.get('MAX_BITABLE_BATCH_ROWS', current_app.config.get('MAX_BATCH_ROWS', 1000))
+    try:
+        stats = batch_bitable_analysis(dowei_client, app_token, table_id, view_id, result_table_id, link_field, max_rows)
+        if stats["write_failed"]:
+            return jsonify({
+                "status": "fail",
+                "message": f"有{stats['write_failed']}行结果没能写回多维表格，请重试或联系技术同学。",
+                "data": stats,
+            }), 502
+        return jsonify({
+            "status": "success",
+            "message": "批量分析完成，结果已写入多维表格~",
+            "data": stats,
+        }), 200
+    except (BitableReadError, BitableTooManyRowsError) as e:
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"多维表格批量分析失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": "批量分析时出了点小问题，请重试或联系技术同学。"
+        }), 500
+
+
+def build_csv_response(result: dict, filename: str = "analysis_results.csv"):
+    """将批量分析结果写成CSV并构造下载响应"""
+    response = make_response(write_batch_csv(result))
+    
+    # 处理文件名
+    encoded_filename = quote(filename)
+
+    # 设置响应头，指定为CSV文件并提示下载
+    response.headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{encoded_filename}"
+    response.headers["Content-type"] = "text/csv; charset=utf-8"
+    
+    return response
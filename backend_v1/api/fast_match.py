@@ -0,0 +1,116 @@
+from flask import Blueprint, request, jsonify, current_app
+from services.input_services import (
+    validate_resume_paper_pdf_file,
+    read_pdfs_parallel,
+    InvalidFileTypeError,
+    FileTooLargeError,
+    FileSaveError,
+    PDFReadError,
+)
+from services.embedding_services import top_k_jd_matches
+from services.client_services import embedding_client, dowei_client
+from services.text_services import compact_text
+from services.tracing_services import trace_request
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+fast_match_bp = Blueprint('fast_match', __name__, url_prefix='/api')
+
+
+@fast_match_bp.route('/embedding/fast/match', methods=['POST'])
+@trace_request("embedding_fast_match")
+def embedding_fast_match():
+    """
+    快速匹配接口：不调用大模型，直接用向量相似度为每份简历/论文返回最匹配的top-k岗位。
+    支持一次上传多个PDF（pdfContent可重复），每个文件视为一个候选人。
+    """
+    files = [file for file in request.files.getlist('pdfContent') if file and file.filename]
+    if not files:
+        return jsonify({
+            "status": "fail",
+            "message": "好像没有上传文件呢，请重新选择一下吧~"
+        }), 400
+
+    max_files = current_app.config.get('MAX_FAST_MATCH_FILES', 50)
+    if len(files) > max_files:
+        return jsonify({
+            "status": "fail",
+            "message": f"一次最多只能匹配{max_files}个文件哦~"
+        }), 400
+
+    try:
+        top_k = int(request.form.get('topK', 5))
+    except ValueError:
+        top_k = 5
+    top_k = max(1, min(top_k, 50))
+
+    # 1. 校验并保存所有文件
+    file_temp_paths = []
+    try:
+        for file in files:
+            file_temp_paths.append(validate_resume_paper_pdf_file(file))
+    except (InvalidFileTypeError, FileTooLargeError) as e:
+        for path in file_temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        return jsonify({
+            "status": "fail",
+            "message": f"{file.filename}：{str(e)}"
+        }), 400
+    except FileSaveError as e:
+        for path in file_temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        logger.error(str(e), exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": f"{str(e)}，请重试一下吧~ 若多次失败可以联系技术同学哦~"
+        }), 500
+    except Exception as e:
+        for path in file_temp_paths:
+            if os.path.exists(path):
+                os.remove(path)
+        logger.error(f"PDF上传失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 500
+
+    # 2. 并行解析PDF
+    try:
+        texts = read_pdfs_parallel(file_temp_paths)
+    except PDFReadError as e:
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 400
+    except Exception as e:
+        logger.error(f"PDF提取失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": "提取内容时出了点小问题，请重试~"
+        }), 500
+
+    # 3. 所有候选人组成一个查询矩阵，一次计算相似度
+    try:
+        token_budget = current_app.config.get('EMBEDDING_TOKEN_BUDGET', 4000)
+        texts = [compact_text(text, token_budget)[0] for text in texts]
+        matches = top_k_jd_matches(embedding_client, dowei_client, texts, k=top_k)
+    except Exception as e:
+        logger.error(f"向量匹配失败: {str(e)}", exc_info=True)
+        return jsonify({
+            "status": "fail",
+            "message": "匹配过程中发生错误，请稍后再试~"
+        }), 503
+
+    return jsonify({
+        "status": "success",
+        "message": "匹配成功！",
+        "data": [
+            {"filename": file.filename, "matches": match}
+            for file, match in zip(files, matches)
+        ],
+    }), 200
@@ -0,0 +1,11 @@
+from flask import Blueprint, Response
+from services.metrics_services import registry
+
+
+metrics_bp = Blueprint('metrics', __name__)
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus采集接口：输出各阶段耗时、大模型调用、队列长度和失败次数等指标"""
+    return Response(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,7 +1,7 @@
-from flask import Blueprint, request, jsonify, logging
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
 from services.input_services import (
     validate_resume_paper_pdf_file,
-    read_pdf,
+    read_pdfs_parallel,
     validate_paper_url,
     InvalidFileTypeError,  # Service层定义的自定义异常
     FileTooLargeError,
@@ -10,119 +10,177 @@ from services.input_services import (
     InvalidURLError,
     URLUnreachableError,
 )
-from services.analysis_services import analyze_candidate, LLMContentEmptyError, APIEmptyError
+from services.analysis_services import (
+    analyze_candidate,
+    stream_analyze_candidate,
+    LLMContentEmptyError,
+    APIEmptyError,
+)
 from services.output_services import clean_output
+from services.text_services import merge_texts_to_budget
+from services.feishu_services import ensure_feishu_docs
+from services.metrics_services import observe_future
+from services.stage_services import StageGroup
+from services.tracing_services import trace_request, current_span, get_request_id, use_span
+from services.admission_services import admission_control, single_admission
+from services.deadline_services import (
+    DeadlineExceeded,
+    with_request_deadline,
+    current_deadline,
+    use_deadline,
+    SINGLE_REQUEST_DEADLINE,
+)
 import logging
+import json
 import os
 
+logger = logging.getLogger(__name__)
+
 
 single_analysis_bp = Blueprint('resources', __name__, url_prefix='/api')
 
 
-@single_analysis_bp.route('/llm/single/cdd/analysis', methods=['POST'])
-def llm_cdd_analysis() -> tuple[dict,int]:
+def cleanup_temp_files(file_paths: list[str]) -> None:
+    """删除临时文件，避免残留"""
+    for path in file_paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def prepare_candidate_inputs():
     """
-    这是HR上传简历的接口函数，如果文件接收成功，会返回成功信息；若失败，则会返回错误类型。
+    校验并提取请求中的简历/论文PDF内容和论文链接（均支持多个）。
+    PDF解析、链接校验和获取prompt文档并发执行（任一阶段失败即取消其余阶段），最后在token预算内合并为一份材料。
+    :return: (pdf_content, url, compacted, error_response)；compacted表示多份材料已逐份压缩并合并，
+             校验失败时error_response为(jsonify结果, 状态码)
     """
-    # 初始化一些数据，防止为空
-    pdf_content = ""
-    url = ""
-    analysis_result = ""
-
     # 1. 检查前端代码是否有误
     if 'pdfContent' not in request.files or 'paperUrl' not in request.form:
-        return jsonify({
+        return None, None, False, (jsonify({
             "status": "fail",
             "message": "程序出错啦，请联系技术同学哟~"
-        }), 400 
-    
-    file = request.files.get('pdfContent', None)
-    url = request.form.get('paperUrl', '')
-    
+        }), 400)
+
+    files = [file for file in request.files.getlist('pdfContent') if file and file.filename]
+    # 一个输入框里可以用空格分隔多个链接
+    urls = [url for value in request.form.getlist('paperUrl') for url in value.split()]
+
     # 2. 检查是否真的选了文件（避免“空上传”）
-    if file.filename == '' and not url:
-        return jsonify({
+    if not files and not urls:
+        return None, None, False, (jsonify({
             "status": "fail",
             "message": "好像没有上传文件呢，请重新选择一下吧~"
-        }), 400
-    
+        }), 400)
+
+    max_files = current_app.config.get('MAX_CANDIDATE_FILES', 10)
+    if len(files) > max_files or len(urls) > max_files:
+        return None, None, False, (jsonify({
+            "status": "fail",
+            "message": f"一次最多只能上传{max_files}个文件或链接哦~"
+        }), 400)
 
-    # 3. 调用Service层进行文件的基础校验（包括文件类型、大小等）
-    if file and file.filename:
+    # 3. 调用Service层进行文件的基础校验（包括文件类型、大小等），保存为临时文件
+    file_temp_paths = []
+    for file in files:
         try:
-            file_temp_path = validate_resume_paper_pdf_file(file)
-        except InvalidFileTypeError:
-            return jsonify({
+            file_temp_paths.append(validate_resume_paper_pdf_file(file))
+        except InvalidFileTypeError as e:
+            cleanup_temp_files(file_temp_paths)
+            return None, None, False, (jsonify({
                 "status": "fail",
                 "message": str(e)
-            }), 400
+            }), 400)
         except FileTooLargeError as e:
-            return jsonify({
+            cleanup_temp_files(file_temp_paths)
+            return None, None, False, (jsonify({
                 "status": "fail",
                 "message": str(e)
-            }), 400
+            }), 400)
         except FileSaveError as e:
-            logging.error(str(e), exc_info=True)
-            return jsonify({
+            cleanup_temp_files(file_temp_paths)
+            logger.error(str(e), exc_info=True)
+            return None, None, False, (jsonify({
                 "status": "fail",
                 "message": f"{str(e)}，请重试一下吧~ 若多次失败可以联系技术同学哦~"
-            }), 500
+            }), 500)
         except Exception as e:
-            logging.error(f"PDF上传失败: {str(e)}", exc_info=True)
-            return jsonify({
-                "status": "fail",
-                "message": str(e)
-            }), 500
-    
-        # 4. 进行pdf文件的内容提取
-        try:
-            # 5. 调用read_pdf函数读取内容
-            pdf_content = read_pdf(file_temp_path)
-            # 6. 提取成功，保存内容并返回内容
-            os.remove(file_temp_path)  # 解析完就删，避免占用磁盘
-        except PDFReadError as e:
-            # 解析失败也删除临时文件，避免残留
-            if os.path.exists(file_temp_path):
-                os.remove(file_temp_path)
-            return jsonify({
+            cleanup_temp_files(file_temp_paths)
+            logger.error(f"PDF上传失败: {str(e)}", exc_info=True)
+            return None, None, False, (jsonify({
                 "status": "fail",
                 "message": str(e)
-            }), 400
-        except Exception as e:
-            if os.path.exists(file_temp_path):
-                os.remove(file_temp_path)
-            logging.error(f"PDF提取失败: {str(e)}", exc_info=True)
-            return jsonify({
-                "status": "fail",
-                "message": "提取内容时出了点小问题，请重试~"
-            }), 500
-        
-    if url:
-        # 7. 进行论文链接的校验
+            }), 500)
+
+    # 4. 并发执行：PDF解析（CPU）、论文链接校验（网络IO）、获取prompt文档（仅服务刚启动时需要），
+    #    任一阶段失败时立即取消其余阶段并返回
+    pdf_texts = []
+    with StageGroup() as group:
+        if file_temp_paths:
+            group.submit("pdf_parse", read_pdfs_parallel, file_temp_paths)
+        for url in urls:
+            observe_future(group.submit("url_validation", validate_paper_url, url), "url_validation")
+        group.submit("prompt_docs", ensure_feishu_docs)
         try:
-            validate_paper_url(url)
-        except InvalidURLError as e:
-            return jsonify({
+            results = group.wait()
+            pdf_texts = results.get("pdf_parse", [[]])[0]
+            if not results["prompt_docs"][0]:
+                logger.warning("飞书文档尚未获取成功，本次分析使用空的评分标准")
+        except (PDFReadError, InvalidURLError, URLUnreachableError) as e:
+            return None, None, False, (jsonify({
                 "status": "fail",
                 "message": str(e)
-            }), 400
-        except URLUnreachableError as e:
-            return jsonify({
+            }), 400)
+        except DeadlineExceeded as e:
+            return None, None, False, (jsonify({
                 "status": "fail",
                 "message": str(e)
-            }), 400
+            }), 504)
         except Exception as e:
-            logging.error(f"论文链接验证失败: {str(e)}", exc_info=True)
-            return jsonify({
+            logger.error(f"{group.failed_stage}阶段失败: {str(e)}", exc_info=True)
+            message = "链接验证时出了点小问题，请重试~" if group.failed_stage == "url_validation" else "提取内容时出了点小问题，请重试~"
+            return None, None, False, (jsonify({
                 "status": "fail",
-                "message": "链接验证时出了点小问题，请重试~"
-            }), 500
+                "message": message
+            }), 500)
+        finally:
+            # 解析阶段被取消时不会自行删除临时文件
+            cleanup_temp_files(file_temp_paths)
+
+    # 5. 多份材料在token预算内合并为一份
+    pdf_content = ""
+    compacted = False
+    if len(pdf_texts) == 1:
+        pdf_content = pdf_texts[0]
+    elif pdf_texts:
+        pdf_content, token_stats = merge_texts_to_budget(
+            [(file.filename, text) for file, text in zip(files, pdf_texts)],
+            current_app.config.get('PROMPT_TOKEN_BUDGET', 12000),
+        )
+        logger.info(f"多份PDF合并完成: {token_stats}")
+        compacted = True
 
-    # 8. 进行分析
+    return pdf_content, " ".join(urls), compacted, None
+
+
+@single_analysis_bp.route('/llm/single/cdd/analysis', methods=['POST'])
+@trace_request("llm_cdd_analysis")
+@with_request_deadline(SINGLE_REQUEST_DEADLINE)
+@admission_control(single_admission)
+def llm_cdd_analysis() -> tuple[dict,int]:
+    """
+    这是HR上传简历的接口函数，如果文件接收成功，会返回成功信息；若失败，则会返回错误类型。
+    """
+    analysis_result = ""
+
+    pdf_content, url, compacted, error_response = prepare_candidate_inputs()
+    if error_response:
+        return error_response
+
+    # 6. 进行分析
     try:
-        analysis_result = analyze_candidate(pdf_content, url)
+        analysis_result = analyze_candidate(pdf_content, url, compacted)
         if not analysis_result:
-            raise LLMContentEmptyError("大模型返回的内容为空，请稍后再试~")
+            raise LLMContentEmptyError()
         #result = clean_output(analysis_result)  # 清理输出格式
         return jsonify({
             "status": "success",
@@ -130,20 +188,76 @@ def llm_cdd_analysis() -> tuple[dict,int]:
             "data": analysis_result,
         }), 200
     except LLMContentEmptyError as e:
-        logging.error(f"大模型分析失败: {str(e)}", exc_info=True)
+        logger.error(f"大模型分析失败: {str(e)}", exc_info=True)
         return jsonify({
             "status": "fail",
             "message": str(e)
         }), 500
     except APIEmptyError as e:
-        logging.error(f"API返回内容为空: {str(e)}", exc_info=True)
+        logger.error(f"API返回内容为空: {str(e)}", exc_info=True)
         return jsonify({
             "status": "fail",
             "message": str(e)
         }), 503
+    except DeadlineExceeded as e:
+        logger.error(f"分析超时，耗时预算在{e.stage}阶段用完")
+        return jsonify({
+            "status": "fail",
+            "message": str(e)
+        }), 504
     except Exception as e:
-        logging.error(f"大模型分析时发生错误: {str(e)}", exc_info=True)
+        logger.error(f"大模型分析时发生错误: {str(e)}", exc_info=True)
         return jsonify({
             "status": "fail",
             "message": "分析过程中发生错误，请稍后再试~"
-        }), 500
\ No newline at end of file
+        }), 500
+
+
+def sse_event(event: str, data) -> str:
+    """按Server-Sent Events格式编码一条事件"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@single_analysis_bp.route('/llm/single/cdd/analysis/stream', methods=['POST'])
+@trace_request("llm_cdd_analysis_stream")
+@with_request_deadline(SINGLE_REQUEST_DEADLINE)
+@admission_control(single_admission)
+def llm_cdd_analysis_stream():
+    """
+    流式版本的简历分析接口：输入校验与普通接口一致（校验失败直接返回JSON错误），
+    校验通过后以SSE推送 progress / delta（部分输出）/ result（最终JSON）/ error 事件。
+    """
+    pdf_content, url, compacted, error_response = prepare_candidate_inputs()
+    if error_response:
+        return error_response
+    # 生成器在接口函数返回后才执行，需要显式挂接到本次请求的trace下，并沿用本次请求的耗时预算
+    parent_span, request_id, deadline_at = current_span(), get_request_id(), current_deadline()
+
+    def generate():
+        yield sse_event("progress", {"message": "材料校验通过，开始进行分析..."})
+        first_token = True
+        try:
+            with use_span(parent_span, request_id), use_deadline(deadline_at):
+                for event, payload in stream_analyze_candidate(pdf_content, url, compacted):
+                    if event == "delta":
+                        if first_token:
+                            first_token = False
+                            yield sse_event("progress", {"message": "大模型正在生成评估结果..."})
+                        yield sse_event("delta", {"content": payload})
+                    else:
+                        yield sse_event("result", {
+                            "status": "success",
+                            "message": "简历分析成功！",
+                            "data": payload,
+                        })
+        except (LLMContentEmptyError, APIEmptyError, DeadlineExceeded) as e:
+            logger.error(f"大模型流式分析失败: {str(e)}", exc_info=True)
+            yield sse_event("error", {"status": "fail", "message": str(e)})
+        except Exception as e:
+            logger.error(f"大模型流式分析时发生错误: {str(e)}", exc_info=True)
+            yield sse_event("error", {"status": "fail", "message": "分析过程中发生错误，请稍后再试~"})
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # 关闭反向代理缓冲，保证逐条推送
+    return response
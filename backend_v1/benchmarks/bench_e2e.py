@@ -0,0 +1,338 @@
+"""
+端到端压测：所有外部依赖（大模型、向量、飞书）都指向本地模拟服务，测量关键路径的延迟和吞吐。
+
+场景：
+- single   单个候选人分析接口（上传一份PDF + 一个论文链接），统计p50/p95延迟
+- batch    1000行CSV的批量分析接口，统计总耗时和每秒处理行数
+- jd_sync  5000条岗位记录的向量同步（读取岗位介绍 -> 向量化 -> 回写 -> 重新加载岗位向量）
+- bitable  多维表格批量分析：从模拟的多维表格分页读取链接，结果分批回写（或写入单独的结果表）
+- offline  离线批量分析：提交CSV -> 轮询任务状态 -> 下载结果，大模型调用全部走模拟的批量推理接口
+
+每个场景在独立子进程中运行，峰值内存（RSS）互不影响。
+
+用法（在 backend_v1 目录下执行）：
+    python -m benchmarks.bench_e2e --scenario all
+    python -m benchmarks.bench_e2e --scenario batch --rows 1000 --llm-latency-ms 800 --error-rate 0.02
+    python -m benchmarks.bench_e2e --scenario batch --extra-llm-endpoints 1 --failing-llm-endpoints 1
+    python -m benchmarks.bench_e2e --scenario single --llm-slow-rate 0.03 --llm-slow-ms 8000 --hedge
+    python -m benchmarks.bench_e2e --scenario bitable --rows 2000 --bitable-result-table
+    python -m benchmarks.bench_e2e --scenario offline --rows 10000 --offline-chunk-rows 4000 --batch-latency-ms 3000
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.mock_servers import (
+    start_mock_server, build_state_from_args, add_mock_arguments, make_text_pdf, MockState, EndpointBehavior,
+)
+
+SCENARIOS = ("single", "batch", "jd_sync", "bitable", "offline")
+
+
+def install_mock_config(base_url: str, jd_table_id: str, overrides: dict = None) -> None:
+    """
+    在导入业务代码之前生成config模块（config.py不在版本库中，且压测不能使用线上配置），
+    所有外部服务地址都指向本地模拟服务
+    """
+    attrs = {
+        "API_KEY": "mock-key",
+        "APP_ID": "cli_mock",
+        "APP_SECRET": "mock-secret",
+        "BOT_ID": "bot-single",
+        "BATCH_BOT_ID": "bot-batch",
+        "PRE_SCORE_TOKEN": "doc_pre",
+        "PAPER_SCORE_TOKEN": "doc_paper",
+        "TAG_DOC_TOKEN": "doc_tag",
+        "CHUNK_APP_TOKEN": "app_mock",
+        "CHUNK_TABLE_ID": jd_table_id,
+        "CHUNK_VIEW_ID": "vew_mock",
+        "MAX_FILE_SIZE": 10,
+        "LLM_BASE_URL": f"{base_url}/api/v3/bots",
+        "EMBEDDING_BASE_URL": f"{base_url}/api/v3",
+        "FEISHU_DOMAIN": base_url,
+        "LARK_LOG_LEVEL": "ERROR",
+        "EMBEDDING_CACHE_PATH": ":memory:",
+        "PAPER_CACHE_PATH": ":memory:",
+    }
+    attrs.update(overrides or {})
+    # 写成真实的config.py：PDF解析进程池用forkserver启动子进程，子进程需要能重新导入config
+    config_dir = tempfile.mkdtemp(prefix="bench_config_")
+    with open(os.path.join(config_dir, "config.py"), "w", encoding="utf-8") as f:
+        f.write("class Config:\n")
+        for key, value in attrs.items():
+            f.write(f"    {key} = {value!r}\n")
+    sys.path.insert(0, config_dir)
+    sys.modules.pop("config", None)
+
+
+def start_extra_llm_endpoints(base_url: str, args) -> tuple[list, list[dict]]:
+    """
+    额外启动若干只提供对话接口的模拟服务（failing的错误率为100%），
+    返回 (服务列表, Config.LLM_ENDPOINTS配置)，用于测试多接入点的负载分摊和故障切换
+    """
+    servers = []
+    endpoints = [{"name": "primary", "base_url": f"{base_url}/api/v3/bots", "api_key": "mock-key", "max_retries": 0}]
+    for kind, count, error_rate in (("healthy", args.extra_llm_endpoints, args.error_rate), ("failing", args.failing_llm_endpoints, 1.0)):
+        for i in range(count):
+            behavior = EndpointBehavior(args.llm_latency_ms, args.llm_jitter_ms, error_rate, args.llm_rate_limit,
+                                        args.llm_slow_rate, args.llm_slow_ms)
+            server, _ = start_mock_server(0, MockState(jd_count=0, behaviors={"llm": behavior}))
+            servers.append(server)
+            endpoints.append({
+                "name": f"{kind}_{i + 1}",
+                "base_url": f"http://127.0.0.1:{server.server_address[1]}/api/v3/bots",
+                "api_key": "mock-key",
+                "max_retries": 0,
+            })
+    return servers, endpoints
+
+
+def peak_rss_mb() -> float:
+    """当前进程的峰值常驻内存（Linux下ru_maxrss单位为KB）"""
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage / 1024 if sys.platform != "darwin" else usage / 1024 / 1024
+
+
+def latency_summary(latencies: list[float]) -> dict:
+    values = np.array(latencies) * 1000
+    return {
+        "count": len(values),
+        "p50_ms": round(float(np.percentile(values, 50)), 1),
+        "p95_ms": round(float(np.percentile(values, 95)), 1),
+        "p99_ms": round(float(np.percentile(values, 99)), 1),
+        "max_ms": round(float(values.max()), 1),
+    }
+
+
+def scenario_single(app, base_url: str, args) -> dict:
+    from services.feishu_services import fetch_feishu_docs
+    fetch_feishu_docs()
+    client = app.test_client()
+    pdf = make_text_pdf([f"Candidate resume line {i}: research on large language models" for i in range(40)])
+
+    latencies = []
+    failures = 0
+    for i in range(args.requests):
+        start = time.perf_counter()
+        response = client.post(
+            "/api/llm/single/cdd/analysis",
+            data={"pdfContent": (io.BytesIO(pdf), "resume.pdf"), "paperUrl": f"{base_url}/paper/{i}"},
+            content_type="multipart/form-data",
+        )
+        latencies.append(time.perf_counter() - start)
+        failures += response.status_code != 200
+    return {**latency_summary(latencies), "failures": failures}
+
+
+def scenario_batch(app, base_url: str, args) -> dict:
+    from services.feishu_services import fetch_feishu_docs
+    fetch_feishu_docs()
+    client = app.test_client()
+    # --distinct-papers小于行数时多行引用同一篇论文（测试论文缓存）
+    papers = args.distinct_papers or args.rows
+    csv_body = "\n".join(f"{base_url}/paper/{i % papers}" for i in range(args.rows)).encode("utf-8")
+
+    start = time.perf_counter()
+    response = client.post(
+        "/api/llm/batch/input/analysis",
+        data={"batchContent": (io.BytesIO(csv_body), "links.csv")},
+        content_type="multipart/form-data",
+    )
+    elapsed = time.perf_counter() - start
+    rows = response.get_data(as_text=True).lstrip("﻿").splitlines()[1:]
+    failed_rows = sum("请人工处理" in row for row in rows)
+    tiers = {}
+    if args.cascade_bot_id:
+        for row in csv.DictReader(io.StringIO(response.get_data(as_text=True).lstrip("\ufeff"))):
+            tiers[row.get("tier", "")] = tiers.get(row.get("tier", ""), 0) + 1
+    return {
+        **({"tiers": tiers} if tiers else {}),
+        "status": response.status_code,
+        "rows": len(rows),
+        "failed_rows": failed_rows,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(len(rows) / elapsed, 1) if elapsed else 0,
+    }
+
+
+def scenario_jd_sync(app, base_url: str, args) -> dict:
+    from services.client_services import dowei_client, embedding_client
+    from services.embedding_services import feishu_dowei_embedding, refresh_jd_vectors, get_jd_vectors
+
+    start = time.perf_counter()
+    feishu_dowei_embedding(dowei_client, embedding_client)
+    embed_seconds = time.perf_counter() - start
+    refresh_jd_vectors(dowei_client)
+    total = time.perf_counter() - start
+    record_ids, _ = get_jd_vectors(dowei_client)
+    return {
+        "records": len(record_ids),
+        "embed_and_write_s": round(embed_seconds, 2),
+        "total_s": round(total, 2),
+        "records_per_s": round(len(record_ids) / total, 1) if total else 0,
+    }
+
+
+def scenario_bitable(app, base_url: str, args) -> dict:
+    from services.feishu_services import fetch_feishu_docs
+    fetch_feishu_docs()
+    client = app.test_client()
+    app.config["MAX_BITABLE_BATCH_ROWS"] = args.rows
+    params = {"url": f"https://mock.feishu.cn/base/app_candidates?table=tbl_candidates&view=vew_all"}
+    if args.bitable_result_table:
+        params["result_table_id"] = "tbl_results"
+
+    start = time.perf_counter()
+    response = client.post("/api/llm/batch/bitable/analysis", json=params)
+    elapsed = time.perf_counter() - start
+    stats = (response.get_json() or {}).get("data") or {}
+    return {
+        "status": response.status_code,
+        **stats,
+        "seconds": round(elapsed, 2),
+        "rows_per_s": round(stats.get("rows", 0) / elapsed, 1) if elapsed else 0,
+    }
+
+
+def scenario_offline(app, base_url: str, args) -> dict:
+    client = app.test_client()
+    papers = args.distinct_papers or args.rows
+    csv_body = "\n".join(f"{base_url}/paper/{i % papers}" for i in range(args.rows)).encode("utf-8")
+
+    start = time.perf_counter()
+    response = client.post(
+        "/api/llm/batch/offline/analysis",
+        data={"batchContent": (io.BytesIO(csv_body), "links.csv")},
+        content_type="multipart/form-data",
+    )
+    submit_seconds = time.perf_counter() - start
+    job_id = response.get_json()["data"]["job_id"]
+    status = {}
+    while time.perf_counter() - start < args.offline_timeout:
+        status = client.get(f"/api/llm/batch/offline/{job_id}").get_json()["data"]
+        if status["status"] in ("completed", "failed"):
+            break
+        time.sleep(0.2)
+    elapsed = time.perf_counter() - start
+    result = client.get(f"/api/llm/batch/offline/{job_id}/result")
+    rows = result.get_data(as_text=True).lstrip("\ufeff").splitlines()[1:]
+    return {
+        "status": status.get("status"),
+        "batches": len(status.get("batches", [])),
+        "rows": len(rows),
+        "failed_rows": sum("请人工处理" in row for row in rows),
+        "submit_s": round(submit_seconds, 2),
+        "seconds": round(elapsed, 2),
+    }
+
+
+def run_scenario(args) -> dict:
+    """在当前进程中启动模拟服务并运行一个场景"""
+    if args.scenario == "jd_sync":
+        args.jd_count = args.jd_records
+    state = build_state_from_args(args)
+    server, _ = start_mock_server(0, state)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    overrides = {"LLM_HEDGE_ENABLED": args.hedge, "LLM_HEDGE_BUDGET_RATIO": args.hedge_budget_ratio}
+    if args.cascade_bot_id:
+        overrides.update(CASCADE_ENABLED=True, CASCADE_BOT_ID=args.cascade_bot_id)
+    if args.deadline:
+        overrides.update(SINGLE_REQUEST_DEADLINE=args.deadline, BATCH_ROW_DEADLINE=args.deadline)
+    if args.scenario == "bitable":
+        # 候选人表：每条记录一个论文链接（超链接字段格式）
+        papers = args.distinct_papers or args.rows
+        state.tables["tbl_candidates"] = {
+            f"reccand{i:06d}": {"论文链接": {"link": f"{base_url}/paper/{i % papers}", "text": f"paper {i}"}}
+            for i in range(args.rows)
+        }
+    if args.scenario == "offline":
+        overrides.update(
+            OFFLINE_BATCH_BASE_URL=f"{base_url}/api/v3",
+            OFFLINE_BATCH_DIR=tempfile.mkdtemp(prefix="bench_offline_"),
+            OFFLINE_BATCH_POLL_INTERVAL=0.2,
+            OFFLINE_BATCH_MAX_REQUESTS=args.offline_chunk_rows,
+        )
+    extra_servers = []
+    if args.extra_llm_endpoints or args.failing_llm_endpoints:
+        extra_servers, overrides["LLM_ENDPOINTS"] = start_extra_llm_endpoints(base_url, args)
+    install_mock_config(base_url, args.jd_table_id, overrides)
+
+    from main import app
+    app.config["TESTING"] = True
+
+    runner = {"single": scenario_single, "batch": scenario_batch, "jd_sync": scenario_jd_sync,
+              "bitable": scenario_bitable, "offline": scenario_offline}[args.scenario]
+    result = runner(app, base_url, args)
+    if args.scenario == "bitable":
+        target = state.tables.get("tbl_results" if args.bitable_result_table else "tbl_candidates", {})
+        result["records_with_score"] = sum("评分" in fields for fields in target.values())
+        result["records_with_summary"] = sum("分析总结" in fields for fields in target.values())
+    result["peak_rss_mb"] = round(peak_rss_mb(), 1)
+    result["mock_requests"] = dict(state.request_counts)
+    if args.cascade_bot_id:
+        result["llm_requests_by_model"] = dict(state.model_counts)
+    if args.hedge:
+        from services.metrics_services import LLM_HEDGES
+        result["llm_hedges"] = {labels[1]: value for labels, value in LLM_HEDGES._values.items()}
+    from services.metrics_services import DEADLINE_EXCEEDED, PAPER_FETCHES
+    if DEADLINE_EXCEEDED._values:
+        result["deadline_exceeded"] = {labels[0]: value for labels, value in DEADLINE_EXCEEDED._values.items()}
+    if PAPER_FETCHES._values:
+        result["paper_fetches"] = {labels[0]: value for labels, value in PAPER_FETCHES._values.items()}
+    if extra_servers:
+        from services.metrics_services import LLM_FAILOVERS
+        result["extra_llm_requests"] = [sum(s.RequestHandlerClass.state.request_counts.values()) for s in extra_servers]
+        result["llm_failovers"] = sum(LLM_FAILOVERS._values.values())
+    for s in [server, *extra_servers]:
+        s.shutdown()
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="端到端压测（本地模拟服务）")
+    parser.add_argument("--scenario", choices=SCENARIOS + ("all",), default="all")
+    parser.add_argument("--requests", type=int, default=50, help="single场景的请求次数")
+    parser.add_argument("--rows", type=int, default=1000, help="batch场景的CSV行数")
+    parser.add_argument("--distinct-papers", type=int, default=0, help="batch场景中不同论文的数量，0为每行都不同")
+    parser.add_argument("--jd-records", type=int, default=5000, help="jd_sync场景的岗位记录数")
+    parser.add_argument("--extra-llm-endpoints", type=int, default=0, help="额外的正常大模型接入点数量")
+    parser.add_argument("--failing-llm-endpoints", type=int, default=0, help="额外的持续报错的大模型接入点数量")
+    parser.add_argument("--hedge", action="store_true", help="单个分析启用对冲请求")
+    parser.add_argument("--cascade-bot-id", default="", help="开启级联模式，用该bot做粗打分")
+    parser.add_argument("--deadline", type=float, default=0, help="单个请求/批量每行的耗时预算（秒），0为使用默认值")
+    parser.add_argument("--bitable-result-table", action="store_true", help="bitable场景把结果写入单独的结果表（batch_create）")
+    parser.add_argument("--offline-chunk-rows", type=int, default=50000, help="offline场景中单个批量推理文件的请求数上限")
+    parser.add_argument("--offline-timeout", type=float, default=600, help="offline场景等待任务完成的最长时间（秒）")
+    parser.add_argument("--hedge-budget-ratio", type=float, default=0.05, help="对冲请求数占主请求数的比例上限")
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    os.chdir(BACKEND_DIR)
+    if args.scenario != "all":
+        print(json.dumps({args.scenario: run_scenario(args)}, ensure_ascii=False))
+        sys.exit(0)
+
+    # 每个场景一个子进程，保证峰值内存互不影响（透传除--scenario以外的参数）
+    argv = sys.argv[1:]
+    if "--scenario" in argv:
+        position = argv.index("--scenario")
+        argv = argv[:position] + argv[position + 2:]
+    argv = [arg for arg in argv if not arg.startswith("--scenario=")]
+    for scenario in SCENARIOS:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_e2e", "--scenario", scenario, *argv],
+            capture_output=True, text=True, cwd=BACKEND_DIR,
+        )
+        lines = output.stdout.strip().splitlines()
+        print(lines[-1] if output.returncode == 0 and lines else f"{scenario} 失败:\n{output.stderr[-2000:]}")
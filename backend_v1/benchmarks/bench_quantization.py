@@ -0,0 +1,86 @@
+"""
+向量降维（MRL截断）与int8量化的精度/速度基准测试
+
+int8只减小存储/传输体积：内存中扫描时使用反量化后的float32副本（QuantizedMatrix.dot），
+耗时与float32相同，内存占用为int8与float32之和；表中分别列出存储大小、扫描时的内存占用和反量化的一次性耗时。
+
+默认使用合成数据；合成向量没有MRL的“前几维信息量最大”的性质，截断后的精度会明显偏低，
+评估真实效果请用 --vectors 传入从多维表格导出的向量（.npy，形状为 (N, 2048)）。
+
+用法（在 backend_v1 目录下执行）：
+    python -m benchmarks.bench_quantization --size 20000
+    python -m benchmarks.bench_quantization --vectors jd_vectors.npy --queries query_vectors.npy
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.quantize_services import QuantizedMatrix, truncate_mrl
+from benchmarks.bench_vector_index import make_clustered_vectors
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def overlap(truth: np.ndarray, approx: np.ndarray) -> float:
+    return float(np.mean([len(set(t) & set(a)) / len(t) for t, a in zip(truth, approx)]))
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, k: int, repeat: int = 5) -> None:
+    base = truncate_mrl(vectors)
+    query_base = truncate_mrl(queries)
+    truth = top_k_rows(query_base @ base.T, k)
+    full_bytes = base.nbytes
+
+    print(f"库向量 {base.shape}, 查询 {query_base.shape}, k={k}")
+    print(f"{'dim':>6} {'格式':>8} {'存储大小':>10} {'压缩比':>7} {'扫描内存':>10} {'反量化':>9} {'扫描耗时':>10} {'recall@k':>9}")
+    for dim in [d for d in (2048, 1024, 512, 256) if d <= base.shape[1]]:
+        reduced = truncate_mrl(base, dim)
+        reduced_queries = truncate_mrl(query_base, dim)
+        for fmt in ("float32", "int8"):
+            prepare = 0.0
+            if fmt == "int8":
+                matrix = QuantizedMatrix.from_float(reduced)
+                start = time.perf_counter()
+                matrix.dequantize()
+                prepare = (time.perf_counter() - start) * 1000
+                resident = matrix.resident_nbytes
+            else:
+                matrix = reduced
+                resident = matrix.nbytes
+            start = time.perf_counter()
+            for _ in range(repeat):
+                scores = matrix.dot(reduced_queries) if fmt == "int8" else reduced_queries @ matrix.T
+            elapsed = (time.perf_counter() - start) / repeat * 1000
+            print(f"{dim:>6} {fmt:>8} {matrix.nbytes / 1024 / 1024:>8.2f}MB {full_bytes / matrix.nbytes:>6.1f}x "
+                  f"{resident / 1024 / 1024:>8.2f}MB {prepare:>7.2f}ms "
+                  f"{elapsed:>8.2f}ms {overlap(truth, top_k_rows(scores, k)):>9.3f}")
+    print("int8只减小存储/传输体积；扫描使用反量化后的float32副本，耗时与float32相同，扫描内存为int8与float32之和")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量量化基准测试")
+    parser.add_argument("--vectors", help="库向量 .npy 文件")
+    parser.add_argument("--queries", help="查询向量 .npy 文件（默认从库向量中随机抽取）")
+    parser.add_argument("--size", type=int, default=20000)
+    parser.add_argument("--query-count", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)
+    else:
+        vectors = make_clustered_vectors(args.size, 2048)
+
+    if args.queries:
+        queries = np.load(args.queries).astype(np.float32)
+    else:
+        rng = np.random.default_rng(1)
+        picked = vectors[rng.choice(len(vectors), args.query_count, replace=False)]
+        queries = picked + 0.1 * rng.normal(size=picked.shape).astype(np.float32)
+
+    run(vectors, queries, args.k)
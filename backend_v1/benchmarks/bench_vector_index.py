@@ -0,0 +1,86 @@
+"""
+向量索引的召回率与延迟基准测试（合成数据，无需访问任何外部服务）
+
+用法（在 backend_v1 目录下执行）：
+    python -m benchmarks.bench_vector_index --sizes 10000 100000 --dim 256
+"""
+import argparse
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.index_services import ExactIndex, IVFIndex, VectorIndex
+
+
+def make_clustered_vectors(n: int, dim: int, clusters: int = 200, seed: int = 0) -> np.ndarray:
+    """生成带簇结构的向量，比均匀随机向量更接近真实的文本向量分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    return centers[labels] + 0.5 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def recall_at_k(truth: list, approx: list) -> float:
+    hits = sum(len({i for i, _ in t} & {i for i, _ in a}) for t, a in zip(truth, approx))
+    return hits / max(1, sum(len(t) for t in truth))
+
+
+def timed_search(index: VectorIndex, queries: np.ndarray, k: int):
+    latencies = []
+    results = []
+    for query in queries:
+        start = time.perf_counter()
+        results.extend(index.search(query, k))
+        latencies.append((time.perf_counter() - start) * 1000)
+    return results, np.array(latencies)
+
+
+def run(size: int, dim: int, k: int, query_count: int, nlist: int, nprobe: int) -> None:
+    vectors = make_clustered_vectors(size, dim)
+    queries = make_clustered_vectors(query_count, dim, seed=1)
+    ids = [f"rec_{i}" for i in range(size)]
+
+    exact = ExactIndex(dim)
+    exact.add(ids, vectors)
+
+    start = time.perf_counter()
+    ivf = IVFIndex(dim, nlist=nlist, nprobe=nprobe)
+    ivf.add(ids, vectors)
+    if not ivf.is_trained:
+        ivf.train()
+    build_seconds = time.perf_counter() - start
+
+    truth, exact_latency = timed_search(exact, queries, k)
+    approx, ivf_latency = timed_search(ivf, queries, k)
+
+    # 增量删除/插入与持久化
+    ivf.remove(ids[:size // 100])
+    ivf.add(ids[:size // 100], vectors[:size // 100])
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "index.npz")
+        ivf.save(path)
+        reloaded = VectorIndex.load(path)
+        assert len(reloaded) == size
+
+    print(f"n={size:>7} dim={dim} k={k} | build(ivf)={build_seconds:.2f}s | "
+          f"exact p50={np.percentile(exact_latency, 50):.2f}ms p95={np.percentile(exact_latency, 95):.2f}ms | "
+          f"ivf(nlist={nlist}, nprobe={nprobe}) p50={np.percentile(ivf_latency, 50):.2f}ms "
+          f"p95={np.percentile(ivf_latency, 95):.2f}ms recall@{k}={recall_at_k(truth, approx):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="向量索引基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nlist", type=int, default=256)
+    parser.add_argument("--nprobe", type=int, default=16)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        run(size, args.dim, args.k, args.queries, args.nlist, args.nprobe)
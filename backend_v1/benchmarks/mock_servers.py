@@ -0,0 +1,548 @@
+"""
+本地模拟服务：在一个HTTP服务里模拟压测需要的全部外部接口，可配置延迟、错误率和限流。
+
+- OpenAI兼容的对话接口：POST /api/v3/bots/chat/completions（支持 stream=true）
+- 方舟向量接口：        POST /api/v3/embeddings
+- 飞书鉴权：            POST /open-apis/auth/v3/{app,tenant}_access_token/internal
+- 飞书多维表格：        POST /open-apis/bitable/v1/apps/<app>/tables/<table>/records/{search,batch_update,batch_create}
+- 飞书文档：            GET  /open-apis/docs/v1/content
+- 论文链接：            HEAD/GET /paper/<id>（网页，citation_pdf_url指向PDF），GET /paper-pdf/<id>
+- 批量推理（OpenAI兼容）：POST /api/v3/files、GET /api/v3/files/<id>/content、
+                        POST /api/v3/batches、GET /api/v3/batches/<id>、POST /api/v3/batches/<id>/cancel
+
+用法（在 backend_v1 目录下执行）：
+    python -m benchmarks.mock_servers --port 18080 --llm-latency-ms 800 --error-rate 0.01 --llm-rate-limit 50
+"""
+import argparse
+import io
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+def make_text_pdf(lines: list[str]) -> bytes:
+    """生成一个只包含文字的最小PDF（pdfplumber可以正常解析）"""
+    text_ops = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(
+        "(" + line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") Tj T*" for line in lines
+    ) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R /Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(text_ops)} >>\nstream\n{text_ops}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1"))
+    xref = out.tell()
+    out.write(f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode())
+    for offset in offsets:
+        out.write(f"{offset:010d} 00000 n \n".encode())
+    out.write(f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+    return out.getvalue()
+
+
+class EndpointBehavior:
+    """
+    一类接口的模拟行为：固定延迟 + 随机抖动、随机错误、令牌桶限流（每秒请求数，0为不限），
+    以及按slow_rate的概率出现的长尾慢请求（耗时slow_ms）
+    """
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, rate_limit: float = 0,
+                 slow_rate: float = 0, slow_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.slow_rate = slow_rate
+        self.slow_ms = slow_ms
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self._tokens = rate_limit
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """令牌桶限流，返回False表示应当返回429"""
+        if self.rate_limit <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate_limit, self._tokens + (now - self._last_refill) * self.rate_limit)
+            self._last_refill = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+    def delay(self) -> None:
+        latency = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+        if self.slow_rate and random.random() < self.slow_rate:
+            latency = self.slow_ms
+        if latency > 0:
+            time.sleep(latency / 1000)
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+class MockState:
+    """模拟服务的共享状态：各类接口的行为配置、多维表格记录和请求计数"""
+    def __init__(self, jd_count: int = 200, embedding_dim: int = 2048, behaviors: dict = None, jd_table_id: str = "tbl_jd"):
+        self.behaviors = behaviors or {}
+        self.embedding_dim = embedding_dim
+        self.lock = threading.Lock()
+        self.request_counts = {}
+        self.model_counts = {}  # 对话接口按model统计的请求数
+        self.files = {}  # 批量推理的输入/输出文件：{file_id: (filename, bytes)}
+        self.batches = {}  # 批量推理任务：{batch_id: Batch对象字典}
+        # 多维表格数据：{table_id: {record_id: fields}}，岗位表预置jd_count条岗位介绍
+        self.tables = {
+            jd_table_id: {
+                f"rec{i:06d}": {"岗位介绍": [{"text": f"岗位{i}：负责大模型相关的算法研究与工程落地，方向编号{i % 37}", "type": "text"}]}
+                for i in range(jd_count)
+            }
+        }
+
+    def behavior(self, family: str) -> EndpointBehavior:
+        return self.behaviors.setdefault(family, EndpointBehavior())
+
+    def count(self, family: str) -> None:
+        with self.lock:
+            self.request_counts[family] = self.request_counts.get(family, 0) + 1
+
+
+def fake_llm_content(messages: list = None) -> str:
+    """
+    返回同时包含单个分析和批量分析字段的JSON文本；
+    分数由最后一条消息的内容决定（0-99），同一份材料无论用哪个模型打分都相同
+    """
+    score = zlib.crc32((messages[-1].get("content", "") if messages else "").encode("utf-8")) % 100 if messages else 80
+    return json.dumps({
+        "cdd_score": 80,
+        "job_match_1": "大模型算法工程师",
+        "job_match_1_contact": "mock@example.com",
+        "reason_1": "研究方向与岗位高度匹配",
+        "job_match_2": "无匹配岗位",
+        "job_match_2_contact": "",
+        "reason_2": "",
+        "score": score,
+        "summary": "模拟服务生成的评估结果",
+        "tag_primary": "大模型",
+        "contact_tag_primary": "mock@example.com",
+        "tag_secondary": "",
+        "contact_tag_secondary": "",
+    }, ensure_ascii=False)
+
+
+def fake_embedding(text: str, dim: int) -> list:
+    """按文本内容生成确定性的伪向量（同一文本在不同进程、不同次运行中结果都相同）"""
+    rng = random.Random(zlib.crc32(text.encode("utf-8")))
+    return [rng.uniform(-1, 1) for _ in range(dim)]
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    state: MockState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # ---------- 工具方法 ----------
+    def _read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        return json.loads(body) if body else {}
+
+    def _send_json(self, payload: dict, status: int = 200, headers: dict = None) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _apply_behavior(self, family: str) -> bool:
+        """执行限流/延迟/错误注入，返回False表示已经回复了错误"""
+        self.state.count(family)
+        behavior = self.state.behavior(family)
+        if not behavior.acquire():
+            self._send_json({"error": {"message": "rate limited", "type": "rate_limit"}}, 429, {"Retry-After": "1"})
+            return False
+        behavior.delay()
+        if behavior.should_fail():
+            self._send_json({"error": {"message": "mock failure", "type": "server_error"}, "code": 500, "msg": "mock failure"}, 500)
+            return False
+        return True
+
+    # ---------- 路由 ----------
+    def do_HEAD(self):
+        if self.path.startswith("/paper/"):
+            if not self._apply_behavior("paper"):
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/open-apis/docs/v1/content":
+            if not self._apply_behavior("feishu"):
+                return
+            doc_token = parse_qs(parsed.query).get("doc_token", [""])[0]
+            return self._send_json({"code": 0, "msg": "success", "data": {"content": f"# 模拟文档 {doc_token}\n评分标准……"}})
+        if parsed.path.startswith("/paper/"):
+            if not self._apply_behavior("paper"):
+                return
+            page = (f'<html><head><title>Mock Paper {parsed.path}</title>'
+                    f'<meta name="citation_title" content="Mock Paper {parsed.path}">'
+                    f'<meta name="citation_abstract" content="A study of large language model alignment.">'
+                    f'<meta name="citation_pdf_url" content="/paper-pdf/{parsed.path[len("/paper/"):]}"></head>'
+                    f'<body>mock</body></html>').encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(page)))
+            self.end_headers()
+            self.wfile.write(page)
+            return
+        if parsed.path.startswith("/paper-pdf/"):
+            if not self._apply_behavior("paper"):
+                return
+            paper_id = parsed.path[len("/paper-pdf/"):]
+            pdf = make_text_pdf([f"Mock Paper {paper_id}", "", "Abstract", "A study of large language model alignment.", ""]
+                                + [f"Section {i}: experiments on preference optimization and reward models." for i in range(30)])
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(pdf)))
+            self.end_headers()
+            self.wfile.write(pdf)
+            return
+        if "/files/" in parsed.path and parsed.path.endswith("/content"):
+            return self._file_content(parsed.path.split("/files/")[1].split("/")[0])
+        if "/batches/" in parsed.path:
+            return self._get_batch(parsed.path.split("/batches/")[1].split("/")[0])
+        self._send_json({"code": 404, "msg": "not found"}, 404)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        if path.endswith("/files"):
+            return self._upload_file()
+        if path.endswith("/batches"):
+            return self._create_batch()
+        if "/batches/" in path and path.endswith("/cancel"):
+            return self._cancel_batch(path.split("/batches/")[1].split("/")[0])
+        if path.endswith("/chat/completions"):
+            return self._chat_completions()
+        if path.endswith("/embeddings"):
+            return self._embeddings()
+        if path.startswith("/open-apis/auth/v3/"):
+            return self._access_token(path)
+        if path.startswith("/open-apis/bitable/v1/apps/"):
+            return self._bitable(path)
+        self._send_json({"code": 404, "msg": "not found"}, 404)
+
+    def _chat_completions(self):
+        body = self._read_json()
+        if not self._apply_behavior("llm"):
+            return
+        with self.state.lock:
+            model = body.get("model") or ""
+            self.state.model_counts[model] = self.state.model_counts.get(model, 0) + 1
+        content = fake_llm_content(body.get("messages"))
+        created = int(time.time())
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        usage = {"prompt_tokens": sum(len(m.get("content", "")) for m in body.get("messages", [])) // 2,
+                 "completion_tokens": len(content) // 2}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        if not body.get("stream"):
+            return self._send_json({
+                "id": completion_id, "object": "chat.completion", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        # 流式返回：按小块推送，模拟逐token生成
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data: str) -> None:
+            payload = f"data: {data}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(payload):X}\r\n".encode() + payload + b"\r\n")
+            self.wfile.flush()
+
+        for start in range(0, len(content), 16):
+            write_chunk(json.dumps({
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}],
+            }, ensure_ascii=False))
+            time.sleep(0.005)
+        write_chunk("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _embeddings(self):
+        body = self._read_json()
+        if not self._apply_behavior("embedding"):
+            return
+        inputs = body.get("input", [])
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        self._send_json({
+            "object": "list",
+            "model": body.get("model"),
+            "data": [{"object": "embedding", "index": i, "embedding": fake_embedding(text, self.state.embedding_dim)}
+                     for i, text in enumerate(inputs)],
+            "usage": {"prompt_tokens": sum(len(t) for t in inputs), "total_tokens": sum(len(t) for t in inputs)},
+        })
+
+    def _access_token(self, path: str):
+        self._read_json()
+        if not self._apply_behavior("feishu"):
+            return
+        key = "tenant_access_token" if "tenant_access_token" in path else "app_access_token"
+        self._send_json({"code": 0, "msg": "ok", key: f"t-mock-{uuid.uuid4().hex[:8]}", "expire": 7200})
+
+    def _bitable(self, path: str):
+        body = self._read_json()
+        if not self._apply_behavior("feishu"):
+            return
+        query = parse_qs(urlparse(self.path).query)
+        state = self.state
+        # 路径格式：/open-apis/bitable/v1/apps/<app>/tables/<table>/records/...
+        table_id = path.split("/tables/")[1].split("/")[0]
+        with state.lock:
+            source = state.tables.setdefault(table_id, {})
+
+        if path.endswith("/records/search"):
+            page_size = int(query.get("page_size", ["20"])[0])
+            offset = int(query.get("page_token", ["0"])[0] or 0)
+            field_names = body.get("field_names") or []
+            with state.lock:
+                record_ids = sorted(source)
+                page = record_ids[offset:offset + page_size]
+                items = [{
+                    "record_id": record_id,
+                    "fields": {k: v for k, v in source[record_id].items() if not field_names or k in field_names},
+                } for record_id in page]
+            has_more = offset + page_size < len(record_ids)
+            data = {"has_more": has_more, "items": items, "total": len(record_ids)}
+            if has_more:
+                data["page_token"] = str(offset + page_size)
+            return self._send_json({"code": 0, "msg": "success", "data": data})
+
+        if path.endswith("/records/batch_update") or path.endswith("/records/batch_create"):
+            records = body.get("records", [])
+            with state.lock:
+                for record in records:
+                    record_id = record.get("record_id") or f"rec{uuid.uuid4().hex[:10]}"
+                    record["record_id"] = record_id
+                    fields = {k: ([{"text": v, "type": "text"}] if isinstance(v, str) else v)
+                              for k, v in record.get("fields", {}).items()}
+                    source.setdefault(record_id, {}).update(fields)
+            return self._send_json({"code": 0, "msg": "success", "data": {"records": records}})
+
+        self._send_json({"code": 404, "msg": "not found"}, 404)
+
+
+    # ---------- 批量推理 ----------
+    def _upload_file(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if not self._apply_behavior("batch_api"):
+            return
+        # 解析multipart/form-data，取出file字段
+        message = BytesParser(policy=default_policy).parsebytes(
+            f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8") + body
+        )
+        filename, content, purpose = "input.jsonl", b"", "batch"
+        for part in message.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                filename, content = part.get_filename() or filename, part.get_payload(decode=True) or b""
+            elif name == "purpose":
+                purpose = part.get_content().strip()
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        with self.state.lock:
+            self.state.files[file_id] = (filename, content)
+        self._send_json(self._file_object(file_id, filename, len(content), purpose))
+
+    @staticmethod
+    def _file_object(file_id: str, filename: str, size: int, purpose: str) -> dict:
+        return {"id": file_id, "object": "file", "bytes": size, "created_at": int(time.time()),
+                "filename": filename, "purpose": purpose, "status": "processed"}
+
+    def _file_content(self, file_id: str):
+        if not self._apply_behavior("batch_api"):
+            return
+        with self.state.lock:
+            item = self.state.files.get(file_id)
+        if item is None:
+            return self._send_json({"error": {"message": "file not found", "type": "invalid_request_error"}}, 404)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(item[1])))
+        self.end_headers()
+        self.wfile.write(item[1])
+
+    def _create_batch(self):
+        body = self._read_json()
+        if not self._apply_behavior("batch_api"):
+            return
+        with self.state.lock:
+            if body.get("input_file_id") not in self.state.files:
+                return self._send_json({"error": {"message": "input file not found", "type": "invalid_request_error"}}, 400)
+            batch_id = f"batch_{uuid.uuid4().hex[:12]}"
+            batch = {
+                "id": batch_id, "object": "batch", "endpoint": body.get("endpoint"),
+                "input_file_id": body["input_file_id"], "completion_window": body.get("completion_window", "24h"),
+                "status": "validating", "created_at": int(time.time()), "metadata": body.get("metadata"),
+                "output_file_id": None, "error_file_id": None,
+                "request_counts": {"total": 0, "completed": 0, "failed": 0},
+            }
+            self.state.batches[batch_id] = batch
+            snapshot = dict(batch)
+        threading.Thread(target=run_mock_batch, args=(self.state, batch_id), daemon=True).start()
+        self._send_json(snapshot)
+
+    def _get_batch(self, batch_id: str):
+        if not self._apply_behavior("batch_api"):
+            return
+        with self.state.lock:
+            batch = self.state.batches.get(batch_id)
+            snapshot = dict(batch) if batch else None
+        if snapshot is None:
+            return self._send_json({"error": {"message": "batch not found", "type": "invalid_request_error"}}, 404)
+        self._send_json(snapshot)
+
+    def _cancel_batch(self, batch_id: str):
+        self._read_json()
+        with self.state.lock:
+            batch = self.state.batches.get(batch_id)
+            if batch and batch["status"] not in ("completed", "failed", "expired", "cancelled"):
+                batch["status"] = "cancelling"
+            snapshot = dict(batch) if batch else None
+        if snapshot is None:
+            return self._send_json({"error": {"message": "batch not found", "type": "invalid_request_error"}}, 404)
+        self._send_json(snapshot)
+
+
+def run_mock_batch(state: MockState, batch_id: str) -> None:
+    """
+    在后台执行一个批量推理任务：等待"batch"行为配置的延迟后逐行生成结果（按错误率产生失败行），
+    写入输出文件和错误文件；执行期间被取消时只输出已完成的部分
+    """
+    behavior = state.behavior("batch")
+    with state.lock:
+        batch = state.batches[batch_id]
+        batch["status"] = "in_progress"
+        lines = state.files[batch["input_file_id"]][1].decode("utf-8").splitlines()
+        batch["request_counts"]["total"] = len(lines)
+    behavior.delay()
+
+    outputs, errors = [], []
+    for line in lines:
+        with state.lock:
+            if batch["status"] == "cancelling":
+                break
+        request = json.loads(line)
+        state.count("batch_request")
+        if behavior.should_fail():
+            errors.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "response": {
+                "status_code": 500, "body": {"error": {"message": "mock failure", "type": "server_error"}}}, "error": None})
+            continue
+        messages = request["body"].get("messages", [])
+        content = fake_llm_content(messages)
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 2
+        outputs.append({"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "response": {
+            "status_code": 200, "request_id": uuid.uuid4().hex, "body": {
+                "id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion", "created": int(time.time()),
+                "model": request["body"].get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 2,
+                          "total_tokens": prompt_tokens + len(content) // 2},
+            }}, "error": None})
+
+    def dump(items: list):
+        if not items:
+            return None
+        file_id = f"file-{uuid.uuid4().hex[:12]}"
+        content = "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in items).encode("utf-8")
+        state.files[file_id] = (f"{batch_id}_output.jsonl", content)
+        return file_id
+
+    with state.lock:
+        batch["output_file_id"] = dump(outputs)
+        batch["error_file_id"] = dump(errors)
+        batch["request_counts"].update(completed=len(outputs), failed=len(errors))
+        batch["status"] = "cancelled" if batch["status"] == "cancelling" else "completed"
+        batch["completed_at"] = int(time.time())
+
+
+def start_mock_server(port: int = 0, state: MockState = None) -> tuple[ThreadingHTTPServer, threading.Thread]:
+    """在后台线程启动模拟服务，port为0时自动分配端口（通过server.server_address获取）"""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": state or MockState()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def build_state_from_args(args) -> MockState:
+    behaviors = {
+        "llm": EndpointBehavior(args.llm_latency_ms, args.llm_jitter_ms, args.error_rate, args.llm_rate_limit,
+                                args.llm_slow_rate, args.llm_slow_ms),
+        "embedding": EndpointBehavior(args.embedding_latency_ms, args.embedding_latency_ms / 4, args.error_rate, args.embedding_rate_limit),
+        "feishu": EndpointBehavior(args.feishu_latency_ms, args.feishu_latency_ms / 4, args.error_rate, args.feishu_rate_limit),
+        "paper": EndpointBehavior(args.paper_latency_ms, args.paper_latency_ms / 4, 0, 0),
+        "batch": EndpointBehavior(args.batch_latency_ms, 0, args.error_rate, 0),
+    }
+    return MockState(jd_count=args.jd_count, embedding_dim=args.embedding_dim, behaviors=behaviors, jd_table_id=args.jd_table_id)
+
+
+def add_mock_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--llm-latency-ms", type=float, default=800)
+    parser.add_argument("--llm-jitter-ms", type=float, default=200)
+    parser.add_argument("--llm-rate-limit", type=float, default=0, help="每秒请求数上限，0为不限")
+    parser.add_argument("--llm-slow-rate", type=float, default=0, help="长尾慢请求的比例")
+    parser.add_argument("--llm-slow-ms", type=float, default=10000, help="长尾慢请求的耗时")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--embedding-rate-limit", type=float, default=0)
+    parser.add_argument("--feishu-latency-ms", type=float, default=30)
+    parser.add_argument("--feishu-rate-limit", type=float, default=0)
+    parser.add_argument("--paper-latency-ms", type=float, default=100)
+    parser.add_argument("--batch-latency-ms", type=float, default=2000, help="批量推理任务从提交到完成的耗时")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--jd-count", type=int, default=200)
+    parser.add_argument("--embedding-dim", type=int, default=2048)
+    parser.add_argument("--jd-table-id", default="tbl_jd")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="本地模拟的大模型/向量/飞书服务")
+    parser.add_argument("--port", type=int, default=18080)
+    add_mock_arguments(parser)
+    args = parser.parse_args()
+
+    server, thread = start_mock_server(args.port, build_state_from_args(args))
+    print(f"模拟服务已启动: http://127.0.0.1:{server.server_address[1]}", flush=True)
+    try:
+        thread.join()
+    except KeyboardInterrupt:
+        server.shutdown()
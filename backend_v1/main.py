@@ -3,7 +3,9 @@ from flask_cors import CORS
 from config import Config
 from services.feishu_services import start_feishu_thread
 from services.embedding_services import start_embedding_thread
+from services.offline_batch_services import resume_offline_jobs
 from services.client_services import dowei_client, embedding_client
+from services.logging_services import setup_logging
 #from multiprocessing import Process
 #import atexit
 import os
@@ -18,6 +20,9 @@ app = Flask(__name__, static_folder=FRONTEND_DIR)
 # 配置应用
 app.config.from_object(Config)
 
+# 初始化日志（异步输出，统一脱敏；需在飞书客户端创建之后调用，以覆盖SDK自带的日志配置）
+setup_logging()
+
 # 初始化Session
 #Session(app)  # 初始化服务器端session存储
 
@@ -33,10 +38,14 @@ CORS(app,
 # 导入蓝图
 from api.single_cdd_analysis import single_analysis_bp
 from api.batch_input_analysis import batch_input_analysis_bp
+from api.fast_match import fast_match_bp
+from api.metrics import metrics_bp
 
 # 注册蓝图
 app.register_blueprint(single_analysis_bp)
 app.register_blueprint(batch_input_analysis_bp)
+app.register_blueprint(fast_match_bp)
+app.register_blueprint(metrics_bp)
 
 # 添加服务前端文件的路由
 @app.route('/')
@@ -61,6 +70,8 @@ if __name__ == '__main__':
 
     start_feishu_thread(interval=21600)
     start_embedding_thread(dowei_client, embedding_client, interval=21600)
+    # 继续轮询重启前尚未完成的离线批量任务
+    resume_offline_jobs()
     # 确保前端目录存在
     if not os.path.exists(FRONTEND_DIR):
         os.makedirs(FRONTEND_DIR)
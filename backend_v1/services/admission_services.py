@@ -0,0 +1,131 @@
+import math
+import time
+import threading
+from functools import wraps
+from contextlib import contextmanager
+from flask import jsonify, make_response
+from config import Config
+from services.metrics_services import ADMISSION_INFLIGHT, ADMISSION_WAITING, ADMISSION_REJECTED
+
+
+class AdmissionRejected(Exception):
+    """请求未被准入，status_code为429（排队已满）或503（排队超时）"""
+    def __init__(self, status_code: int, retry_after: int, message: str):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    准入控制：同时处理的请求不超过max_concurrent个，超出的最多排队max_queue个、最多等待queue_timeout秒；
+    排队已满立即返回429，等待超时返回503，都带上根据平均处理时长估算的Retry-After
+    """
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max(1, int(max_concurrent))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self._inflight = 0
+        self._waiting = 0
+        self._avg_seconds = None  # 请求处理时长的指数移动平均
+        ADMISSION_INFLIGHT.set(0, endpoint=name)
+        ADMISSION_WAITING.set(0, endpoint=name)
+
+    def retry_after(self) -> int:
+        """估算排到队首需要的秒数（在持有锁时调用）"""
+        avg = self._avg_seconds if self._avg_seconds is not None else 10
+        return min(300, max(1, math.ceil(avg * (self._waiting + 1) / self.max_concurrent)))
+
+    def acquire(self) -> None:
+        """获取处理名额，失败时抛出AdmissionRejected"""
+        with self._cond:
+            if self._inflight < self.max_concurrent and self._waiting == 0:
+                self._inflight += 1
+                ADMISSION_INFLIGHT.set(self._inflight, endpoint=self.name)
+                return
+            if self._waiting >= self.max_queue:
+                ADMISSION_REJECTED.inc(endpoint=self.name, reason="queue_full")
+                raise AdmissionRejected(429, self.retry_after(), "当前使用的人有点多，请稍后再试哦~")
+
+            self._waiting += 1
+            ADMISSION_WAITING.set(self._waiting, endpoint=self.name)
+            deadline = time.monotonic() + self.queue_timeout
+            try:
+                while self._inflight >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        ADMISSION_REJECTED.inc(endpoint=self.name, reason="queue_timeout")
+                        raise AdmissionRejected(503, self.retry_after(), "服务正忙，排队超时啦，请稍后再试~")
+                    self._cond.wait(remaining)
+                self._inflight += 1
+                ADMISSION_INFLIGHT.set(self._inflight, endpoint=self.name)
+            finally:
+                self._waiting -= 1
+                ADMISSION_WAITING.set(self._waiting, endpoint=self.name)
+
+    def release(self, held_seconds: float) -> None:
+        with self._cond:
+            self._inflight -= 1
+            ADMISSION_INFLIGHT.set(self._inflight, endpoint=self.name)
+            self._avg_seconds = held_seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * held_seconds
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        """with块内占用一个处理名额"""
+        self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - start)
+
+
+# 单个分析（耗时短、并发高）和批量分析（耗时长、占用大量大模型配额）分别限流
+single_admission = AdmissionController(
+    "single",
+    getattr(Config, 'SINGLE_MAX_CONCURRENT', 16),
+    getattr(Config, 'SINGLE_MAX_QUEUE', 32),
+    getattr(Config, 'SINGLE_QUEUE_TIMEOUT', 10),
+)
+batch_admission = AdmissionController(
+    "batch",
+    getattr(Config, 'BATCH_MAX_CONCURRENT', 4),
+    getattr(Config, 'BATCH_MAX_QUEUE', 4),
+    getattr(Config, 'BATCH_QUEUE_TIMEOUT', 30),
+)
+
+
+def admission_control(controller: AdmissionController):
+    """
+    接口装饰器：未获得处理名额时直接返回429/503和Retry-After；
+    流式响应在输出结束后才释放名额
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                controller.acquire()
+            except AdmissionRejected as e:
+                response = make_response(jsonify({
+                    "status": "fail",
+                    "message": str(e)
+                }), e.status_code)
+                response.headers["Retry-After"] = str(e.retry_after)
+                return response
+
+            start = time.monotonic()
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                controller.release(time.monotonic() - start)
+                raise
+            if response.is_streamed:
+                response.call_on_close(lambda: controller.release(time.monotonic() - start))
+            else:
+                controller.release(time.monotonic() - start)
+            return response
+        return wrapper
+    return decorator
@@ -1,16 +1,47 @@
 import logging
 import json
-from services.feishu_services import construct_single_system_prompt, get_batch_system_prompt
-from services.client_services import llm_client
 import re
-import json
+from services.feishu_services import construct_single_system_prompt, get_batch_system_prompt
+from services.client_services import llm_client, embedding_client, dowei_client
+from services.llm_router_services import LLMUnavailableError
+from services.output_services import (
+    parse_llm_json,
+    parse_stats,
+    LLMResponseParseError,
+    SINGLE_RESULT_FIELDS,
+    BATCH_RESULT_FIELDS,
+)
+from services.text_services import compact_text, truncate_to_budget
+from services.embedding_services import best_jd_matches
+from services.paper_services import fetch_paper_summary, fetch_paper, PaperFetchError, PAPER_FETCH_ENABLED
+from services.metrics_services import (
+    track_stage,
+    record_failure,
+    record_llm_usage,
+    LLM_REQUEST_DURATION,
+    BATCH_INFLIGHT,
+    CASCADE_DECISIONS,
+)
+from services.tracing_services import span, current_span, use_span
+from services.logging_services import describe_messages
+from services.worker_pool_services import get_llm_worker_pool
+from services.hedging_services import get_hedger, HEDGE_ENABLED
+from services.deadline_services import DeadlineExceeded, check_deadline, deadline, BATCH_ROW_DEADLINE
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from config import Config
-from threading import Lock, Thread
-import queue
-from queue import Empty
+from threading import Lock
 import openai
 import requests
 
+logger = logging.getLogger(__name__)
+
+# 级联模式：批量分析时先用便宜的模型（CASCADE_BOT_ID）粗打分，只有分数落在不确定区间
+# 或不低于CASCADE_ESCALATE_ABOVE的行才交给完整的BATCH_BOT_ID生成详细总结和标签
+CASCADE_ENABLED = getattr(Config, 'CASCADE_ENABLED', False) and bool(getattr(Config, 'CASCADE_BOT_ID', None))
+CASCADE_UNCERTAIN_BAND = getattr(Config, 'CASCADE_UNCERTAIN_BAND', (50, 70))
+CASCADE_ESCALATE_ABOVE = getattr(Config, 'CASCADE_ESCALATE_ABOVE', 70)
+
 # 静态数据
 # 获取飞书文档内容
 # pre_score_content = _content_cache["_pre_content_cache"]
@@ -27,6 +58,36 @@ class LLMContentEmptyError(Exception):
     def __init__(self):
         super().__init__("评估结果生成失败啦~再给大模型一次机会吧！或者也可以联系技术支持哦！")
 
+def get_response_format_kwargs(bot_id: str) -> dict:
+    """对支持结构化输出的bot（在Config.JSON_MODE_BOT_IDS中配置）请求JSON输出模式"""
+    if bot_id in getattr(Config, 'JSON_MODE_BOT_IDS', ()):
+        return {"response_format": {"type": "json_object"}}
+    return {}
+
+def create_completion(bot_id: str, messages: list, hedge: bool = False, **kwargs):
+    """
+    调用大模型（非流式），统计耗时、token用量和失败次数。
+    hedge=True时对慢请求发出对冲请求（输出在temperature=0、固定seed下是确定的，取先返回的结果即可）
+    """
+    def call():
+        return llm_client.chat.completions.create(
+            model=bot_id,
+            messages=messages,
+            temperature=0,
+            seed=42,
+            **get_response_format_kwargs(bot_id),
+            **kwargs,
+        )
+
+    try:
+        with span("llm", bot_id=bot_id, hedge=hedge), LLM_REQUEST_DURATION.time(bot_id=bot_id):
+            completion = get_hedger(bot_id).call(call, bot_id) if hedge else call()
+    except Exception as e:
+        record_failure("llm", e)
+        raise
+    record_llm_usage(bot_id, getattr(completion, "usage", None))
+    return completion
+
 def get_user_prompt(pdf: str, url: str):
     user_info = f"""
     分析素材：  
@@ -49,200 +110,343 @@ def construct_prompt(user_prompt: list):
     whole_prompt = system_prompt + user_prompt
     return whole_prompt
 
-def analyze_candidate(resume: str, pdf_urls: list):
-    """分析候选人，内部实时获取动态数据，复用静态数据"""
-    # 1. 构造prompt（复用静态数据和动态数据）
-    user_prompt = get_user_prompt(resume, pdf_urls)  # 传入动态数据，内部引用静态数据
-    whole_prompt = construct_prompt(user_prompt)  # 内部引用静态的system_prompt
-    print(whole_prompt)
+def build_single_prompt(resume: str, pdf_urls: list, compacted: bool = False) -> list:
+    """
+    构造单个候选人分析的完整prompt
+    :param compacted: 材料已经压缩过（多份材料由merge_texts_to_budget逐份压缩后合并）时只按预算截断，
+                      不再对合并后的全文去除样板内容（合并后位置比例变化，可能把后面的整份材料当作附录截掉）
+    """
+    with track_stage("prompt_build"):
+        # 0. 压缩PDF文本（去除空白、参考文献等样板内容，并限制在token预算内）
+        budget = getattr(Config, 'PROMPT_TOKEN_BUDGET', 12000)
+        if compacted:
+            resume = truncate_to_budget(resume, budget)
+        else:
+            resume, token_stats = compact_text(resume, budget)
+            logger.info(f"PDF文本压缩完成: {token_stats}")
+
+        # 1. 构造prompt（复用静态数据和动态数据）
+        user_prompt = get_user_prompt(resume, pdf_urls)  # 传入动态数据，内部引用静态数据
+        return construct_prompt(user_prompt)  # 内部引用静态的system_prompt
+
+def analyze_candidate(resume: str, pdf_urls: list, compacted: bool = False):
+    """分析候选人，内部实时获取动态数据，复用静态数据（compacted见build_single_prompt）"""
+    with span("analyze_candidate"):
+        return _analyze_candidate(resume, pdf_urls, compacted)
+
+def _analyze_candidate(resume: str, pdf_urls: list, compacted: bool = False):
+    whole_prompt = build_single_prompt(resume, pdf_urls, compacted)
+    # 不记录prompt原文（包含岗位文档和候选人简历），只记录各消息的长度
+    logger.debug("prompt构造完成: %s", describe_messages(whole_prompt))
 
     # 3. 调用大模型
     try:
-        completion = llm_client.chat.completions.create(
-            model=Config.BOT_ID,
-            messages=whole_prompt,
-            temperature=0,
-            seed=42,
-        )
+        completion = create_completion(Config.BOT_ID, whole_prompt, hedge=HEDGE_ENABLED)
     except (requests.Timeout, requests.ConnectionError) as e:
-        logging.error(str(e))
+        logger.error(str(e))
         raise APIEmptyError
-    except openai.APIError as e:
-        logging.error(str(e))
+    except (openai.APIError, LLMUnavailableError) as e:
+        logger.error(str(e))
         raise APIEmptyError
+    except DeadlineExceeded:
+        raise
     except Exception:
         raise Exception
 
     # 4. 校验响应
     if not completion.choices or not completion.choices[0].message.content:
+        record_failure("llm", "EmptyResponse")
         raise APIEmptyError # 抛出异常，由API层处理
 
-    # 5. 处理返回结果
-    ai_ret = completion.choices[0].message.content.strip()
-    ai_ret = re.sub(r'^(<\|FunctionCallEnd\|>|```json\n?|```\n?)', '', ai_ret, flags=re.IGNORECASE)
-    ai_ret = re.sub(r'```\s*$', '', ai_ret)
+    # 5. 解析JSON并返回（容错提取，兼容代码块标记和多余文字）
+    try:
+        return parse_llm_json(completion.choices[0].message.content, SINGLE_RESULT_FIELDS)
+    except LLMResponseParseError as e:
+        record_failure("llm_parse", e)
+        raise LLMContentEmptyError from e
 
-    if not ai_ret:
-        raise LLMContentEmptyError # 抛出异常
-    
-    if ai_ret.startswith("{{"):
-        ai_ret = ai_ret[1:]
-    if ai_ret.endswith("}}"):
-        ai_ret = ai_ret[:-1]
+def stream_analyze_candidate(resume: str, pdf_urls: list, compacted: bool = False):
+    """
+    流式分析候选人：生成器，逐段产出 ("delta", 文本片段)，最后产出 ("result", 解析后的JSON)
+    异常类型与 analyze_candidate 一致，由API层处理
+    """
+    whole_prompt = build_single_prompt(resume, pdf_urls, compacted)
+    chunks = []
+
+    try:
+        with span("llm_stream", bot_id=Config.BOT_ID), LLM_REQUEST_DURATION.time(bot_id=Config.BOT_ID):
+            stream = llm_client.chat.completions.create(
+                model=Config.BOT_ID,
+                messages=whole_prompt,
+                temperature=0,
+                seed=42,
+                stream=True,
+                **get_response_format_kwargs(Config.BOT_ID),
+            )
+            # 耗时预算用完时停止读取并关闭连接
+            with stream:
+                for chunk in stream:
+                    check_deadline("llm_stream")
+                    # 部分服务会在最后一个chunk中附带token用量
+                    record_llm_usage(Config.BOT_ID, getattr(chunk, "usage", None))
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.append(delta)
+                        yield "delta", delta
+    except (requests.Timeout, requests.ConnectionError) as e:
+        logger.error(str(e))
+        record_failure("llm", e)
+        raise APIEmptyError
+    except (openai.APIError, LLMUnavailableError) as e:
+        logger.error(str(e))
+        record_failure("llm", e)
+        raise APIEmptyError
+
+    content = ''.join(chunks)
+    if not content:
+        record_failure("llm", "EmptyResponse")
+        raise APIEmptyError
 
-    # 6. 解析JSON并返回
     try:
-        return json.loads(ai_ret)
-    except json.JSONDecodeError as e:
-        logging.error(f"JSON解析失败 | 内容: {ai_ret[:100]}... | 错误：{str(e)}")
+        yield "result", parse_llm_json(content, SINGLE_RESULT_FIELDS)
+    except LLMResponseParseError as e:
+        record_failure("llm_parse", e)
         raise LLMContentEmptyError from e
     
-def batch_analysis(paper_urls: list[tuple[int,str]]):
+def build_failed_result(fields: dict, summary: str = "解析有误，请人工处理") -> dict:
+    """批量分析中单行失败时的占位结果"""
+    return {
+        **fields,
+        "score": "",
+        "summary": summary,
+        "tag_primary": "",
+        "contact_tag_primary": "",
+        "tag_secondary": "",
+        "contact_tag_secondary": ""
+        }
 
+def get_batch_link_user_info(link: str) -> str:
+    return f"""
+            分析素材：
+            论文链接{link}    
+            """
+
+def get_batch_paper_user_info(link: str, paper: dict) -> str:
+    return f"""
+            分析素材：
+            论文链接{link}
+            论文标题：{paper["title"]}
+            论文摘要：{paper["abstract"]}
+            论文正文(节选)：{paper["text"]}
+            """
+
+def build_link_user_info(link: str) -> str:
+    """
+    在本地下载论文并提取正文后交给大模型（不再依赖大模型侧逐篇浏览）；
+    下载失败时退回只提供链接
+    """
+    if not PAPER_FETCH_ENABLED:
+        return get_batch_link_user_info(link)
+    try:
+        return get_batch_paper_user_info(link, fetch_paper(link))
+    except PaperFetchError as e:
+        logger.warning(f"论文获取失败，仅提供链接: {str(e)}")
+        return get_batch_link_user_info(link)
+
+def get_batch_pdf_user_info(content: str) -> str:
+    return f"""
+            分析素材：
+            PDF内容(简历或论文)：{content}
+            """
+
+def parse_score(value):
+    """从大模型返回的分数中取出数值（兼容"85"、"85分"等写法），无法识别时返回None"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.search(r'-?\d+(?:\.\d+)?', str(value or ""))
+    return float(match.group()) if match else None
+
+def should_escalate(score) -> bool:
+    """粗打分无法识别、落在不确定区间或不低于阈值时，需要交给完整的bot"""
+    if score is None:
+        return True
+    low, high = CASCADE_UNCERTAIN_BAND
+    return low <= score <= high or score >= CASCADE_ESCALATE_ABOVE
+
+def complete_batch_row(bot_id: str, whole_prompt: list, required_fields: tuple) -> dict:
+    """调用大模型分析一行并解析JSON，响应为空时抛出ValueError，无法解析时抛出LLMResponseParseError"""
+    with BATCH_INFLIGHT.track_inprogress():
+        completion = create_completion(bot_id, whole_prompt)
+    if not completion.choices or not completion.choices[0].message.content:
+        record_failure("llm", "EmptyResponse")
+        raise ValueError("大模型响应为空")
+    # 容错提取，兼容代码块标记和多余文字
+    return parse_llm_json(completion.choices[0].message.content, required_fields)
+
+def cascade_first_pass(whole_prompt: list):
+    """
+    级联模式的第一级：便宜的模型粗打分。明确不合适的行直接返回该结果（tier为cheap），
+    需要交给完整bot时（分数不确定、较高或调用失败）返回None
+    """
+    try:
+        result = complete_batch_row(Config.CASCADE_BOT_ID, whole_prompt, ("score",))
+    except DeadlineExceeded:
+        raise
+    except Exception as e:
+        logger.warning(f"级联粗打分失败，交给完整模型: {str(e)}")
+        CASCADE_DECISIONS.inc(decision="first_pass_failed")
+        return None
+    if should_escalate(parse_score(result.get("score"))):
+        CASCADE_DECISIONS.inc(decision="escalated")
+        return None
+    CASCADE_DECISIONS.inc(decision="kept")
+    for field in BATCH_RESULT_FIELDS:
+        result.setdefault(field, "")
+    result["tier"] = "cheap"
+    return result
+
+def run_batch_tasks(tasks, job_name: str = "batch", weight: int = 1, on_result=None) -> dict:
+    """
+    批量分析的通用执行器：生产者（当前线程）边产出任务边提交到全局共享的大模型线程池，
+    多个批量任务同时运行时由线程池按任务组轮询调度（见worker_pool_services）。
+    :param tasks: 可迭代对象，每项为 (index, fields, user_info, error)；
+                  fields为写入结果行的附加字段（如link/filename），error非空时直接记为失败，不调用大模型；
+                  user_info可以是无参函数（如需下载论文），在线程池中执行，计入该行的耗时预算
+    :param on_result: 每行完成时调用 on_result(index, 结果字典)（在线程池中执行，不能抛出异常）；
+                      传入时结果不再汇总到返回值中，适合边分析边写出的大批量任务
+    :return: {index: 结果字典}（传入on_result时为空字典）
+    """
     system_prompt = get_batch_system_prompt()
+    # 线程池中的线程不会继承调用方的上下文，显式挂接到当前span下，每行记录为一个子span
+    parent_span = current_span()
     results_lock = Lock()
-    task_queue = queue.Queue()
     results = {}
-    threads = []
 
-    for item in paper_urls:
-        task_queue.put(item)
-    
-    def consumer(system_prompt, results, queue, results_lock):
-        while True:
-            try:
-                # 从队列获取任务（包含索引和数据），超时退出避免阻塞
-                index, data = queue.get(timeout=1)
-            except Empty:
-                break
-
-            user_info = f"""
-            分析素材：
-            论文链接{data}    
-            """
+    def deliver(index, result):
+        if on_result is not None:
+            on_result(index, result)
+            return
+        with results_lock:
+            results[index] = result
 
+    def analyze_row(index, fields, user_info) -> dict:
+        """分析一行并返回结果，所有异常都记为该行失败"""
+        try:
+            if callable(user_info):
+                user_info = user_info()
             user_prompt = [{"role": "user","content": user_info}]
             whole_prompt = system_prompt + user_prompt
             #print(whole_prompt)
 
-            try:
-                completion = llm_client.chat.completions.create(
-                    model=Config.BATCH_BOT_ID,
-                    messages=whole_prompt,
-                    temperature=0,
-                    seed=42,
-                )
-                    # 4. 校验响应
-                if not completion.choices or not completion.choices[0].message.content:
-                    raise ValueError("大模型响应为空")# 抛出异常，由API层处理
-
-                # 5. 处理返回结果
-                ai_ret = completion.choices[0].message.content.strip()
-                ai_ret = re.sub(r'^(<\|FunctionCallEnd\|>|```json\n?|```\n?)', '', ai_ret, flags=re.IGNORECASE)
-                ai_ret = re.sub(r'```\s*$', '', ai_ret)
-
-                if not ai_ret:
-                    raise ValueError("内容清理后为空")
-                
-                if ai_ret.startswith("{{"):
-                    ai_ret = ai_ret[1:]
-                if ai_ret.endswith("}}"):
-                    ai_ret = ai_ret[:-1]
-
-                # 6. 解析JSON并返回
-                try:
-                    result = json.loads(ai_ret)
-                    result['link'] = data
-                    with results_lock:
-                        results[index] = result
-                except json.JSONDecodeError as e:
-                    raise json.JSONDecodeError
-                except Exception as e:
-                    raise Exception
-            except (requests.Timeout, requests.ConnectionError) as e:
-                logging.error(str(e))
-                with results_lock:    
-                    results[index] = {
-                        "link":data,
-                        "score": "", 
-                        "summary": "解析有误，请人工处理", 
-                        "tag_primary": "", 
-                        "contact_tag_primary": "",
-                        "tag_secondary":"",
-                        "contact_tag_secondary":""
-                        }
-            except openai.APIError as e:
-                logging.error(str(e))
-                with results_lock:    
-                    results[index] = {
-                        "link":data,
-                        "score": "", 
-                        "summary": "解析有误，请人工处理", 
-                        "tag_primary": "", 
-                        "contact_tag_primary": "",
-                        "tag_secondary":"",
-                        "contact_tag_secondary":""
-                        }
-            except json.JSONDecodeError as e:
-                logging.error(f"JSON解析失败 | 内容: {ai_ret[:100]}... | 错误：{str(e)}")
-                with results_lock:
-                    results[index] = {
-                        "link": data,
-                        "score": "", 
-                        "summary": "解析有误，请人工处理", 
-                        "tag_primary": "", 
-                        "contact_tag_primary": "",
-                        "tag_secondary":"",
-                        "contact_tag_secondary":""
-                        }
-            except ValueError as e:
-                logging.error(str(e))
-                with results_lock:    
-                    results[index] = {
-                        "link":data,
-                        "score": "", 
-                        "summary": "解析有误，请人工处理", 
-                        "tag_primary": "", 
-                        "contact_tag_primary": "",
-                        "tag_secondary":"",
-                        "contact_tag_secondary":""
-                        }
-            except Exception as e:
-                logging.error(str(e))
-                with results_lock:    
-                    results[index] = {
-                        "link":data,
-                        "score": "", 
-                        "summary": "解析有误，请人工处理", 
-                        "tag_primary": "", 
-                        "contact_tag_primary": "",
-                        "tag_secondary":"",
-                        "contact_tag_secondary":""
-                        }
-            finally:
-                task_queue.task_done()
-                
-    for i in range(20):
-        t = Thread(
-            target = consumer, 
-            name = f"consumer_{str(i+1)}",
-            args = (system_prompt, results, task_queue, results_lock),)
-        t.daemon = True
-        t.start()
-        threads.append(t)
-
-    task_queue.join()
-
-    for t in threads:
-        t.join()
+            result = cascade_first_pass(whole_prompt) if CASCADE_ENABLED else None
+            if result is None:
+                result = complete_batch_row(Config.BATCH_BOT_ID, whole_prompt, BATCH_RESULT_FIELDS)
+                if CASCADE_ENABLED:
+                    result["tier"] = "full"
+            result.update(fields)
+            return result
+        except (requests.Timeout, requests.ConnectionError) as e:
+            logger.error(str(e))
+            return build_failed_result(fields)
+        except (openai.APIError, LLMUnavailableError) as e:
+            logger.error(str(e))
+            return build_failed_result(fields)
+        except DeadlineExceeded as e:
+            logger.error(f"第{index}行分析超时: {e.stage}")
+            return build_failed_result(fields, "分析超时，请人工处理")
+        except LLMResponseParseError as e:
+            logger.error(f"JSON解析失败: {str(e)}")
+            record_failure("llm_parse", e)
+            return build_failed_result(fields)
+        except ValueError as e:
+            logger.error(str(e))
+            return build_failed_result(fields)
+        except Exception as e:
+            logger.error(str(e))
+            return build_failed_result(fields)
+
+    def run_row(index, fields, user_info):
+        # 每行从开始执行时计算耗时预算，卡住的调用不会一直占用线程池
+        with deadline(BATCH_ROW_DEADLINE), use_span(parent_span), span("batch_row", index=index) as row_span:
+            result = analyze_row(index, fields, user_info)
+            if row_span is not None:
+                row_span.set_attribute("failed", result.get("score") == "")
+        deliver(index, result)
+
+    # 提交时待执行任务过多会阻塞（背压），任务来源较慢（如解析PDF、分页读取多维表格）时不会一次性全部读入内存
+    job = get_llm_worker_pool().create_job(job_name, weight=weight, max_pending=getattr(Config, 'LLM_JOB_MAX_PENDING', None))
+    try:
+        for index, fields, user_info, error in tasks:
+            if error:
+                deliver(index, build_failed_result(fields, error))
+                continue
+            job.submit(run_row, index, fields, user_info)
+    except BaseException:
+        # 任务来源出错时不再执行排队中的任务
+        job.cancel_pending()
+        raise
+    finally:
+        job.close()
+        job.wait()
 
+    logger.info(f"批量分析完成，JSON解析统计: {parse_stats.snapshot()}")
     return results
 
-                    
-    
-                
+def prescore_links(links: list[str]) -> list[tuple[str, float]]:
+    """
+    相似度预打分：并发获取论文标题和摘要，向量化后与所有岗位向量计算余弦相似度
+    :return: 与links一一对应的 (最匹配岗位record_id, 相似度)
+    """
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        summaries = list(pool.map(fetch_paper_summary, links))
+    texts = [f"{summary['title']}\n{summary['abstract']}".strip() for summary in summaries]
+    return best_jd_matches(embedding_client, dowei_client, texts)
 
+def batch_analysis(paper_urls: list[tuple[int,str]]):
+    """批量分析论文链接（CSV输入），开启预打分时先用向量相似度筛一遍"""
+    matches = None
+    if getattr(Config, 'PRESCORE_ENABLED', False):
+        try:
+            with span("prescore", rows=len(paper_urls)):
+                matches = prescore_links([link for _, link in paper_urls])
+        except Exception as e:
+            # 预打分只是加速手段，失败时所有行照常走大模型
+            logger.error(f"相似度预打分失败: {str(e)}", exc_info=True)
+    threshold = getattr(Config, 'PRESCORE_THRESHOLD', None)
 
-    
+    def tasks():
+        for position, (index, link) in enumerate(paper_urls):
+            fields = {"link": link}
+            error = None
+            if matches:
+                record_id, score = matches[position]
+                fields["best_jd"] = record_id
+                fields["jd_similarity"] = round(score, 4) if record_id else ""
+                # 摘要获取失败（没有record_id）时无法判断，仍交给大模型
+                if record_id and threshold is not None and score < threshold:
+                    error = "与所有岗位的相似度都较低，未进行大模型分析"
+                    if CASCADE_ENABLED:
+                        fields["tier"] = "prescore"
+            yield index, fields, partial(build_link_user_info, link), error
+
+    return run_batch_tasks(tasks(), job_name="batch_links")
+
+def batch_pdf_analysis(pdf_texts):
+    """
+    批量分析PDF（ZIP输入）
+    :param pdf_texts: 可迭代对象，每项为 (index, filename, text, error)，通常来自 iter_zip_pdf_texts
+    """
+    token_budget = getattr(Config, 'PROMPT_TOKEN_BUDGET', 12000)
 
+    def tasks():
+        for index, filename, text, error in pdf_texts:
+            fields = {"link": "", "filename": filename}
+            if error:
+                yield index, fields, None, error
+                continue
+            content, _ = compact_text(text, token_budget)
+            yield index, fields, get_batch_pdf_user_info(content), None
 
+    return run_batch_tasks(tasks(), job_name="batch_pdfs")
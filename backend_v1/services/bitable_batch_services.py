@@ -0,0 +1,265 @@
+import json
+import time
+import logging
+import queue
+import threading
+import itertools
+from functools import partial
+from urllib.parse import urlparse, parse_qs
+
+import lark_oapi as lark
+from lark_oapi.api.bitable.v1 import *
+
+from config import Config
+from services.analysis_services import run_batch_tasks, build_link_user_info, parse_score
+from services.metrics_services import track_stage, record_failure
+
+logger = logging.getLogger(__name__)
+
+# 多维表格批量分析的默认来源（可在请求中覆盖）：候选人链接所在的表格、数据表、视图和链接列名
+BITABLE_BATCH_APP_TOKEN = getattr(Config, 'BITABLE_BATCH_APP_TOKEN', None)
+BITABLE_BATCH_TABLE_ID = getattr(Config, 'BITABLE_BATCH_TABLE_ID', None)
+BITABLE_BATCH_VIEW_ID = getattr(Config, 'BITABLE_BATCH_VIEW_ID', None)
+BITABLE_BATCH_LINK_FIELD = getattr(Config, 'BITABLE_BATCH_LINK_FIELD', "论文链接")
+# 结果写入的数据表：未配置时回写到来源记录（batch_update），配置后在该表中新建记录（batch_create）
+BITABLE_BATCH_RESULT_TABLE_ID = getattr(Config, 'BITABLE_BATCH_RESULT_TABLE_ID', None)
+# 分析结果字段 -> 多维表格列名（评分列为数字类型，其余为文本类型）
+BITABLE_BATCH_RESULT_COLUMNS = getattr(Config, 'BITABLE_BATCH_RESULT_COLUMNS', {
+    "score": "评分",
+    "summary": "分析总结",
+    "tag_primary": "主要标签",
+    "contact_tag_primary": "主要标签对接人",
+    "tag_secondary": "次要标签",
+    "contact_tag_secondary": "次要标签对接人",
+})
+# 分页读取的每页记录数（search接口上限500）和每次批量写入的记录数（接口上限1000）
+BITABLE_BATCH_PAGE_SIZE = getattr(Config, 'BITABLE_BATCH_PAGE_SIZE', 500)
+BITABLE_BATCH_WRITE_SIZE = getattr(Config, 'BITABLE_BATCH_WRITE_SIZE', 200)
+# 分析较慢时，缓冲区中的结果最多等待该时间（秒）后写出，不必凑满一批
+BITABLE_BATCH_FLUSH_INTERVAL = getattr(Config, 'BITABLE_BATCH_FLUSH_INTERVAL', 10)
+
+
+class BitableReadError(Exception):
+    def __init__(self, message: str = "读取多维表格失败啦，请检查表格链接和权限后重试~"):
+        super().__init__(message)
+
+
+class BitableTooManyRowsError(Exception):
+    def __init__(self, max_rows: int):
+        super().__init__(f"多维表格视图里的记录太多啦，一次最多分析{max_rows}行哦，请用视图筛选后分批分析~")
+
+
+def field_text(value) -> str:
+    """多维表格单元格的文本内容（兼容文本、超链接、多行文本片段等格式）"""
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, dict):
+        return str(value.get("link") or value.get("text") or "").strip()
+    if isinstance(value, list):
+        return "".join(field_text(piece) for piece in value).strip()
+    return str(value).strip()
+
+
+def parse_bitable_url(url: str) -> dict:
+    """
+    从多维表格的浏览器链接（https://xxx.feishu.cn/base/<app_token>?table=<table_id>&view=<view_id>）
+    中提取app_token/table_id/view_id，无法识别的部分为None
+    """
+    parsed = urlparse((url or "").strip())
+    parts = [part for part in parsed.path.split("/") if part]
+    query = parse_qs(parsed.query)
+    return {
+        "app_token": parts[parts.index("base") + 1] if "base" in parts[:-1] else None,
+        "table_id": query.get("table", [None])[0],
+        "view_id": query.get("view", [None])[0],
+    }
+
+
+@track_stage("feishu_fetch")
+def get_bitable_page(client, app_token: str, table_id: str, view_id: str, link_field: str, page_token: str, page_size: int):
+    """读取一页记录，返回 (has_more, items, page_token)"""
+    body = SearchAppTableRecordRequestBody.builder().field_names([link_field])
+    if view_id:
+        body = body.view_id(view_id)
+    request: SearchAppTableRecordRequest = (SearchAppTableRecordRequest.builder()
+            .app_token(app_token)
+            .table_id(table_id)
+            .user_id_type("open_id")
+            .page_token(page_token)
+            .page_size(page_size)
+            .request_body(body.build())
+            .build())
+    response: SearchAppTableRecordResponse = client.bitable.v1.app_table_record.search(request)
+    if not response.success():
+        record_failure("feishu_fetch", f"code_{response.code}")
+        lark.logger.error(
+            f"client.bitable.v1.app_table_record.search failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}")
+        raise BitableReadError()
+
+    data_dict = json.loads(lark.JSON.marshal(response.data))
+    return data_dict['has_more'], data_dict.get('items') or [], data_dict.get('page_token', '')
+
+
+def iter_bitable_links(client, app_token: str, table_id: str, view_id: str = None, link_field: str = BITABLE_BATCH_LINK_FIELD,
+                       page_size: int = BITABLE_BATCH_PAGE_SIZE):
+    """逐页读取视图中的记录，逐条产出 (record_id, 链接)；链接为空的记录产出空字符串"""
+    page_token = ''
+    has_more = True
+    while has_more:
+        has_more, items, page_token = get_bitable_page(client, app_token, table_id, view_id, link_field, page_token, page_size)
+        for item in items:
+            yield item['record_id'], field_text(item.get('fields', {}).get(link_field))
+
+
+def build_result_fields(result: dict, columns: dict = None) -> dict:
+    """把一行分析结果转换为多维表格的字段（评分无法识别时不写，避免数字列写入失败）"""
+    columns = columns or BITABLE_BATCH_RESULT_COLUMNS
+    fields = {}
+    for key, column in columns.items():
+        value = result.get(key, "")
+        if key == "score":
+            value = parse_score(value)
+            if value is None:
+                continue
+        fields[column] = value if isinstance(value, (int, float)) else str(value)
+    return fields
+
+
+class BitableResultWriter:
+    """
+    分析结果的写出器：每行完成时放入队列（add立即返回，不占用大模型线程池的线程），
+    由专门的写出线程攒满write_size条（或距上次写出超过flush_interval秒）后批量写入多维表格——
+    回写来源记录时用batch_update，写入单独的结果表时用batch_create（同时写入链接列）。
+    写入失败时重试，仍失败则记录并丢弃该批
+    """
+    _CLOSE = object()
+
+    def __init__(self, client, app_token: str, table_id: str, result_table_id: str = None, link_field: str = BITABLE_BATCH_LINK_FIELD,
+                 write_size: int = BITABLE_BATCH_WRITE_SIZE, flush_interval: float = BITABLE_BATCH_FLUSH_INTERVAL,
+                 max_attempts: int = 3):
+        self.client = client
+        self.app_token = app_token
+        self.table_id = result_table_id or table_id
+        self.create = bool(result_table_id)
+        self.link_field = link_field
+        self.write_size = write_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.stats = {"rows": 0, "failed_rows": 0, "written": 0, "write_failed": 0}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="bitable_writer", daemon=True)
+        self._thread.start()
+
+    def add(self, index: int, result: dict) -> None:
+        """on_result回调：只构造记录并放入队列，不抛出异常"""
+        fields = build_result_fields(result)
+        if self.create:
+            fields[self.link_field] = result.get("link", "")
+            record = AppTableRecord.builder().fields(fields).build()
+        else:
+            record = AppTableRecord.builder().record_id(result["record_id"]).fields(fields).build()
+        with self._lock:
+            self.stats["rows"] += 1
+            self.stats["failed_rows"] += result.get("score") == ""
+        self._queue.put(record)
+
+    def close(self) -> dict:
+        """等待写出线程写完队列中剩余的结果，返回统计"""
+        self._queue.put(self._CLOSE)
+        self._thread.join()
+        with self._lock:
+            return dict(self.stats)
+
+    def _run(self) -> None:
+        buffer = []
+        last_flush = time.monotonic()
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.1, self.flush_interval - (time.monotonic() - last_flush)))
+            except queue.Empty:
+                item = None
+            if item is not None and item is not self._CLOSE:
+                buffer.append(item)
+            if buffer and (item is self._CLOSE or len(buffer) >= self.write_size
+                           or time.monotonic() - last_flush >= self.flush_interval):
+                self._write(buffer)
+                buffer = []
+                last_flush = time.monotonic()
+            if item is self._CLOSE:
+                return
+
+    @track_stage("feishu_write")
+    def _write(self, records: list) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                response = self._send(records)
+            except Exception as e:
+                response = None
+                lark.logger.error(f"多维表格写入异常: {str(e)}")
+            if response is not None and response.success():
+                with self._lock:
+                    self.stats["written"] += len(records)
+                return
+            if response is not None:
+                lark.logger.error(
+                    f"client.bitable.v1.app_table_record.{'batch_create' if self.create else 'batch_update'} failed, "
+                    f"code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}")
+            if attempt < self.max_attempts:
+                time.sleep(2 ** (attempt - 1))
+        record_failure("feishu_write", "batch_create" if self.create else "batch_update")
+        with self._lock:
+            self.stats["write_failed"] += len(records)
+
+    def _send(self, records: list):
+        if self.create:
+            request: BatchCreateAppTableRecordRequest = (BatchCreateAppTableRecordRequest.builder()
+                .app_token(self.app_token)
+                .table_id(self.table_id)
+                .user_id_type("open_id")
+                .request_body(BatchCreateAppTableRecordRequestBody.builder().records(records).build())
+                .build())
+            return self.client.bitable.v1.app_table_record.batch_create(request)
+        request: BatchUpdateAppTableRecordRequest = (BatchUpdateAppTableRecordRequest.builder()
+            .app_token(self.app_token)
+            .table_id(self.table_id)
+            .user_id_type("open_id")
+            .ignore_consistency_check(True)
+            .request_body(BatchUpdateAppTableRecordRequestBody.builder().records(records).build())
+            .build())
+        return self.client.bitable.v1.app_table_record.batch_update(request)
+
+
+def batch_bitable_analysis(client, app_token: str, table_id: str, view_id: str = None, result_table_id: str = None,
+                           link_field: str = BITABLE_BATCH_LINK_FIELD, max_rows: int = None) -> dict:
+    """
+    从多维表格视图中分页读取候选人链接送入大模型线程池，每行完成后由写出线程分批写回多维表格。
+    先读完视图中的record_id和链接（只读取链接列）再开始分析：超过max_rows行时直接拒绝，不做任何分析；
+    回写来源记录时也避免了边回写边用page_token翻页——视图按结果列筛选或排序时会跳过或重复记录
+    :return: 统计 {"rows", "failed_rows", "written", "write_failed"}
+    :raises BitableTooManyRowsError: 视图中的记录数超过max_rows
+    """
+    links = iter_bitable_links(client, app_token, table_id, view_id, link_field)
+    if max_rows:
+        # 多读一条即可判断是否超过上限，不必读完整个大表
+        links = list(itertools.islice(links, max_rows + 1))
+        if len(links) > max_rows:
+            raise BitableTooManyRowsError(max_rows)
+    else:
+        links = list(links)
+    writer = BitableResultWriter(client, app_token, table_id, result_table_id, link_field)
+
+    def tasks():
+        for index, (record_id, link) in enumerate(links):
+            fields = {"link": link, "record_id": record_id}
+            error = None if link else "没有找到论文链接，请人工处理"
+            yield index, fields, partial(build_link_user_info, link), error
+
+    try:
+        run_batch_tasks(tasks(), job_name="batch_bitable", on_result=writer.add)
+    finally:
+        stats = writer.close()
+    logger.info(f"多维表格批量分析完成: {stats}")
+    return stats
@@ -0,0 +1,186 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+import numpy as np
+
+from services.general_services import calculate_content_hash as hash
+
+
+class EmbeddingCache:
+    """
+    向量缓存：以SQLite存储float16向量（BLOB），按最近使用时间做LRU淘汰。
+    键由模型名、is_query、mrl_dim和文本内容哈希组成，同一段文本重复向量化时可直接命中。
+    """
+    def __init__(self, path: str, max_entries: int = 50000):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embedding_cache ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embedding_cache(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model: str, text: str, is_query: bool, mrl_dim) -> str:
+        return hash(f"{model}|{int(is_query)}|{mrl_dim}|{hash(text)}")
+
+    def get_many(self, keys: list[str]) -> dict:
+        """批量查询，返回命中的 {key: float32向量}，并刷新命中项的使用时间"""
+        if not keys:
+            return {}
+        hits = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):  # SQLite单条语句的参数个数有限制
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embedding_cache WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, blob in rows:
+                    hits[key] = np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+            if hits:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in hits],
+                )
+                self._conn.commit()
+        return hits
+
+    def put_many(self, items: dict) -> None:
+        """批量写入 {key: 向量}，超过容量时淘汰最久未使用的条目"""
+        if not items:
+            return
+        now = time.time()
+        rows = [(key, np.asarray(vector, dtype=np.float16).tobytes(), now) for key, vector in items.items()]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, vector, last_used) VALUES (?, ?, ?)", rows
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM embedding_cache WHERE key IN ("
+                    "SELECT key FROM embedding_cache ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+            self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+            self._conn.commit()
+
+
+_embedding_cache = None
+_embedding_cache_lock = threading.Lock()
+
+def get_embedding_cache(path: str = None, max_entries: int = 50000) -> EmbeddingCache:
+    """获取全局共享的向量缓存（延迟创建）"""
+    global _embedding_cache
+    if _embedding_cache is None:
+        with _embedding_cache_lock:
+            if _embedding_cache is None:
+                path = path or os.path.join(tempfile.gettempdir(), 'embedding_cache.sqlite3')
+                _embedding_cache = EmbeddingCache(path, max_entries)
+    return _embedding_cache
+
+
+class PaperCache:
+    """
+    论文内容缓存（内容寻址）：论文正文按下载内容的哈希存储，链接只记录指向的内容哈希，
+    因此arXiv摘要页/PDF链接、DOI跳转等不同链接指向同一篇论文时只存一份；
+    链接映射超过ttl秒后重新下载（内容未变时仍命中同一条正文），正文按最近使用时间做LRU淘汰
+    """
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_entries: int = 20000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS paper_url ("
+            "url_key TEXT PRIMARY KEY, content_hash TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS paper_content ("
+            "content_hash TEXT PRIMARY KEY, title TEXT NOT NULL, abstract TEXT NOT NULL, "
+            "text TEXT NOT NULL, source_url TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_paper_last_used ON paper_content(last_used)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_url_key(url: str) -> str:
+        return hash(url.strip())
+
+    def get(self, url: str):
+        """按链接查询，未命中或已过期时返回None，命中时返回 {"title", "abstract", "text", "source_url"}"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT c.content_hash, c.title, c.abstract, c.text, c.source_url, u.fetched_at "
+                "FROM paper_url u JOIN paper_content c ON u.content_hash = c.content_hash WHERE u.url_key = ?",
+                (self.make_url_key(url),),
+            ).fetchone()
+            if row is None or time.time() - row[5] > self.ttl:
+                return None
+            self._conn.execute("UPDATE paper_content SET last_used = ? WHERE content_hash = ?", (time.time(), row[0]))
+            self._conn.commit()
+        return {"title": row[1], "abstract": row[2], "text": row[3], "source_url": row[4]}
+
+    def get_content(self, content_hash: str):
+        """按内容哈希查询（链接不同但下载内容相同时无需重新解析）"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT title, abstract, text, source_url FROM paper_content WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"title": row[0], "abstract": row[1], "text": row[2], "source_url": row[3]}
+
+    def put(self, urls: list[str], content_hash: str, paper: dict = None) -> None:
+        """记录各链接指向content_hash；paper非空时同时写入正文，超过容量时淘汰最久未使用的正文"""
+        now = time.time()
+        with self._lock:
+            if paper is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO paper_content (content_hash, title, abstract, text, source_url, last_used) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (content_hash, paper["title"], paper["abstract"], paper["text"], paper["source_url"], now),
+                )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO paper_url (url_key, content_hash, fetched_at) VALUES (?, ?, ?)",
+                [(self.make_url_key(url), content_hash, now) for url in urls],
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM paper_content").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM paper_content WHERE content_hash IN ("
+                    "SELECT content_hash FROM paper_content ORDER BY last_used ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+                self._conn.execute(
+                    "DELETE FROM paper_url WHERE content_hash NOT IN (SELECT content_hash FROM paper_content)"
+                )
+            self._conn.commit()
+
+
+_paper_cache = None
+_paper_cache_lock = threading.Lock()
+
+def get_paper_cache(path: str = None, ttl: float = 7 * 24 * 3600, max_entries: int = 20000) -> PaperCache:
+    """获取全局共享的论文内容缓存（延迟创建）"""
+    global _paper_cache
+    if _paper_cache is None:
+        with _paper_cache_lock:
+            if _paper_cache is None:
+                path = path or os.path.join(tempfile.gettempdir(), 'paper_cache.sqlite3')
+                _paper_cache = PaperCache(path, ttl, max_entries)
+    return _paper_cache
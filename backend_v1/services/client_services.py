@@ -1,27 +1,70 @@
-from openai import OpenAI
 from config import Config
 from volcenginesdkarkruntime import Ark
+from openai import OpenAI
 import lark_oapi as lark
+import requests
+from requests.adapters import HTTPAdapter
+from services.llm_router_services import build_llm_router
+from services.deadline_services import EMBEDDING_TIMEOUT, FEISHU_TIMEOUT
 
 
-llm_client = OpenAI(
-    base_url = "https://ark.cn-beijing.volces.com/api/v3/bots",
-    api_key = Config.API_KEY
-)
+# 飞书SDK日志级别：默认WARNING（DEBUG级别每次调用都会序列化完整报文），调试时可在Config中配置为DEBUG
+LARK_LOG_LEVEL = getattr(lark.LogLevel, str(getattr(Config, 'LARK_LOG_LEVEL', 'WARNING')).upper(), lark.LogLevel.WARNING)
+
+
+def build_http_session(pool_size: int = 20) -> requests.Session:
+    """构造带连接池的requests.Session，供所有出站HTTP请求复用（避免每次都重新建立TCP/TLS连接）"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
 
+# 全局共享的HTTP连接池
+http_session = build_http_session(getattr(Config, 'HTTP_POOL_SIZE', 20))
+
+# 各外部服务的地址（默认为线上地址，压测时可在Config中指向本地模拟服务）
+LLM_BASE_URL = getattr(Config, 'LLM_BASE_URL', "https://ark.cn-beijing.volces.com/api/v3/bots")
+EMBEDDING_BASE_URL = getattr(Config, 'EMBEDDING_BASE_URL', "https://ark.cn-beijing.volces.com/api/v3")
+FEISHU_DOMAIN = getattr(Config, 'FEISHU_DOMAIN', lark.FEISHU_DOMAIN)
+# 离线批量推理（OpenAI兼容的Files + Batches接口）的地址，默认与向量接口相同
+OFFLINE_BATCH_BASE_URL = getattr(Config, 'OFFLINE_BATCH_BASE_URL', EMBEDDING_BASE_URL)
+
+# 大模型接入点：可在Config.LLM_ENDPOINTS中配置多个（不同地址/密钥/bot id），按策略分摊负载并自动切换；
+# 未配置时只使用LLM_BASE_URL + API_KEY一个接入点
+LLM_ENDPOINTS = getattr(Config, 'LLM_ENDPOINTS', None) or [
+    {"name": "default", "base_url": LLM_BASE_URL, "api_key": Config.API_KEY},
+]
+llm_client = build_llm_router(LLM_ENDPOINTS, getattr(Config, 'LLM_ROUTING_STRATEGY', 'weighted_round_robin'))
+
+# 所有出站客户端都显式设置超时（各SDK默认的超时长达数分钟，卡住的调用会一直占用线程）
 embedding_client = Ark(
+    base_url=EMBEDDING_BASE_URL,
+    api_key=Config.API_KEY,
+    timeout=EMBEDDING_TIMEOUT,
+)
+
+# 离线批量推理只做上传/提交/查询/下载，单次调用的超时不需要很长
+batch_inference_client = OpenAI(
+    base_url=OFFLINE_BATCH_BASE_URL,
     api_key=Config.API_KEY,
+    timeout=getattr(Config, 'OFFLINE_BATCH_HTTP_TIMEOUT', 60),
 )
 
-dowei_client = (lark.Client.builder() 
-        .app_id(Config.APP_ID) 
-        .app_secret(Config.APP_SECRET) 
-        .log_level(lark.LogLevel.DEBUG) 
+dowei_client = (lark.Client.builder()
+        .app_id(Config.APP_ID)
+        .app_secret(Config.APP_SECRET)
+        .domain(FEISHU_DOMAIN)
+        .log_level(LARK_LOG_LEVEL)
+        .timeout(FEISHU_TIMEOUT)
         .build())
 
 doc_client = (
         lark.Client.builder()
         .enable_set_token(True)
-        .log_level(lark.LogLevel.DEBUG)
+        .domain(FEISHU_DOMAIN)
+        .log_level(LARK_LOG_LEVEL)
+        .timeout(FEISHU_TIMEOUT)
         .build()
-    )
\ No newline at end of file
+    )
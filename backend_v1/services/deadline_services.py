@@ -0,0 +1,159 @@
+import time
+import contextvars
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from functools import wraps
+from contextlib import contextmanager
+from flask import request
+from config import Config
+from services.metrics_services import DEADLINE_EXCEEDED
+
+# 单个分析接口的总耗时预算（秒），客户端可通过请求头X-Request-Timeout要求更短的预算
+SINGLE_REQUEST_DEADLINE = getattr(Config, 'SINGLE_REQUEST_DEADLINE', 120)
+# 批量分析中每一行的耗时预算（秒，从开始执行该行算起）
+BATCH_ROW_DEADLINE = getattr(Config, 'BATCH_ROW_DEADLINE', 180)
+# 各类出站调用的超时上限（秒），实际超时取上限与剩余预算中较小的一个
+URL_VALIDATION_TIMEOUT = getattr(Config, 'URL_VALIDATION_TIMEOUT', 5)
+PAPER_FETCH_TIMEOUT = getattr(Config, 'PAPER_FETCH_TIMEOUT', 10)
+LLM_TIMEOUT = getattr(Config, 'LLM_TIMEOUT', 120)
+EMBEDDING_TIMEOUT = getattr(Config, 'EMBEDDING_TIMEOUT', 30)
+FEISHU_TIMEOUT = getattr(Config, 'FEISHU_TIMEOUT', 30)
+
+# 当前请求/批量行的截止时间（Deadline对象），None表示没有限制
+_deadline = contextvars.ContextVar("deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求的耗时预算已用完"""
+    def __init__(self, stage: str = ""):
+        super().__init__("分析时间太长啦，已自动停止，请稍后再试或精简一下材料哦~")
+        self.stage = stage
+
+
+class StageCancelled(Exception):
+    """同一请求中的其他并发阶段已经失败，本阶段不必继续执行"""
+    def __init__(self, stage: str = ""):
+        super().__init__(f"{stage}阶段已取消")
+        self.stage = stage
+
+
+class Deadline:
+    """
+    截止时间（time.monotonic()的绝对值，None表示不限时），可以嵌套：子截止时间不晚于父截止时间，
+    父截止时间被取消时子截止时间也视为取消
+    """
+    def __init__(self, seconds: float = None, parent: "Deadline" = None):
+        self.parent = parent
+        at = None if seconds is None else time.monotonic() + seconds
+        if parent is not None and parent.at is not None:
+            at = parent.at if at is None else min(at, parent.at)
+        self.at = at
+        self._cancelled = False
+
+    def cancel(self) -> None:
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled or (self.parent is not None and self.parent.cancelled)
+
+    def remaining(self):
+        return None if self.at is None else self.at - time.monotonic()
+
+
+def current_deadline():
+    """当前的截止时间（Deadline对象），没有限制时为None"""
+    return _deadline.get()
+
+
+def remaining():
+    """剩余的预算（秒），没有限制时为None"""
+    current = _deadline.get()
+    return None if current is None else current.remaining()
+
+
+def check_deadline(stage: str) -> None:
+    """预算已用完时抛出DeadlineExceeded，所在的并发阶段组已失败时抛出StageCancelled"""
+    current = _deadline.get()
+    if current is None:
+        return
+    if current.cancelled:
+        raise StageCancelled(stage)
+    left = current.remaining()
+    if left is not None and left <= 0:
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+def stage_timeout(stage: str, cap: float) -> float:
+    """某个阶段可用的超时时间：不超过cap，也不超过剩余预算；预算已用完时抛出DeadlineExceeded"""
+    check_deadline(stage)
+    left = remaining()
+    return cap if left is None else min(cap, left)
+
+
+@contextmanager
+def deadline(seconds: float = None):
+    """
+    with块内的截止时间为 now + seconds（已有更早的截止时间时沿用更早的）；
+    seconds为None时只创建一个可单独取消的子范围。返回Deadline对象
+    """
+    current = Deadline(seconds, parent=_deadline.get())
+    token = _deadline.set(current)
+    try:
+        yield current
+    finally:
+        _deadline.reset(token)
+
+
+@contextmanager
+def use_deadline(current: Deadline):
+    """在其他线程或流式响应的生成器中沿用调用方的截止时间"""
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def bind_deadline(func):
+    """包装提交到线程池的函数，使其沿用提交时的截止时间"""
+    current = _deadline.get()
+    if current is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_deadline(current):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def wait_result(future, stage: str):
+    """在剩余预算内等待Future的结果，超时时取消（尚未开始的）任务并抛出DeadlineExceeded"""
+    try:
+        return future.result(timeout=remaining())
+    except FutureTimeoutError:
+        future.cancel()
+        DEADLINE_EXCEEDED.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+def with_request_deadline(default_seconds: float):
+    """
+    接口装饰器：为每个请求设置耗时预算，客户端可以通过X-Request-Timeout（秒）要求更短的预算。
+    流式接口需在生成器中用use_deadline(current_deadline())沿用该预算
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            seconds = default_seconds
+            try:
+                requested = float(request.headers.get("X-Request-Timeout", ""))
+                if requested > 0:
+                    seconds = min(seconds, requested)
+            except ValueError:
+                pass
+            with deadline(seconds):
+                return view(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -12,10 +12,19 @@ import threading
 from config import Config
 
 from services.general_services import calculate_content_hash as hash
+from services.cache_services import EmbeddingCache, get_embedding_cache
+from services.quantize_services import QuantizedMatrix, truncate_mrl, encode_vector_text, decode_vector_text
+from services.metrics_services import track_stage, record_failure
+
+EMBEDDING_MODEL = "doubao-embedding-large-text-250515"
+# 向量降维与量化：MRL截断维度（256/512/1024/2048，None为不截断），量化方式（none/int8）
+EMBEDDING_MRL_DIM = getattr(Config, 'EMBEDDING_MRL_DIM', None)
+EMBEDDING_QUANTIZATION = getattr(Config, 'EMBEDDING_QUANTIZATION', 'none')
 
 _jd_hash_cache = dict()
 
 
+@track_stage("feishu_fetch")
 def get_dowei_record(client, page_token):
     request: SearchAppTableRecordRequest = (SearchAppTableRecordRequest.builder() 
             .app_token(Config.CHUNK_APP_TOKEN) 
@@ -41,6 +50,7 @@ def get_dowei_record(client, page_token):
     data_need = data_dict['items']
     return has_more, data_need, page_token
 
+@track_stage("embedding")
 def encode(
     client, inputs: List[str], is_query: bool = False, mrl_dim: Optional[int] = None
 ):
@@ -54,7 +64,7 @@ def encode(
             for i in inputs
         ]
     resp = client.embeddings.create(
-        model="doubao-embedding-large-text-250515",
+        model=EMBEDDING_MODEL,
         input=inputs,
         encoding_format="float",
     )
@@ -66,6 +76,7 @@ def encode(
     embedding = torch.nn.functional.normalize(embedding, dim=1, p=2).float().numpy()
     return embedding
 
+@track_stage("feishu_write")
 def embedding_update(client ,record_list: list, data_list: list):
 
     # 构造请求对象
@@ -76,7 +87,7 @@ def embedding_update(client ,record_list: list, data_list: list):
         .ignore_consistency_check(True) 
         .request_body(BatchUpdateAppTableRecordRequestBody.builder()
             .records([AppTableRecord.builder()
-                .fields({"向量":json.dumps(data_list[i])})
+                .fields({"向量":data_list[i]})
                 .record_id(record_list[i])
                 .build()
                 for i in range(len(data_list))])
@@ -88,6 +99,7 @@ def embedding_update(client ,record_list: list, data_list: list):
 
     # 处理失败返回
     if not response.success():
+        record_failure("feishu_write", f"code_{response.code}")
         lark.logger.error(
             f"client.bitable.v1.app_table_record.batch_update failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}, resp: \n{json.dumps(json.loads(response.raw.content), indent=4, ensure_ascii=False)}")
         return
@@ -126,13 +138,22 @@ def feishu_dowei_embedding(dowei_client, embedding_client):
 
 
     # 进行语义编码
-    embedding_data = encode(embedding_client, _txt_update)
-    embedding_list = [item.tolist() for item in embedding_data]
+    if not _txt_update:
+        lark.logger.info("岗位介绍无变化，无需重新计算向量")
+        return
+    embedding_data = encode(embedding_client, _txt_update, mrl_dim=EMBEDDING_MRL_DIM)
+    embedding_list = [encode_vector_text(item.tolist(), EMBEDDING_QUANTIZATION) for item in embedding_data]
     embedding_update(dowei_client, _record_recalculate, embedding_list)
 
-def get_embedding(client):
+@track_stage("feishu_fetch")
+def get_embedding_records(client, page_size: int = 100) -> tuple[list[str], np.ndarray]:
+    """
+    分页读取多维表格中所有岗位的向量
+    :return: (record_id列表, 向量矩阵)，二者按行一一对应；尚未计算向量的记录会被跳过
+    """
     page_token = ""
     has_more = True
+    record_ids = []
     final = []
 
     while has_more:
@@ -141,27 +162,142 @@ def get_embedding(client):
                 .table_id(Config.CHUNK_TABLE_ID) 
                 .user_id_type("open_id") 
                 .page_token(page_token) 
-                .page_size(10) 
+                .page_size(page_size) 
                 .request_body(SearchAppTableRecordRequestBody.builder().view_id(Config.CHUNK_VIEW_ID).field_names(["向量"]).build())
                 .build())
         response: SearchAppTableRecordResponse = client.bitable.v1.app_table_record.search(request) 
+        if not response.success():
+            raise Exception(f"client.bitable.v1.app_table_record.search failed, code: {response.code}, msg: {response.msg}, log_id: {response.get_log_id()}")
         data = lark.JSON.marshal(response.data, indent=4)
         data_dict = json.loads(data)
         has_more = data_dict['has_more']
         page_token = data_dict['page_token'] if 'page_token' in data_dict.keys() else ''
-        data_need = data_dict['items']
+        data_need = data_dict.get('items') or []
         for item in data_need:
-            item = item['fields']['向量'][0]['text']
-            vector = json.loads(item)
-            final.append(np.array(vector))
+            if '向量' not in item['fields']:
+                continue
+            # 兼容JSON数组和int8两种存储格式，并统一截断到配置的MRL维度
+            vector = truncate_mrl(decode_vector_text(item['fields']['向量'][0]['text']), EMBEDDING_MRL_DIM)[0]
+            record_ids.append(item['record_id'])
+            final.append(vector)
+
+    return record_ids, np.array(final, dtype=np.float32)
+
+def get_embedding(client):
+    _, matrix = get_embedding_records(client)
+    return matrix
+
+# 岗位向量的内存缓存（行已归一化，可直接用矩阵乘法计算余弦相似度）
+_jd_vectors = {"record_ids": [], "matrix": None}
+_jd_vectors_lock = threading.Lock()
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """按行L2归一化"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+def refresh_jd_vectors(client) -> None:
+    """从多维表格重新加载岗位向量到内存缓存"""
+    record_ids, matrix = get_embedding_records(client)
+    if len(record_ids):
+        # int8模式只减小多维表格中向量文本的体积：读取时已反量化为float32（精度与int8相同），
+        # 内存中直接保存float32矩阵，扫描走BLAS，比在int8上逐块转换计算更快
+        matrix = normalize_rows(matrix)
+    with _jd_vectors_lock:
+        _jd_vectors["record_ids"] = record_ids
+        _jd_vectors["matrix"] = matrix
+    lark.logger.info(f"岗位向量缓存已更新，共 {len(record_ids)} 条")
+
+def get_jd_vectors(client) -> tuple[list[str], np.ndarray]:
+    """获取缓存的岗位向量，首次调用时加载"""
+    if _jd_vectors["matrix"] is None:
+        refresh_jd_vectors(client)
+    with _jd_vectors_lock:
+        return _jd_vectors["record_ids"], _jd_vectors["matrix"]
+
+def cosine_similarity_matrix(query_matrix: np.ndarray, jd_matrix) -> np.ndarray:
+    """一次矩阵乘法计算所有查询与所有岗位的余弦相似度，返回形状为 (查询数, 岗位数)；jd_matrix可以是QuantizedMatrix"""
+    query_matrix = normalize_rows(query_matrix.astype(np.float32))
+    if isinstance(jd_matrix, QuantizedMatrix):
+        return jd_matrix.dot(query_matrix)
+    return query_matrix @ jd_matrix.T
+
+def cached_encode(
+    client, inputs: List[str], is_query: bool = False, mrl_dim: Optional[int] = None, cache: EmbeddingCache = None
+):
+    """带缓存的encode：命中缓存的文本不再请求向量接口，只对未命中的部分调用encode"""
+    if cache is None:
+        cache = get_embedding_cache(
+            getattr(Config, 'EMBEDDING_CACHE_PATH', None),
+            getattr(Config, 'EMBEDDING_CACHE_MAX_ENTRIES', 50000),
+        )
+    keys = [EmbeddingCache.make_key(EMBEDDING_MODEL, text, is_query, mrl_dim) for text in inputs]
+    hits = cache.get_many(list(set(keys)))
+
+    # 同一批里重复的文本只请求一次
+    missing = {}
+    for key, text in zip(keys, inputs):
+        if key not in hits and key not in missing:
+            missing[key] = text
+    if missing:
+        vectors = encode(client, list(missing.values()), is_query=is_query, mrl_dim=mrl_dim)
+        fresh = dict(zip(missing.keys(), vectors))
+        cache.put_many(fresh)
+        hits.update(fresh)
+
+    return np.vstack([hits[key] for key in keys]).astype(np.float32)
+
+def embed_texts(embedding_client, texts: list[str], batch_size: int = 32, is_query: bool = True) -> np.ndarray:
+    """分批请求向量接口（带缓存），返回按行对应texts的向量矩阵"""
+    query_vectors = []
+    for start in range(0, len(texts), batch_size):
+        query_vectors.append(cached_encode(
+            embedding_client, texts[start:start + batch_size], is_query=is_query, mrl_dim=EMBEDDING_MRL_DIM
+        ))
+    return np.vstack(query_vectors)
+
+def best_jd_matches(embedding_client, dowei_client, texts: list[str], batch_size: int = 32) -> list[tuple[str, float]]:
+    """
+    计算每段文本最匹配的岗位
+    :return: 与texts一一对应的 (record_id, 相似度)；文本为空或没有岗位向量时为 ("", 0.0)
+    """
+    matches = [("", 0.0)] * len(texts)
+    for i, top in enumerate(top_k_jd_matches(embedding_client, dowei_client, texts, k=1, batch_size=batch_size)):
+        if top:
+            matches[i] = (top[0]["record_id"], top[0]["score"])
+    return matches
+
+def top_k_jd_matches(embedding_client, dowei_client, texts: list[str], k: int = 5, batch_size: int = 32) -> list[list[dict]]:
+    """
+    纯向量匹配：所有文本组成一个查询矩阵，一次矩阵乘法与全部岗位向量计算相似度，取每行的top-k
+    :return: 与texts一一对应的 [{"record_id": str, "score": float}, ...]（按相似度降序）；文本为空时为空列表
+    """
+    record_ids, jd_matrix = get_jd_vectors(dowei_client)
+    matches = [[] for _ in texts]
+    positions = [i for i, text in enumerate(texts) if text and text.strip()]
+    if not positions or not len(record_ids):
+        return matches
+
+    scores = cosine_similarity_matrix(
+        embed_texts(embedding_client, [texts[i] for i in positions], batch_size),
+        jd_matrix,
+    )
 
-    return np.array(final)
+    k = min(k, len(record_ids))
+    # argpartition只做部分排序，岗位数较多时比完整排序快
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    for row, i in enumerate(positions):
+        ordered = top[row][np.argsort(-scores[row, top[row]])]
+        matches[i] = [{"record_id": record_ids[j], "score": float(scores[row, j])} for j in ordered]
+    return matches
 
 
 def embedding_scheduler(dowei_client,embedding_client,interval=21600): 
     """后台定时任务：循环获取文档并休眠指定时间"""
     # 启动时先执行一次
     feishu_dowei_embedding(dowei_client, embedding_client)
+    refresh_jd_vectors(dowei_client)
     
     while True:
         try:
@@ -169,6 +305,7 @@ def embedding_scheduler(dowei_client,embedding_client,interval=21600):
             time.sleep(interval)
             # 执行更新
             feishu_dowei_embedding(dowei_client, embedding_client)
+            refresh_jd_vectors(dowei_client)
         except Exception as e:
             lark.logger.error(f"定时任务异常: {str(e)}", exc_info=True)
             # 异常后短暂休眠再重试，避免频繁报错
@@ -7,8 +7,9 @@ from lark_oapi.api.docs.v1 import *
 from config import Config
 import threading
 from functools import wraps
-from services.client_services import doc_client
+from services.client_services import doc_client, http_session, FEISHU_DOMAIN
 from services.general_services import calculate_content_hash as hash
+from services.metrics_services import track_stage
 
 # 合并缓存结构，用键值对统一管理
 _cache = {
@@ -27,6 +28,10 @@ _cache = {
 }
 
 _cache_lock = threading.Lock()
+# 文档内容是否已成功获取过（服务刚启动、后台线程尚未获取完成时为False）
+_docs_loaded = threading.Event()
+_docs_fetch_lock = threading.Lock()
+_docs_last_attempt = 0.0
 
 def thread_safe(func):
     """线程安全装饰器，确保缓存更新时的原子性"""
@@ -44,11 +49,10 @@ def get_cached_content():
 def fetch_feishu_docs():
     """单次获取所有飞书文档内容并更新缓存"""
     try:
-        # 获取访问令牌
-        token_info = get_access_token(Config.APP_ID, Config.APP_SECRET)
-        if not token_info:
+        # 获取访问令牌（优先使用缓存，临近过期才刷新）
+        access_token = token_manager.get_token()
+        if not access_token:
             raise Exception("获取access_token失败")
-        access_token = token_info["access_token"]
         
         # 批量获取文档内容
         contents = {
@@ -70,11 +74,28 @@ def fetch_feishu_docs():
         else:
             lark.logger.info("飞书文档内容无变化，无需更新缓存")
 
+        _docs_loaded.set()
         return True
     except Exception as e:
         lark.logger.error(f"飞书文档获取失败: {str(e)}", exc_info=True)
         return False
     
+def ensure_feishu_docs() -> bool:
+    """
+    缓存中还没有文档内容时（服务刚启动）立即获取一次，多个请求同时调用时只获取一次；
+    获取失败后60秒内不再重试（交给后台定时任务），避免每个请求都等待飞书超时
+    """
+    global _docs_last_attempt
+    if _docs_loaded.is_set():
+        return True
+    with _docs_fetch_lock:
+        if _docs_loaded.is_set():
+            return True
+        if time.monotonic() - _docs_last_attempt < 60:
+            return False
+        _docs_last_attempt = time.monotonic()
+        return fetch_feishu_docs()
+
 def feishu_scheduler(interval=21600): 
     """后台定时任务：循环获取文档并休眠指定时间"""
     # 启动时先执行一次
@@ -111,7 +132,7 @@ def get_access_token(app_id, app_secret):
     :return: 包含app_access_token和过期时间的字典，失败时返回None
     """
     # 定义API请求的URL
-    url = "https://open.feishu.cn/open-apis/auth/v3/app_access_token/internal"
+    url = f"{FEISHU_DOMAIN}/open-apis/auth/v3/app_access_token/internal"
 
     # 设置请求头
     headers = {"Content-Type": "application/json; charset=utf-8"}
@@ -120,8 +141,8 @@ def get_access_token(app_id, app_secret):
     payload = {"app_id": app_id, "app_secret": app_secret}
 
     try:
-        # 发送POST请求
-        response = requests.post(url, headers=headers, data=json.dumps(payload))
+        # 发送POST请求（复用全局连接池）
+        response = http_session.post(url, headers=headers, data=json.dumps(payload), timeout=10)
 
         # 解析响应内容
         result = response.json()
@@ -131,7 +152,7 @@ def get_access_token(app_id, app_secret):
             # 提取app_access_token和过期时间
             access_token = result.get("app_access_token")
             expire = result.get("expire")
-            lark.logger.info(result)
+            lark.logger.info(f"获取access_token成功，有效期 {expire} 秒")
 
             # 返回包含访问令牌和过期时间的字典
             return {
@@ -155,6 +176,55 @@ def get_access_token(app_id, app_secret):
         return None
 
 
+class AccessTokenManager:
+    """
+    线程安全的access_token管理器：缓存令牌，并在过期前 refresh_margin 秒提前刷新
+    """
+    def __init__(self, app_id: str, app_secret: str, refresh_margin: int = 300):
+        self.app_id = app_id
+        self.app_secret = app_secret
+        self.refresh_margin = refresh_margin
+        self._token_info = None
+        self._lock = threading.Lock()
+
+    def _is_valid(self, token_info) -> bool:
+        if not token_info:
+            return False
+        expire = token_info.get("expire") or 0
+        expire_at = token_info["timestamp"] + expire
+        return time.time() < expire_at - self.refresh_margin
+
+    def get_token(self, force_refresh: bool = False):
+        """返回可用的access_token，失败时返回None"""
+        # 快速路径：令牌有效时无需加锁等待网络请求
+        token_info = self._token_info
+        if not force_refresh and self._is_valid(token_info):
+            return token_info["access_token"]
+
+        with self._lock:
+            # 双重检查，避免多个线程同时刷新
+            if not force_refresh and self._is_valid(self._token_info):
+                return self._token_info["access_token"]
+            token_info = get_access_token(self.app_id, self.app_secret)
+            if not token_info:
+                return None
+            self._token_info = token_info
+            return token_info["access_token"]
+
+    def invalidate(self) -> None:
+        """主动作废缓存的令牌（例如接口返回令牌失效时）"""
+        with self._lock:
+            self._token_info = None
+
+
+token_manager = AccessTokenManager(
+    Config.APP_ID,
+    Config.APP_SECRET,
+    refresh_margin=getattr(Config, 'TOKEN_REFRESH_MARGIN', 300),
+)
+
+
+@track_stage("feishu_fetch")
 def get_feishu_doc_content(client, doc_token: str, access_token: str) -> str:
     """获取飞书文档内容
 
@@ -0,0 +1,139 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from config import Config
+from services.metrics_services import LLM_HEDGES
+from services.tracing_services import bind_current_span
+from services.deadline_services import bind_deadline
+
+logger = logging.getLogger(__name__)
+
+# 是否对单个候选人分析的大模型调用启用对冲请求
+HEDGE_ENABLED = getattr(Config, 'LLM_HEDGE_ENABLED', False)
+# 超过最近调用耗时的该分位数仍未返回时，发出第二个相同的请求
+HEDGE_PERCENTILE = getattr(Config, 'LLM_HEDGE_PERCENTILE', 0.95)
+# 样本不足时使用的固定对冲等待时间（秒）
+HEDGE_DEFAULT_DELAY = getattr(Config, 'LLM_HEDGE_DEFAULT_DELAY', 10)
+# 对冲请求数不超过主请求数的该比例（额外费用上限）
+HEDGE_BUDGET_RATIO = getattr(Config, 'LLM_HEDGE_BUDGET_RATIO', 0.05)
+
+
+class LatencyTracker:
+    """记录最近window次调用的耗时，用于计算对冲等待时间"""
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float):
+        """样本不足时返回None"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class HedgeBudget:
+    """
+    对冲预算：每个主请求积累ratio个额度，每个对冲请求消耗1个额度，
+    额度最多积累burst个，因此长期来看对冲请求不超过主请求的ratio倍
+    """
+    def __init__(self, ratio: float, burst: float = 10):
+        self.ratio = ratio
+        self.burst = burst
+        self._credits = min(1.0, burst)
+        self._lock = threading.Lock()
+
+    def on_request(self) -> None:
+        with self._lock:
+            self._credits = min(self.burst, self._credits + self.ratio)
+
+    def try_acquire(self) -> bool:
+        with self._lock:
+            if self._credits >= 1:
+                self._credits -= 1
+                return True
+            return False
+
+
+class Hedger:
+    """
+    对冲请求：主请求超过最近耗时的percentile分位数仍未返回时，（预算允许的话）再发出一个相同的请求，
+    取先成功返回的结果。只适用于结果确定（temperature=0且固定seed）的调用。
+    同步SDK无法中断已发出的HTTP请求，落后的请求会在后台执行完后丢弃结果；尚未开始的请求会被取消
+    """
+    def __init__(self, name: str, percentile: float, default_delay: float, budget_ratio: float, max_workers: int = 32):
+        self.name = name
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.tracker = LatencyTracker()
+        self.budget = HedgeBudget(budget_ratio)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}_hedge")
+
+    def hedge_delay(self) -> float:
+        delay = self.tracker.percentile(self.percentile)
+        return self.default_delay if delay is None else delay
+
+    def _timed(self, func):
+        def run():
+            start = time.monotonic()
+            result = func()
+            # 只记录成功调用的耗时（失败通常很快返回，会拉低分位数）
+            self.tracker.observe(time.monotonic() - start)
+            return result
+        return bind_deadline(bind_current_span(run))
+
+    def call(self, func, label: str):
+        """执行func（无参数），必要时发出对冲请求，label用于指标"""
+        self.budget.on_request()
+        primary = self._executor.submit(self._timed(func))
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        if not self.budget.try_acquire():
+            LLM_HEDGES.inc(bot_id=label, outcome="budget_exhausted")
+            return primary.result()
+
+        hedge = self._executor.submit(self._timed(func))
+        pending = {primary, hedge}
+        first_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    first_error = first_error or future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                outcome = "hedge_won" if future is hedge else "primary_won"
+                LLM_HEDGES.inc(bot_id=label, outcome=outcome)
+                return future.result()
+
+        LLM_HEDGES.inc(bot_id=label, outcome="both_failed")
+        raise first_error
+
+
+_hedgers = {}
+_hedgers_lock = threading.Lock()
+
+
+def get_hedger(name: str) -> Hedger:
+    """按名称（通常为bot id）获取对冲器，不同bot的耗时分别统计"""
+    with _hedgers_lock:
+        if name not in _hedgers:
+            _hedgers[name] = Hedger(
+                name,
+                HEDGE_PERCENTILE,
+                HEDGE_DEFAULT_DELAY,
+                HEDGE_BUDGET_RATIO,
+                getattr(Config, 'LLM_HEDGE_MAX_WORKERS', 32),
+            )
+        return _hedgers[name]
@@ -0,0 +1,250 @@
+import numpy as np
+
+
+def _normalize(vectors) -> np.ndarray:
+    """转成float32并按行L2归一化（索引内部统一用内积表示余弦相似度）"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """返回一维scores中最大的k个下标（降序）"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class VectorIndex:
+    """
+    向量索引基类：负责向量存储、增量插入/删除和持久化，子类实现search。
+    删除只做标记，被删除的行超过一定比例时自动压缩。
+    """
+    kind = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._ids = []
+        self._alive = np.empty(0, dtype=bool)
+        self._id_to_row = {}
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def add(self, ids: list[str], vectors) -> None:
+        """插入向量；已存在的id会被覆盖（每次插入会复制底层矩阵，尽量批量插入）"""
+        vectors = _normalize(vectors)
+        if vectors.shape != (len(ids), self.dim):
+            raise ValueError(f"向量维度不匹配，期望 ({len(ids)}, {self.dim})，实际 {vectors.shape}")
+        self.remove([i for i in ids if i in self._id_to_row])
+
+        start = len(self._ids)
+        self._vectors = np.vstack([self._vectors, vectors])
+        self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+        for offset, record_id in enumerate(ids):
+            self._ids.append(record_id)
+            self._id_to_row[record_id] = start + offset
+        self._on_add(np.arange(start, start + len(ids)))
+
+    def remove(self, ids: list[str]) -> None:
+        """删除向量（标记删除），不存在的id会被忽略"""
+        for record_id in ids:
+            row = self._id_to_row.pop(record_id, None)
+            if row is not None:
+                self._alive[row] = False
+        if len(self._ids) and (len(self._ids) - len(self)) > 0.3 * len(self._ids):
+            self._compact()
+
+    def search(self, queries, k: int = 10) -> list[list[tuple[str, float]]]:
+        """返回每个查询的top-k结果 [(id, 相似度), ...]"""
+        raise NotImplementedError
+
+    def _on_add(self, rows: np.ndarray) -> None:
+        """子类在新向量写入后更新自身结构"""
+        pass
+
+    def _compact(self) -> None:
+        """物理删除被标记的行并重建下标"""
+        keep = np.flatnonzero(self._alive)
+        self._vectors = self._vectors[keep]
+        self._ids = [self._ids[row] for row in keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self._id_to_row = {record_id: row for row, record_id in enumerate(self._ids)}
+        self._rebuild()
+
+    def _rebuild(self) -> None:
+        pass
+
+    def _extra_state(self) -> dict:
+        return {}
+
+    def _load_extra_state(self, state) -> None:
+        pass
+
+    def save(self, path: str) -> None:
+        """保存到磁盘（numpy的npz格式）"""
+        self._compact()
+        np.savez(
+            path,
+            kind=np.array(self.kind),
+            dim=np.array(self.dim),
+            vectors=self._vectors,
+            ids=np.array(self._ids, dtype=str),
+            **self._extra_state(),
+        )
+
+    @staticmethod
+    def load(path: str) -> "VectorIndex":
+        """从磁盘加载，自动识别索引类型"""
+        with np.load(path, allow_pickle=False) as state:
+            kind = str(state["kind"])
+            index = INDEX_BACKENDS[kind](int(state["dim"]))
+            index._vectors = state["vectors"].astype(np.float32)
+            index._ids = [str(record_id) for record_id in state["ids"]]
+            index._alive = np.ones(len(index._ids), dtype=bool)
+            index._id_to_row = {record_id: row for row, record_id in enumerate(index._ids)}
+            index._load_extra_state(state)
+        return index
+
+
+class ExactIndex(VectorIndex):
+    """精确检索：一次矩阵乘法计算与全部向量的相似度"""
+    kind = "exact"
+
+    def search(self, queries, k: int = 10) -> list[list[tuple[str, float]]]:
+        queries = _normalize(queries)
+        if not len(self):
+            return [[] for _ in range(len(queries))]
+        scores = queries @ self._vectors.T
+        scores[:, ~self._alive] = -np.inf
+        k = min(k, len(self))
+        return [
+            [(self._ids[row], float(row_scores[row])) for row in _top_k(row_scores, k)]
+            for row_scores in scores
+        ]
+
+
+class IVFIndex(VectorIndex):
+    """
+    倒排文件（IVF）近似检索：用k-means把向量划分到nlist个簇，查询时只扫描最近的nprobe个簇。
+    向量数达到训练阈值前退化为精确检索；训练后新插入的向量直接分配到最近的簇。
+    """
+    kind = "ivf"
+
+    def __init__(self, dim: int, nlist: int = 256, nprobe: int = 16, train_size: int = None, seed: int = 42):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or nlist * 39  # 每个簇至少约39个样本，k-means才比较稳定
+        self.seed = seed
+        self._centroids = None
+        self._assign = np.empty(0, dtype=np.int64)
+        self._lists = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def train(self, vectors=None, iterations: int = 10, max_samples: int = 50000) -> None:
+        """球面k-means训练聚类中心（默认使用已插入的向量）"""
+        data = _normalize(vectors) if vectors is not None else self._vectors[self._alive]
+        if len(data) < self.nlist:
+            raise ValueError(f"训练样本数({len(data)})少于簇数({self.nlist})")
+        rng = np.random.default_rng(self.seed)
+        if len(data) > max_samples:
+            data = data[rng.choice(len(data), max_samples, replace=False)]
+
+        centroids = data[rng.choice(len(data), self.nlist, replace=False)].copy()
+        for _ in range(iterations):
+            assign = (data @ centroids.T).argmax(axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, data)
+            counts = np.bincount(assign, minlength=self.nlist)
+            # 空簇重新随机选一个样本作为中心
+            empty = counts == 0
+            sums[empty] = data[rng.choice(len(data), int(empty.sum()), replace=False)]
+            centroids = _normalize(sums)
+
+        self._centroids = centroids
+        self._rebuild()
+
+    def _on_add(self, rows: np.ndarray) -> None:
+        if not self.is_trained:
+            self._assign = np.concatenate([self._assign, np.zeros(len(rows), dtype=np.int64)])
+            if len(self) >= self.train_size:
+                self.train()
+            return
+        assign = (self._vectors[rows] @ self._centroids.T).argmax(axis=1)
+        self._assign = np.concatenate([self._assign, assign])
+        for row, cluster in zip(rows, assign):
+            self._lists[cluster].append(row)
+
+    def _rebuild(self) -> None:
+        if not self.is_trained:
+            self._assign = np.zeros(len(self._ids), dtype=np.int64)
+            return
+        self._assign = (self._vectors @ self._centroids.T).argmax(axis=1) if len(self._ids) else np.empty(0, dtype=np.int64)
+        order = np.argsort(self._assign, kind="stable")
+        bounds = np.searchsorted(self._assign[order], np.arange(self.nlist + 1))
+        self._lists = [list(order[bounds[i]:bounds[i + 1]]) for i in range(self.nlist)]
+
+    def search(self, queries, k: int = 10) -> list[list[tuple[str, float]]]:
+        queries = _normalize(queries)
+        if not len(self):
+            return [[] for _ in range(len(queries))]
+
+        results = []
+        if not self.is_trained:
+            scores = queries @ self._vectors.T
+            scores[:, ~self._alive] = -np.inf
+            for row_scores in scores:
+                top = [row for row in _top_k(row_scores, k) if self._alive[row]]
+                results.append([(self._ids[row], float(row_scores[row])) for row in top])
+            return results
+
+        probe = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :self.nprobe]
+        for query, clusters in zip(queries, probe):
+            rows = np.fromiter(
+                (row for cluster in clusters for row in self._lists[cluster]), dtype=np.int64
+            )
+            rows = rows[self._alive[rows]] if len(rows) else rows
+            if not len(rows):
+                results.append([])
+                continue
+            scores = self._vectors[rows] @ query
+            results.append([(self._ids[rows[i]], float(scores[i])) for i in _top_k(scores, k)])
+        return results
+
+    def _extra_state(self) -> dict:
+        state = {
+            "nlist": np.array(self.nlist),
+            "nprobe": np.array(self.nprobe),
+            "train_size": np.array(self.train_size),
+        }
+        if self.is_trained:
+            state["centroids"] = self._centroids
+        return state
+
+    def _load_extra_state(self, state) -> None:
+        self.nlist = int(state["nlist"])
+        self.nprobe = int(state["nprobe"])
+        self.train_size = int(state["train_size"])
+        self._centroids = state["centroids"].astype(np.float32) if "centroids" in state.files else None
+        self._rebuild()
+
+
+INDEX_BACKENDS = {
+    ExactIndex.kind: ExactIndex,
+    IVFIndex.kind: IVFIndex,
+}
+
+
+def create_vector_index(kind: str, dim: int, **kwargs) -> VectorIndex:
+    """按名称创建向量索引（exact / ivf）"""
+    if kind not in INDEX_BACKENDS:
+        raise ValueError(f"不支持的向量索引类型: {kind}，可选: {', '.join(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[kind](dim, **kwargs)
@@ -1,7 +1,9 @@
 import os
+import time
 import tempfile
 from werkzeug.datastructures import FileStorage
-from flask import current_app, logging
+from flask import current_app
+import logging
 import pdfplumber
 from pdfplumber.utils.exceptions import PdfminerException
 from pdfminer.pdfdocument import PDFEncryptionError
@@ -12,6 +14,27 @@ from requests.exceptions import RequestException
 from pathlib import Path
 import mimetypes
 import csv
+import io
+import zipfile
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, TimeoutError as FutureTimeoutError
+from services.text_services import PAGE_BREAK
+from services.metrics_services import track_stage, observe_future
+from services.tracing_services import span
+from services.deadline_services import (
+    DeadlineExceeded,
+    StageCancelled,
+    check_deadline,
+    stage_timeout,
+    wait_result,
+    remaining,
+    URL_VALIDATION_TIMEOUT,
+    BATCH_ROW_DEADLINE,
+)
+
+logger = logging.getLogger(__name__)
 
 # 自定义error类型
 class InvalidFileTypeError(Exception):
@@ -44,6 +67,10 @@ class CSVReadError(Exception):
     """CSV读取异常，用来反馈不同类型的读取错误"""
     pass
 
+class ZipReadError(Exception):
+    """ZIP压缩包读取异常，用来反馈不同类型的读取错误"""
+    pass
+
 class InvalidURLError(Exception):
     """URL格式不符合要求"""
     def __str__(self):
@@ -92,10 +119,24 @@ def validate_csv_file_type(file: FileStorage) -> None:
     if mime_type not in allowed_mime_types:
         raise InvalidFileTypeError()"""
 
+def validate_zip_file_type(file: FileStorage) -> None:
+    """验证文件是否为ZIP类型（无需保存临时文件）"""
+    # 1. 检查文件扩展名（快速筛选）
+    if not file.filename.lower().endswith('.zip'):
+        raise InvalidFileTypeError()
+
+    # 2. 检查文件前两个字节（魔数），ZIP文件以'PK'开头
+    header = file.stream.read(2)
+    file.stream.seek(0)  # 重置文件指针
+
+    if header != b'PK':
+        raise InvalidFileTypeError()
+
 # 检查文件是否过大
-def validate_file_size(file: FileStorage) -> None:
+def validate_file_size(file: FileStorage, max_size_mb: int = None) -> None:
     """验证文件大小是否超过限制，必要时流式计算大小"""
-    max_size_mb = current_app.config.get('MAX_FILE_SIZE', 10)
+    if max_size_mb is None:
+        max_size_mb = current_app.config.get('MAX_FILE_SIZE', 10)
     max_size_bytes = max_size_mb * 1024 * 1024
     
     # 优先使用content_length属性（如果存在）
@@ -183,37 +224,59 @@ def save_csv_temp_file(file: FileStorage) -> str:
 
     return temp_file_path
 
-# 读取pdf内容并以文字输出(从临时文件处获取pdf)
-def read_pdf(file_path: str) -> str:
+def save_zip_temp_file(file: FileStorage) -> str:
+    """保存ZIP文件到临时目录（压缩包单独使用更大的大小限制）"""
+    # 1. 验证文件类型和大小
+    validate_zip_file_type(file)
+    validate_file_size(file, current_app.config.get('MAX_ZIP_FILE_SIZE', 200))
+
+    # 2. 创建并保存临时文件
+    temp_dir = os.path.join(tempfile.gettempdir(), 'zipcontent_system')
+    os.makedirs(temp_dir, exist_ok=True)
+
+    with tempfile.NamedTemporaryFile(
+        mode='wb',
+        dir=temp_dir,
+        prefix='resumes_',
+        suffix='.zip',
+        delete=False
+    ) as temp_file:
+        temp_file_path = temp_file.name
+
+        # 分块写入文件，避免大文件占用过多内存
+        chunk_size = 64 * 1024
+        with file.stream as stream:
+            stream.seek(0)
+            while chunk := stream.read(chunk_size):
+                temp_file.write(chunk)
+
+    return temp_file_path
+
+def extract_pdf_text(source) -> str:
     """
-    读取PDF文件内容并返回文本
-    :param file_path: 临时文件路径
+    提取PDF文字内容，source可以是文件路径或文件对象（如BytesIO）
     :return: 提取的文本内容（所有页合并）
     """
-    # 基础校验： 1. 文件是否存在（防止系统自动删除等意外情况）；2. 简单检验扩展名，防止人为修改
-    if not os.path.exists(file_path):
-        raise PDFReadError("文件似乎飘走啦，辛苦你在上传一下哟~")
-    
-    if not file_path.lower().endswith('.pdf'):
-        raise PDFReadError("文件格式不是pdf，请上传pdf文件呢？")
-    
-    # 读取pdf内容，若是有错误则输出错误信息
     try:
-        # 读取pdf文字内容
-        file_path = str(Path(file_path))  # 确保路径是Path对象
-        with pdfplumber.open(file_path) as pdf:
-            full_text = ""
+        with pdfplumber.open(source) as pdf:
+            page_texts = []
             for page in pdf.pages:
+                # 逐页检查耗时预算（在进程池中解析时没有预算，由调用方等待结果时限时）
+                check_deadline("pdf_parse")
                 page_text = page.extract_text()
                 if page_text:
-                    full_text += page_text + "\n\n" # 空格符表示下一个页面
+                    page_texts.append(page_text)
+            # 各页之间用分页符分隔，去除页眉页脚时据此识别每页的首行/末行
+            full_text = PAGE_BREAK.join(page_texts)
 
             if not full_text.strip():
                 raise PDFReadError("没有可识别的文字内容哟，请尝试上传非扫描版的简历！")
-            
+
         return full_text
-            
+
         # 其他error的输出
+    except (PDFReadError, DeadlineExceeded, StageCancelled):
+        raise
     except PDFSyntaxError:
         raise PDFReadError(f"PDF文件好像有点小脾气哦～它可能在传输中受伤了，请尝试重新下载或用其他软件打开后另存为PDF")
     except PDFEncryptionError:
@@ -222,9 +285,32 @@ def read_pdf(file_path: str) -> str:
         raise PDFReadError(f"这个PDF文件有点特别呢～系统暂时无法解析它，请确认文件格式是否正确")
     except Exception as e:
         # 其他未知错误（隐藏技术细节）
-        logging.error(f"PDF读取失败: {str(e)}", exc_info=True)
+        logger.error(f"PDF读取失败: {str(e)}", exc_info=True)
         raise PDFReadError("解析文件时出了点小问题，请重试或换一个文件试试；如果多次有误，请联系技术同学。")
+
+def read_pdf_bytes(data: bytes) -> str:
+    """从内存中的PDF字节读取文本（用于压缩包内的文件，无需落盘）"""
+    if not data.startswith(b'%PDF'):
+        raise PDFReadError("文件格式不是pdf，请上传pdf文件呢？")
+    return extract_pdf_text(io.BytesIO(data))
+
+# 读取pdf内容并以文字输出(从临时文件处获取pdf)
+def read_pdf(file_path: str) -> str:
+    """
+    读取PDF文件内容并返回文本
+    :param file_path: 临时文件路径
+    :return: 提取的文本内容（所有页合并）
+    """
+    # 基础校验： 1. 文件是否存在（防止系统自动删除等意外情况）；2. 简单检验扩展名，防止人为修改
+    if not os.path.exists(file_path):
+        raise PDFReadError("文件似乎飘走啦，辛苦你在上传一下哟~")
     
+    if not file_path.lower().endswith('.pdf'):
+        raise PDFReadError("文件格式不是pdf，请上传pdf文件呢？")
+    
+    # 读取pdf内容，若是有错误则输出错误信息
+    return extract_pdf_text(str(Path(file_path)))
+
 def read_csv(file_path: str) -> list[str]:
     """
     读取CSV文件内容并返回字典列表
@@ -256,7 +342,7 @@ def read_csv(file_path: str) -> list[str]:
 
     # 聚焦csv模块自带的错误处理
     except csv.Error as e:
-        logging.error(f"CSV读取错误: {str(e)}", exc_info=True)
+        logger.error(f"CSV读取错误: {str(e)}", exc_info=True)
         raise CSVReadError("文件格式好像有问题呢，请重试一下吧~")
     # 基础文件操作错误（与文件本身相关，非CSV格式问题）
     except UnicodeDecodeError:
@@ -264,9 +350,155 @@ def read_csv(file_path: str) -> list[str]:
     except PermissionError:
         raise CSVReadError("文件把我们拒之门外了，可能是权限问题，请检查文件权限或联系技术同学~")
     except Exception as e:
-        logging.error(f"CSV读取失败: {str(e)}", exc_info=True) 
+        logger.error(f"CSV读取失败: {str(e)}", exc_info=True) 
         raise CSVReadError("读取CSV文件时出了点小问题，请重试或联系技术同学。")
 
+# PDF解析为CPU密集型任务，使用进程池并行解析（延迟创建，全局复用）
+_pdf_executor = None
+_batch_pdf_executor = None
+_pdf_executor_lock = threading.Lock()
+
+def create_pdf_executor(max_workers: int, initializer=None, initargs: tuple = ()) -> ProcessPoolExecutor:
+    """
+    创建PDF解析进程池。服务进程中有多个后台线程（日志、定时任务、连接池），fork时若其他线程正持有锁，
+    子进程中的锁永远不会释放而死锁，因此用forkserver启动子进程（预加载本模块，子进程启动时无需重复导入）
+    """
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["services.input_services"])
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context, initializer=initializer, initargs=initargs)
+
+def get_pdf_executor() -> ProcessPoolExecutor:
+    """获取交互式请求（单个候选人分析）使用的PDF解析进程池"""
+    global _pdf_executor
+    if _pdf_executor is None:
+        with _pdf_executor_lock:
+            if _pdf_executor is None:
+                _pdf_executor = create_pdf_executor(min(4, os.cpu_count() or 1))
+    return _pdf_executor
+
+def get_batch_pdf_executor() -> ProcessPoolExecutor:
+    """
+    获取批量任务（论文下载后解析、ZIP批量）使用的PDF解析进程池：与交互式请求的进程池分开，
+    单个分析的简历解析不会排在大量批量论文后面；子进程降低调度优先级，CPU紧张时让出给交互式请求
+    """
+    global _batch_pdf_executor
+    if _batch_pdf_executor is None:
+        with _pdf_executor_lock:
+            if _batch_pdf_executor is None:
+                _batch_pdf_executor = create_pdf_executor(min(4, os.cpu_count() or 1), os.nice, (10,))
+    return _batch_pdf_executor
+
+def read_pdfs_parallel(file_paths: list[str]) -> list[str]:
+    """
+    并行读取多个PDF文件，按传入顺序返回文本；无论成功与否都会删除临时文件
+    :raises PDFReadError: 任意一个文件解析失败时抛出
+    """
+    try:
+        if len(file_paths) == 1:
+            with track_stage("pdf_parse"):
+                return [read_pdf(file_paths[0])]  # 单个文件直接解析，省去进程间通信
+        futures = [get_pdf_executor().submit(read_pdf, path) for path in file_paths]
+        for future in futures:
+            observe_future(future, "pdf_parse")
+        try:
+            return [wait_result(future, "pdf_parse") for future in futures]
+        finally:
+            for future in futures:
+                future.cancel()
+    finally:
+        for path in file_paths:
+            if os.path.exists(path):
+                os.remove(path)
+
+def _decode_zip_filename(info: zipfile.ZipInfo) -> str:
+    """Windows下压缩的中文文件名通常是GBK编码，未标记UTF-8时尝试按GBK还原"""
+    if info.flag_bits & 0x800:
+        return info.filename
+    try:
+        return info.filename.encode('cp437').decode('gbk')
+    except (UnicodeEncodeError, UnicodeDecodeError):
+        return info.filename
+
+def list_zip_pdfs(zip_path: str) -> list[zipfile.ZipInfo]:
+    """
+    列出压缩包中的PDF文件（跳过目录和macOS生成的元数据文件）
+    :raises ZipReadError: 压缩包损坏、没有PDF或文件数过多时抛出
+    """
+    # 压缩包内的PDF数即批量分析的行数，默认与CSV共用MAX_BATCH_ROWS
+    max_entries = current_app.config.get('MAX_ZIP_ENTRIES', current_app.config.get('MAX_BATCH_ROWS', 1000))
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            infos = [
+                info for info in zf.infolist()
+                if not info.is_dir()
+                and info.filename.lower().endswith('.pdf')
+                and not info.filename.startswith('__MACOSX/')
+                and not os.path.basename(info.filename).startswith('._')
+            ]
+    except zipfile.BadZipFile:
+        raise ZipReadError("压缩包好像损坏了呢，请重新压缩后再上传吧~")
+
+    if not infos:
+        raise ZipReadError("压缩包里没有找到PDF文件哦，请检查一下~")
+    if len(infos) > max_entries:
+        raise ZipReadError(f"压缩包里的文件太多啦，一次最多处理{max_entries}个PDF哦~")
+    return infos
+
+def _resolve_pdf_future(index: int, filename: str, future: Future, error: str, submitted_at: float = None):
+    """
+    等待解析结果，返回 (index, filename, text, error)；
+    每个文件从提交起最多等待BATCH_ROW_DEADLINE秒（不超过请求的剩余预算），超时的文件记为该行的错误
+    """
+    if future is None:
+        return index, filename, "", error
+    timeout = max(0.0, submitted_at + BATCH_ROW_DEADLINE - time.monotonic())
+    left = remaining()
+    if left is not None:
+        timeout = max(0.0, min(timeout, left))
+    try:
+        return index, filename, future.result(timeout=timeout), None
+    except FutureTimeoutError:
+        future.cancel()
+        logger.error(f"PDF解析超时: {filename}")
+        return index, filename, "", "解析文件超时啦，请人工处理"
+    except PDFReadError as e:
+        return index, filename, "", str(e)
+    except Exception as e:
+        logger.error(f"PDF解析失败: {filename} | {str(e)}", exc_info=True)
+        return index, filename, "", "解析文件时出了点小问题，请人工处理"
+
+def iter_zip_pdf_texts(zip_path: str, infos: list[zipfile.ZipInfo], max_entry_mb: int = 10, max_in_flight: int = 8):
+    """
+    逐个读取压缩包内的PDF（只在内存中读取单个文件，不整体解压到磁盘），交给进程池并行解析，
+    按压缩包中的顺序产出 (index, filename, text, error)，同时在解析中的文件不超过max_in_flight个；
+    单个文件解析超时（损坏或畸形的PDF）时记为该文件的错误，不会卡住整个批量请求
+    """
+    max_entry_bytes = max_entry_mb * 1024 * 1024
+    executor = get_batch_pdf_executor()
+    pending = deque()
+
+    with zipfile.ZipFile(zip_path) as zf:
+        for index, info in enumerate(infos):
+            filename = _decode_zip_filename(info)
+            # 按解压后的大小限制单个文件，避免压缩炸弹
+            if info.file_size > max_entry_bytes:
+                pending.append((index, filename, None, f"文件超过{max_entry_mb}MB，已跳过"))
+            else:
+                try:
+                    data = zf.read(info)
+                    future = executor.submit(read_pdf_bytes, data)
+                    observe_future(future, "pdf_parse")
+                    pending.append((index, filename, future, None, time.monotonic()))
+                except (zipfile.BadZipFile, RuntimeError, OSError) as e:
+                    logger.error(f"压缩包内文件读取失败: {filename} | {str(e)}")
+                    pending.append((index, filename, None, "压缩包内的文件读取失败，请人工处理"))
+
+            while len(pending) >= max_in_flight:
+                yield _resolve_pdf_future(*pending.popleft())
+
+    while pending:
+        yield _resolve_pdf_future(*pending.popleft())
+
 # URL验证函数
 def validate_paper_url(url: str) -> None:
     """
@@ -283,8 +515,8 @@ def validate_paper_url(url: str) -> None:
 
     # 2. 基础可达性验证（必须）
     try:
-        # 简化：单次请求，5秒超时（砍掉重试，降低复杂度）
-        response = requests.head(url, timeout=5, allow_redirects=True)
+        # 简化：单次请求，超时取URL_VALIDATION_TIMEOUT与请求剩余预算中较小的一个（砍掉重试，降低复杂度）
+        response = requests.head(url, timeout=stage_timeout("url_validation", URL_VALIDATION_TIMEOUT), allow_redirects=True)
         # 200/301/302 视为有效，其他状态码视为不可达
         if response.status_code not in {200, 301, 302}:
             raise URLUnreachableError(f"链接访问失败啦！错误代码：{response.status_code} 请确认链接是否正确~")
@@ -295,7 +527,8 @@ def validate_paper_url(url: str) -> None:
 def validate_resume_paper_pdf_file(file: FileStorage) -> str:
     try:
         # 4. 保存临时文件（调用Service层）
-        temp_path = save_pdf_temp_file(file)
+        with span("save_pdf_temp_file", filename=file.filename):
+            temp_path = save_pdf_temp_file(file)
         #initialize_user_data()  # 初始化用户数据，清空之前的内容
         
         # 5. 上传成功，返回友好提示
@@ -344,7 +577,26 @@ def validate_batch_csv_file(file: FileStorage) -> str:
     except Exception as e:
         # 未知错误时，避免技术细节，给安抚信息
         raise Exception(f"上传文件时出了点小问题，请重试或联系技术同学。错误信息：{str(e)}")
-    
-   
-    
-    
\ No newline at end of file
+
+# zip文件的基础验证函数
+def validate_batch_zip_file(file: FileStorage) -> str:
+    try:
+        # 保存临时文件（调用Service层）
+        return save_zip_temp_file(file)
+
+    # 捕获“文件类型错误”
+    except InvalidFileTypeError:
+        raise InvalidFileTypeError()
+
+    # 捕获“文件过大”（压缩包的大小限制与单个文件不同，直接透传）
+    except FileTooLargeError:
+        raise
+
+    # 捕获“临时文件保存错误”
+    except FileSaveError as e:
+        raise FileSaveError(str(e))
+
+    # 捕获其他未知错误
+    except Exception as e:
+        # 未知错误时，避免技术细节，给安抚信息
+        raise Exception(f"上传文件时出了点小问题，请重试或联系技术同学。错误信息：{str(e)}")
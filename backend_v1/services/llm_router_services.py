@@ -0,0 +1,221 @@
+import time
+import logging
+import threading
+from types import SimpleNamespace
+import openai
+from openai import OpenAI
+from services.metrics_services import LLM_ENDPOINT_STATE, LLM_FAILOVERS
+from services.deadline_services import stage_timeout, check_deadline, remaining, LLM_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(Exception):
+    """所有大模型接入点都不可用（熔断中或全部调用失败）"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    熔断器：连续失败failure_threshold次后打开（期间不再请求该接入点），
+    经过recovery_timeout秒后进入半开状态，只放行一个探测请求，成功则关闭，失败则重新打开
+    """
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """当前是否可以向该接入点发送请求（半开状态下只有第一个调用方获得探测机会）"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def release_probe(self) -> None:
+        """探测请求未得出结果就结束时（如请求预算用完）交还探测机会，不改变熔断状态"""
+        with self._lock:
+            self._probing = False
+
+
+class LLMEndpoint:
+    """一个大模型接入点：base_url + api_key，可为逻辑bot id配置该接入点上实际使用的bot id"""
+    def __init__(self, name: str, base_url: str, api_key: str, weight: int = 1, model_map: dict = None,
+                 max_retries: int = 2, failure_threshold: int = 5, recovery_timeout: float = 30,
+                 timeout: float = LLM_TIMEOUT):
+        self.name = name
+        self.weight = max(1, int(weight))
+        self.model_map = model_map or {}
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.client = OpenAI(base_url=base_url, api_key=api_key, max_retries=max_retries, timeout=timeout)
+        # SDK内部的重试不受请求耗时预算约束，有预算时改用不重试的客户端，由LLMRouter在预算内重试
+        self.no_retry_client = self.client.with_options(max_retries=0)
+        self.breaker = CircuitBreaker(failure_threshold, recovery_timeout)
+        self.inflight = 0
+        self.current_weight = 0  # 平滑加权轮询使用
+
+    def model_for(self, model: str) -> str:
+        return self.model_map.get(model, model)
+
+
+# 可以换一个接入点重试的错误：网络错误、超时、限流、服务端错误、密钥无效/无权限（多密钥时换一个密钥）
+_FAILOVER_ERRORS = (
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.AuthenticationError,
+    openai.PermissionDeniedError,
+)
+
+
+class LLMRouter:
+    """
+    多接入点的大模型客户端：按加权轮询（weighted_round_robin）或最少在途请求（least_loaded）选择接入点，
+    调用失败时切换到下一个接入点，每个接入点独立熔断。
+    提供与OpenAI客户端相同的 chat.completions.create 接口，调用方无需修改
+    """
+    def __init__(self, endpoints: list[LLMEndpoint], strategy: str = "weighted_round_robin"):
+        if not endpoints:
+            raise ValueError("至少需要配置一个大模型接入点")
+        if strategy not in ("weighted_round_robin", "least_loaded"):
+            raise ValueError(f"不支持的接入点选择策略: {strategy}")
+        self.endpoints = endpoints
+        self.strategy = strategy
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+        for endpoint in endpoints:
+            self._report_state(endpoint)
+
+    def _ordered_endpoints(self) -> list[LLMEndpoint]:
+        """按选择策略排列接入点，第一个为首选，其余为失败时的备选"""
+        with self._lock:
+            if self.strategy == "least_loaded":
+                return sorted(self.endpoints, key=lambda e: e.inflight / e.weight)
+            # 平滑加权轮询（与nginx相同）：权重大的接入点被选中的次数多，且不会连续扎堆
+            total = sum(e.weight for e in self.endpoints)
+            for endpoint in self.endpoints:
+                endpoint.current_weight += endpoint.weight
+            chosen = max(self.endpoints, key=lambda e: e.current_weight)
+            chosen.current_weight -= total
+            return [chosen] + sorted((e for e in self.endpoints if e is not chosen), key=lambda e: -e.current_weight)
+
+    def _attempts(self):
+        """
+        产出 (第几轮, 接入点)：没有耗时预算时每个接入点只尝试一次（SDK内部会重试）；
+        有预算时按各接入点的max_retries轮流重试
+        """
+        endpoints = self._ordered_endpoints()
+        rounds = 1 if remaining() is None else 1 + max(e.max_retries for e in endpoints)
+        for attempt in range(rounds):
+            for endpoint in endpoints:
+                if attempt <= (endpoint.max_retries if attempt else 0):
+                    yield attempt, endpoint
+
+    def _report_state(self, endpoint: LLMEndpoint) -> None:
+        state = {CircuitBreaker.CLOSED: 0, CircuitBreaker.OPEN: 1, CircuitBreaker.HALF_OPEN: 2}[endpoint.breaker.state]
+        LLM_ENDPOINT_STATE.set(state, endpoint=endpoint.name)
+
+    def create(self, model: str, **kwargs):
+        """
+        调用chat.completions.create，失败时依次切换接入点；流式调用只在建立连接前切换。
+        每次尝试的超时不超过当前请求的剩余预算，预算用完时抛出DeadlineExceeded
+        """
+        last_error = None
+        timeout_cap = kwargs.pop("timeout", None)
+        for attempt, endpoint in self._attempts():
+            if not endpoint.breaker.allow():
+                continue
+            # 已记录成功/失败时熔断器已更新；其余退出（如预算用完抛出DeadlineExceeded）都要交还半开状态的探测机会
+            settled = False
+            try:
+                timeout = stage_timeout("llm", timeout_cap or endpoint.timeout)
+                client = endpoint.client if remaining() is None else endpoint.no_retry_client
+                if attempt > 0:
+                    # 重新轮到已失败过的接入点前退避一段时间（不超过剩余预算）
+                    time.sleep(min(0.5 * 2 ** (attempt - 1), timeout))
+                    timeout = stage_timeout("llm", timeout_cap or endpoint.timeout)
+                with self._lock:
+                    endpoint.inflight += 1
+                try:
+                    response = client.chat.completions.create(model=endpoint.model_for(model), timeout=timeout, **kwargs)
+                except _FAILOVER_ERRORS as e:
+                    if isinstance(e, openai.APITimeoutError):
+                        # 因请求的预算用完而超时：不算接入点故障，也不再切换
+                        check_deadline("llm")
+                    last_error = e
+                    endpoint.breaker.record_failure()
+                    settled = True
+                    LLM_FAILOVERS.inc(endpoint=endpoint.name, error=type(e).__name__)
+                    logger.warning(f"大模型接入点{endpoint.name}调用失败，尝试下一个接入点: {type(e).__name__}")
+                    continue
+                except Exception:
+                    # 请求参数错误等与接入点健康无关的错误：接入点本身可用，直接抛给调用方
+                    endpoint.breaker.record_success()
+                    settled = True
+                    raise
+                finally:
+                    with self._lock:
+                        endpoint.inflight -= 1
+                    self._report_state(endpoint)
+                endpoint.breaker.record_success()
+                settled = True
+                self._report_state(endpoint)
+                return response
+            finally:
+                if not settled:
+                    endpoint.breaker.release_probe()
+
+        if last_error is not None:
+            raise last_error
+        raise LLMUnavailableError("所有大模型接入点都处于熔断状态")
+
+
+def build_llm_router(endpoint_configs: list[dict], strategy: str = "weighted_round_robin") -> LLMRouter:
+    """
+    根据配置创建LLMRouter，每个接入点的配置项：
+    name, base_url, api_key, weight(默认1), model_map(逻辑bot id -> 该接入点的bot id),
+    max_retries(SDK内部重试次数，默认2), failure_threshold(默认5), recovery_timeout(秒，默认30),
+    timeout(单次调用超时上限，秒，默认Config.LLM_TIMEOUT)
+    """
+    endpoints = [
+        LLMEndpoint(
+            name=config.get("name") or f"endpoint_{i + 1}",
+            base_url=config["base_url"],
+            api_key=config["api_key"],
+            weight=config.get("weight", 1),
+            model_map=config.get("model_map"),
+            max_retries=config.get("max_retries", 2),
+            failure_threshold=config.get("failure_threshold", 5),
+            recovery_timeout=config.get("recovery_timeout", 30),
+            timeout=config.get("timeout", LLM_TIMEOUT),
+        )
+        for i, config in enumerate(endpoint_configs)
+    ]
+    return LLMRouter(endpoints, strategy)
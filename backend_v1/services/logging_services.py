@@ -0,0 +1,160 @@
+import re
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from config import Config
+from services.tracing_services import get_request_id
+
+# 各子系统的默认日志级别（按logger名称，前缀匹配，如"services"覆盖所有services模块），可在Config.LOG_LEVELS中覆盖
+DEFAULT_LOG_LEVELS = {
+    "Lark": getattr(Config, 'LARK_LOG_LEVEL', 'WARNING'),  # 飞书SDK在DEBUG级别会序列化完整报文
+    "pdfminer": "WARNING",  # PDF解析库在DEBUG级别每页都会输出大量日志
+    "httpx": "WARNING",     # 大模型SDK的HTTP客户端每次请求都会输出一条INFO日志
+    "httpx2": "WARNING",
+    "werkzeug": "INFO",
+}
+# 单条日志消息的最大长度，超出部分截断
+LOG_MAX_MESSAGE_CHARS = getattr(Config, 'LOG_MAX_MESSAGE_CHARS', 2000)
+# 日志队列长度，队列满时直接丢弃新日志（不阻塞请求线程）
+LOG_QUEUE_SIZE = getattr(Config, 'LOG_QUEUE_SIZE', 10000)
+
+# 脱敏规则：邮箱、手机号、身份证号、密钥类字符串
+_REDACTION_PATTERNS = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "<email>"),
+    (re.compile(r"(?<!\d)(?:\+?86[- ]?)?1[3-9]\d{9}(?!\d)"), "<phone>"),
+    (re.compile(r"(?<![\dA-Za-z])\d{17}[\dXx](?![\dA-Za-z])"), "<id_number>"),
+    (re.compile(r"(?i)(bearer\s+|api[_-]?key[\"'=:\s]+|secret[\"'=:\s]+|token[\"'=:\s]+)[\w\-.]{8,}"), r"\1<redacted>"),
+]
+
+_listener = None
+_listener_lock = threading.Lock()
+
+
+def redact(text: str) -> str:
+    """去除日志文本中的个人信息和密钥"""
+    for pattern, replacement in _REDACTION_PATTERNS:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def truncate(text: str, max_chars: int = None) -> str:
+    """超长文本只保留开头，并注明省略的字符数"""
+    max_chars = max_chars or LOG_MAX_MESSAGE_CHARS
+    if len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}...(省略{len(text) - max_chars}字符)"
+
+
+def describe_messages(messages: list) -> str:
+    """
+    概述发送给大模型的消息（只记录角色和长度，不记录内容），
+    用于替代直接打印完整prompt（其中包含岗位文档和候选人简历）
+    """
+    return ", ".join(f"{message.get('role')}:{len(message.get('content') or '')}字符" for message in messages)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    请求线程只负责把日志放入队列，格式化和输出在后台线程完成；
+    队列满时丢弃日志并计数，而不是阻塞请求
+    """
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # 参数和异常堆栈必须在当前线程展开（对象可能在之后被修改），request_id也只能在请求上下文中获取
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        record.request_id = get_request_id()
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class StructuredFormatter(logging.Formatter):
+    """输出单行JSON日志（或文本），统一做脱敏和长度限制"""
+    def __init__(self, fmt_type: str = "json"):
+        super().__init__()
+        self.fmt_type = fmt_type
+
+    def format(self, record) -> str:
+        message = truncate(redact(record.getMessage()))
+        exc_text = redact(record.exc_text) if getattr(record, "exc_text", None) else None
+        request_id = getattr(record, "request_id", None)
+        if self.fmt_type != "json":
+            line = f"[{self.formatTime(record)}] [{record.levelname}] [{record.name}]"
+            line += f" [{request_id}]" if request_id else ""
+            line += f" {message}"
+            return line + (f"\n{exc_text}" if exc_text else "")
+
+        data = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": message,
+        }
+        if request_id:
+            data["request_id"] = request_id
+        if exc_text:
+            data["exc"] = exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+def apply_log_levels(levels: dict) -> None:
+    """按logger名称设置各子系统的日志级别（"root"表示根logger）"""
+    for name, level in levels.items():
+        logger = logging.getLogger(None if name == "root" else name)
+        logger.setLevel(str(level).upper())
+
+
+def setup_logging() -> None:
+    """
+    初始化日志：根logger只挂一个非阻塞的队列handler，后台线程负责格式化、脱敏并输出到控制台/文件。
+    重复调用不会重复初始化
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+
+        formatter = StructuredFormatter(getattr(Config, 'LOG_FORMAT', 'json'))
+        handlers = [logging.StreamHandler(sys.stderr)]
+        log_file = getattr(Config, 'LOG_FILE', None)
+        if log_file:
+            handlers.append(RotatingFileHandler(log_file, maxBytes=50 * 1024 * 1024, backupCount=5, encoding="utf-8"))
+        for handler in handlers:
+            handler.setFormatter(formatter)
+
+        log_queue = queue.Queue(maxsize=LOG_QUEUE_SIZE)
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(NonBlockingQueueHandler(log_queue))
+
+        # 飞书SDK自带同步输出到stdout的handler，去掉后统一经由队列输出
+        lark_logger = logging.getLogger("Lark")
+        for handler in list(lark_logger.handlers):
+            lark_logger.removeHandler(handler)
+        lark_logger.propagate = True
+
+        apply_log_levels({"root": getattr(Config, 'LOG_LEVEL', 'INFO'), **DEFAULT_LOG_LEVELS, **getattr(Config, 'LOG_LEVELS', {})})
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # 退出时输出队列中剩余的日志
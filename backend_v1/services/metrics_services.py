@@ -0,0 +1,314 @@
+import time
+import threading
+from contextlib import contextmanager
+from services.tracing_services import span, current_span, record_span
+
+# 默认的耗时分桶（秒），覆盖从PDF解析的几十毫秒到大模型调用的数十秒
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# token数分桶
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(labelnames, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """指标基类：按标签值分组保存样本，线程安全"""
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标{self.name}的标签应为{self.labelnames}，实际为{tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    type_name = "counter"
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """可增可减的瞬时值（如队列长度、进行中的请求数）"""
+    type_name = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        """with块内计数+1，退出时-1"""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """分桶直方图，输出累计分桶计数、总和和样本数"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, {"counts": [0] * len(self.buckets), "sum": 0.0})
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """with块耗时计入直方图（异常时同样计入）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted((key, {"counts": list(state["counts"]), "sum": state["sum"]}) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, {"le": _format_value(bound)})
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表，按Prometheus文本格式统一输出"""
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标{metric.name}已注册")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+# 全局注册表与各业务指标
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "hr_stage_duration_seconds",
+    "各处理阶段耗时（pdf_parse/url_validation/prompt_build/embedding/feishu_fetch/feishu_write）",
+    ("stage",),
+)
+LLM_REQUEST_DURATION = registry.histogram(
+    "hr_llm_request_duration_seconds",
+    "大模型调用耗时（流式调用为完整输出耗时）",
+    ("bot_id",),
+)
+LLM_TOKENS = registry.histogram(
+    "hr_llm_tokens",
+    "单次大模型调用的token用量",
+    ("bot_id", "kind"),
+    buckets=TOKEN_BUCKETS,
+)
+LLM_ENDPOINT_STATE = registry.gauge(
+    "hr_llm_endpoint_circuit_state",
+    "各大模型接入点的熔断状态（0关闭/1打开/2半开）",
+    ("endpoint",),
+)
+LLM_FAILOVERS = registry.counter(
+    "hr_llm_failovers_total",
+    "大模型接入点调用失败并切换到下一个接入点的次数",
+    ("endpoint", "error"),
+)
+LLM_HEDGES = registry.counter(
+    "hr_llm_hedges_total",
+    "发出对冲请求后的结果（hedge_won/primary_won/both_failed），以及因预算不足未发出的次数（budget_exhausted）",
+    ("bot_id", "outcome"),
+)
+DEADLINE_EXCEEDED = registry.counter(
+    "hr_deadline_exceeded_total",
+    "请求或批量行的耗时预算在各阶段用完的次数",
+    ("stage",),
+)
+PAPER_FETCHES = registry.counter(
+    "hr_paper_fetches_total",
+    "论文获取结果（cache_hit命中缓存/shared复用其他请求正在进行的下载/fetched下载成功/failed失败）",
+    ("result",),
+)
+CASCADE_DECISIONS = registry.counter(
+    "hr_cascade_decisions_total",
+    "级联模式下粗打分后的处理（kept直接采用/escalated交给完整bot/first_pass_failed粗打分失败后交给完整bot）",
+    ("decision",),
+)
+OFFLINE_BATCH_JOBS = registry.counter(
+    "hr_offline_batch_jobs_total",
+    "离线批量任务的结束状态（completed/failed）",
+    ("status",),
+)
+OFFLINE_BATCH_ROWS = registry.counter(
+    "hr_offline_batch_rows_total",
+    "离线批量任务各行的结果（success/failed）",
+    ("result",),
+)
+FAILURES = registry.counter(
+    "hr_failures_total",
+    "按阶段和异常类型统计的失败次数",
+    ("stage", "error"),
+)
+BATCH_QUEUE_DEPTH = registry.gauge(
+    "hr_batch_queue_depth",
+    "共享大模型线程池中已提交、尚未开始执行的任务数",
+)
+LLM_POOL_ACTIVE_JOBS = registry.gauge(
+    "hr_llm_pool_active_jobs",
+    "共享大模型线程池中正在提交或执行的任务组数",
+)
+BATCH_INFLIGHT = registry.gauge(
+    "hr_batch_inflight_requests",
+    "批量分析中正在等待大模型响应的请求数",
+)
+ADMISSION_INFLIGHT = registry.gauge(
+    "hr_admission_inflight_requests",
+    "已准入、正在处理的请求数",
+    ("endpoint",),
+)
+ADMISSION_WAITING = registry.gauge(
+    "hr_admission_waiting_requests",
+    "排队等待准入的请求数",
+    ("endpoint",),
+)
+ADMISSION_REJECTED = registry.counter(
+    "hr_admission_rejected_total",
+    "因超出容量被拒绝的请求数（queue_full返回429，queue_timeout返回503）",
+    ("endpoint", "reason"),
+)
+# 无标签的gauge初始化为0，服务刚启动时也能采集到
+BATCH_QUEUE_DEPTH.set(0)
+BATCH_INFLIGHT.set(0)
+LLM_POOL_ACTIVE_JOBS.set(0)
+
+
+def record_failure(stage: str, error) -> None:
+    """按阶段记录一次失败，error可以是异常对象或自定义的失败类型名"""
+    FAILURES.inc(stage=stage, error=error if isinstance(error, str) else type(error).__name__)
+
+
+@contextmanager
+def track_stage(stage: str):
+    """统计一个阶段的耗时，出现异常时同时计入失败次数；开启trace时同时记录为当前请求的一个span"""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    except Exception as e:
+        record_failure(stage, e)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+
+
+def observe_future(future, stage: str) -> None:
+    """
+    统计提交到线程池/进程池的任务耗时（从提交到完成，含排队时间），任务失败时计入失败次数；
+    进程池中的子进程无法直接写入本进程的指标，因此在主进程通过回调统计
+    """
+    start = time.perf_counter()
+    start_ns = time.time_ns()
+    parent = current_span()
+
+    def done(f):
+        STAGE_DURATION.observe(time.perf_counter() - start, stage=stage)
+        error = f.exception() if not f.cancelled() else "cancelled"
+        if error is not None and not f.cancelled():
+            record_failure(stage, error)
+        record_span(parent, stage, start_ns, error=error)
+
+    future.add_done_callback(done)
+
+
+def record_llm_usage(bot_id: str, usage) -> None:
+    """记录大模型响应中的token用量（usage为空时忽略）"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        value = getattr(usage, kind, None)
+        if value is not None:
+            LLM_TOKENS.observe(value, bot_id=bot_id, kind=kind.replace("_tokens", ""))
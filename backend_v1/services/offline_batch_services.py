@@ -0,0 +1,396 @@
+import io
+import os
+import re
+import json
+import time
+import uuid
+import types
+import logging
+import collections
+import tempfile
+import threading
+import openai
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from services.client_services import batch_inference_client
+from services.feishu_services import get_batch_system_prompt, ensure_feishu_docs
+from services.analysis_services import build_link_user_info, build_failed_result, get_response_format_kwargs
+from services.output_services import BATCH_RESULT_FIELDS, LLMResponseParseError, parse_llm_json, write_batch_csv
+from services.metrics_services import OFFLINE_BATCH_JOBS, OFFLINE_BATCH_ROWS, record_failure, record_llm_usage
+
+logger = logging.getLogger(__name__)
+
+# 离线批量任务的工作目录（每个任务一个子目录：任务状态、提交的JSONL和结果CSV），服务重启后可继续轮询
+OFFLINE_BATCH_DIR = getattr(Config, 'OFFLINE_BATCH_DIR', os.path.join(tempfile.gettempdir(), "hr_offline_batches"))
+# 批量推理使用的模型（需为支持批量推理的接入点，默认与在线批量分析相同）
+OFFLINE_BATCH_MODEL = getattr(Config, 'OFFLINE_BATCH_MODEL', None) or Config.BATCH_BOT_ID
+# 查询批量推理状态的间隔（秒）
+OFFLINE_BATCH_POLL_INTERVAL = getattr(Config, 'OFFLINE_BATCH_POLL_INTERVAL', 60)
+# 单个输入文件的请求数和大小上限（超过时拆分为多个批量推理任务提交）
+OFFLINE_BATCH_MAX_REQUESTS = getattr(Config, 'OFFLINE_BATCH_MAX_REQUESTS', 50000)
+OFFLINE_BATCH_MAX_BYTES = getattr(Config, 'OFFLINE_BATCH_MAX_BYTES', 100 * 1024 * 1024)
+# 等待批量推理完成的最长时间（秒），超时后取消并按已返回的结果输出
+OFFLINE_BATCH_MAX_WAIT = getattr(Config, 'OFFLINE_BATCH_MAX_WAIT', 48 * 3600)
+# 准备输入时并发下载论文的线程数（同时最多保留线程数2倍的已下载论文，边下载边写入分片，内存与总行数无关）
+OFFLINE_BATCH_FETCH_WORKERS = getattr(Config, 'OFFLINE_BATCH_FETCH_WORKERS', 8)
+# 下载批量推理结果文件的最多尝试次数（临时错误时退避重试），仍失败时任务保持collecting状态，重启后重新下载
+OFFLINE_BATCH_DOWNLOAD_ATTEMPTS = getattr(Config, 'OFFLINE_BATCH_DOWNLOAD_ATTEMPTS', 5)
+
+# 批量推理任务的结束状态（expired时可能只完成了部分请求，已完成的结果仍可下载）
+TERMINAL_BATCH_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# 批量推理接口的临时错误（APITimeoutError是APIConnectionError的子类），轮询和下载结果时遇到只需稍后重试
+TRANSIENT_API_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)
+
+_JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class OfflineJobNotFoundError(Exception):
+    def __init__(self):
+        super().__init__("没有找到这个离线分析任务哦，请检查任务编号~")
+
+
+class OfflineJobStore:
+    """
+    离线批量任务的状态存储：每个任务一个目录，状态写在job.json中（先写临时文件再替换，避免写一半时崩溃损坏），
+    结果CSV写在results.csv中
+    """
+    def __init__(self, root: str):
+        self.root = root
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def job_dir(self, job_id: str) -> str:
+        if not _JOB_ID_PATTERN.match(job_id or ""):
+            raise OfflineJobNotFoundError()
+        return os.path.join(self.root, job_id)
+
+    def result_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir(job_id), "results.csv")
+
+    def create(self, rows: list[tuple[int, str]]) -> dict:
+        job_id = uuid.uuid4().hex
+        os.makedirs(self.job_dir(job_id))
+        now = time.time()
+        job = {
+            "job_id": job_id,
+            "status": "preparing",
+            "created_at": now,
+            "updated_at": now,
+            "rows": [[index, link] for index, link in rows],
+            "batches": [],
+            "counts": {"total": len(rows), "success": 0, "failed": 0},
+            "message": "",
+        }
+        self.save(job)
+        return job
+
+    def load(self, job_id: str) -> dict:
+        path = os.path.join(self.job_dir(job_id), "job.json")
+        if not os.path.exists(path):
+            raise OfflineJobNotFoundError()
+        with self._lock, open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def save(self, job: dict) -> None:
+        job["updated_at"] = time.time()
+        path = os.path.join(self.job_dir(job["job_id"]), "job.json")
+        with self._lock:
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(job, f, ensure_ascii=False)
+            os.replace(path + ".tmp", path)
+
+    def unfinished(self) -> list[dict]:
+        """所有尚未结束的任务（服务重启后继续执行）"""
+        jobs = []
+        for name in os.listdir(self.root):
+            try:
+                job = self.load(name)
+            except (OfflineJobNotFoundError, ValueError, OSError):
+                continue
+            if job["status"] in ("preparing", "submitted", "collecting"):
+                jobs.append(job)
+        return jobs
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_job_store() -> OfflineJobStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = OfflineJobStore(OFFLINE_BATCH_DIR)
+        return _store
+
+
+def custom_id_for(index: int) -> str:
+    return f"row-{index}"
+
+
+def build_request_line(index: int, system_prompt: list, user_info: str) -> dict:
+    """一行数据对应的批量推理请求（与在线批量分析的提示词和采样参数一致）"""
+    return {
+        "custom_id": custom_id_for(index),
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": OFFLINE_BATCH_MODEL,
+            "messages": system_prompt + [{"role": "user", "content": user_info}],
+            "temperature": 0,
+            "seed": 42,
+            **get_response_format_kwargs(OFFLINE_BATCH_MODEL),
+        },
+    }
+
+
+def iter_input_chunks(requests_with_index, max_requests: int = None, max_bytes: int = None):
+    """
+    把 (行号, 请求) 按条数和大小上限拆分为多个JSONL文件，逐个产出 (本文件包含的行号列表, 文件内容bytes)
+    """
+    max_requests = max_requests or OFFLINE_BATCH_MAX_REQUESTS
+    max_bytes = max_bytes or OFFLINE_BATCH_MAX_BYTES
+    indexes, chunk, size = [], [], 0
+    for index, line in requests_with_index:
+        encoded = (json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8")
+        if chunk and (len(chunk) >= max_requests or size + len(encoded) > max_bytes):
+            yield indexes, b"".join(chunk)
+            indexes, chunk, size = [], [], 0
+        indexes.append(index)
+        chunk.append(encoded)
+        size += len(encoded)
+    if chunk:
+        yield indexes, b"".join(chunk)
+
+
+def iter_user_infos(pool: ThreadPoolExecutor, rows: list, window: int):
+    """
+    按行号顺序产出 (行号, 用户信息)：最多同时下载window行，前面的行被取走后才提交后面的行
+    （pool.map会一次提交全部行，下载的论文全部留在内存中，行数多时内存无上限）
+    """
+    pending = collections.deque()
+    for index, link in rows:
+        if len(pending) >= window:
+            done_index, future = pending.popleft()
+            yield done_index, future.result()
+        pending.append((index, pool.submit(build_link_user_info, link)))
+    while pending:
+        done_index, future = pending.popleft()
+        yield done_index, future.result()
+
+
+def prepare_and_submit(job: dict, store: OfflineJobStore) -> None:
+    """
+    下载论文、构造批量推理输入并上传提交。每个已提交的分片在job["batches"]中记录其包含的行号，
+    重启后只为从未提交过的行构造输入（分片按大小拆分，论文下载结果变化时分片边界也会变，不能按分片序号跳过）
+    """
+    ensure_feishu_docs()
+    system_prompt = get_batch_system_prompt()
+    submitted = {index for item in job["batches"] for index in item["rows"]}
+    rows = [(index, link) for index, link in job["rows"] if index not in submitted]
+    with ThreadPoolExecutor(max_workers=OFFLINE_BATCH_FETCH_WORKERS, thread_name_prefix="offline_fetch") as pool:
+        requests_with_index = (
+            (index, build_request_line(index, system_prompt, user_info))
+            for index, user_info in iter_user_infos(pool, rows, OFFLINE_BATCH_FETCH_WORKERS * 2)
+        )
+        for indexes, content in iter_input_chunks(requests_with_index):
+            number = len(job["batches"])
+            input_file = batch_inference_client.files.create(
+                file=(f"{job['job_id']}-{number}.jsonl", io.BytesIO(content)),
+                purpose="batch",
+            )
+            batch = batch_inference_client.batches.create(
+                input_file_id=input_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h",
+                metadata={"job_id": job["job_id"], "part": str(number)},
+            )
+            job["batches"].append({
+                "batch_id": batch.id, "input_file_id": input_file.id, "status": batch.status, "rows": indexes,
+            })
+            store.save(job)
+            logger.info(f"离线批量任务{job['job_id']}已提交第{number + 1}个分片（{len(indexes)}行）: {batch.id}")
+    job["status"] = "submitted"
+    store.save(job)
+
+
+def wait_for_batches(job: dict, store: OfflineJobStore, poll_interval: float) -> list:
+    """
+    轮询各分片直到全部结束，超过最长等待时间时取消未结束的分片；返回各分片最终的Batch对象。
+    轮询持续一两天，期间查询接口的临时错误（网络、超时、限流、5xx）只记录日志，下一轮继续查询，
+    只有分片进入结束状态才结束任务（否则已付费的批量推理结果会被丢弃）
+    """
+    while True:
+        try:
+            batches = [batch_inference_client.batches.retrieve(item["batch_id"]) for item in job["batches"]]
+        except TRANSIENT_API_ERRORS as e:
+            logger.warning(f"离线批量任务{job['job_id']}查询状态失败，稍后重试: {str(e)}")
+            record_failure("offline_batch_poll", e)
+            time.sleep(poll_interval)
+            continue
+        changed = False
+        for item, batch in zip(job["batches"], batches):
+            if item["status"] != batch.status:
+                item["status"] = batch.status
+                changed = True
+        if changed:
+            store.save(job)
+        if all(batch.status in TERMINAL_BATCH_STATUSES for batch in batches):
+            return batches
+        if time.time() - job["created_at"] > OFFLINE_BATCH_MAX_WAIT:
+            for batch in batches:
+                if batch.status not in TERMINAL_BATCH_STATUSES | {"cancelling"}:
+                    logger.warning(f"离线批量任务{job['job_id']}等待超时，取消分片{batch.id}")
+                    try:
+                        batch_inference_client.batches.cancel(batch.id)
+                    except TRANSIENT_API_ERRORS as e:
+                        logger.warning(f"取消分片{batch.id}失败，稍后重试: {str(e)}")
+        time.sleep(poll_interval)
+
+
+def download_file_text(file_id: str, attempts: int = None) -> str:
+    """下载批量推理的输出/错误文件，临时错误时退避重试，重试用完后抛出最后一次的错误"""
+    attempts = attempts or OFFLINE_BATCH_DOWNLOAD_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            return batch_inference_client.files.content(file_id).text
+        except TRANSIENT_API_ERRORS as e:
+            record_failure("offline_batch_download", e)
+            if attempt == attempts:
+                raise
+            logger.warning(f"下载批量推理结果文件{file_id}失败，稍后重试: {str(e)}")
+            time.sleep(min(2 ** (attempt - 1), 60))
+
+
+def iter_output_lines(file_id: str):
+    if not file_id:
+        return
+    content = download_file_text(file_id)
+    for line in content.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def parse_output_line(line: dict) -> dict:
+    """
+    解析批量推理输出文件中的一行，返回批量分析结果字段；
+    请求失败时抛出ValueError，内容无法解析时抛出LLMResponseParseError
+    """
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        error = line.get("error") or (response.get("body") or {}).get("error") or {}
+        raise ValueError(f"批量推理请求失败: {error.get('message') or response.get('status_code')}")
+    body = response.get("body") or {}
+    usage = body.get("usage")
+    record_llm_usage(OFFLINE_BATCH_MODEL, types.SimpleNamespace(**usage) if usage else None)
+    choices = body.get("choices") or []
+    content = choices[0].get("message", {}).get("content") if choices else None
+    if not content:
+        raise ValueError("大模型响应为空")
+    return parse_llm_json(content, BATCH_RESULT_FIELDS)
+
+
+def collect_results(job: dict, batches: list) -> dict:
+    """下载各分片的输出和错误文件，解析为 {index: 结果字典}；没有返回结果的行记为失败"""
+    fields_by_id = {custom_id_for(index): (index, {"link": link}) for index, link in job["rows"]}
+    results = {}
+    for batch in batches:
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            for line in iter_output_lines(file_id):
+                if line.get("custom_id") not in fields_by_id:
+                    continue
+                index, fields = fields_by_id[line["custom_id"]]
+                try:
+                    result = parse_output_line(line)
+                    result.update(fields)
+                    results[index] = result
+                except LLMResponseParseError as e:
+                    logger.error(f"JSON解析失败: {str(e)}")
+                    record_failure("llm_parse", e)
+                    results[index] = build_failed_result(fields)
+                except ValueError as e:
+                    logger.error(str(e))
+                    record_failure("llm", "BatchRequestFailed")
+                    results[index] = build_failed_result(fields)
+    for index, fields in fields_by_id.values():
+        if index not in results:
+            results[index] = build_failed_result(fields, "批量推理未返回结果，请人工处理")
+    return results
+
+
+def run_offline_job(job_id: str, poll_interval: float = None) -> None:
+    """
+    离线批量任务的完整流程（在后台线程中执行）：准备并提交 -> 轮询 -> 下载解析 -> 写出CSV。
+    下载结果或写出CSV时的临时错误（重试后仍失败）不结束任务：保持collecting状态，重启后重新下载
+    （批量推理的结果已经计算并计费，标记为failed后不会再被下载）
+    """
+    store = get_job_store()
+    poll_interval = OFFLINE_BATCH_POLL_INTERVAL if poll_interval is None else poll_interval
+    job = store.load(job_id)
+    try:
+        if job["status"] == "preparing":
+            prepare_and_submit(job, store)
+        batches = wait_for_batches(job, store, poll_interval)
+        job["status"] = "collecting"
+        store.save(job)
+        results = collect_results(job, batches)
+        with open(store.result_path(job_id), "w", encoding="utf-8", newline="") as f:
+            f.write(write_batch_csv(results))
+        failed = sum(1 for item in results.values() if item.get("score") == "")
+        job["counts"].update(success=len(results) - failed, failed=failed)
+        OFFLINE_BATCH_ROWS.inc(len(results) - failed, result="success")
+        OFFLINE_BATCH_ROWS.inc(failed, result="failed")
+        job["status"] = "completed"
+        job["message"] = ""
+        OFFLINE_BATCH_JOBS.inc(status="completed")
+        logger.info(f"离线批量任务{job_id}完成: {job['counts']}")
+    except Exception as e:
+        record_failure("offline_batch", e)
+        if job["status"] == "collecting" and isinstance(e, TRANSIENT_API_ERRORS + (OSError,)):
+            logger.error(f"离线批量任务{job_id}下载结果失败，重启后重新下载: {str(e)}", exc_info=True)
+            job["message"] = "分析结果已生成，下载时出了点小问题，服务重启后会重新下载，请稍后再查询~"
+        else:
+            logger.error(f"离线批量任务{job_id}失败: {str(e)}", exc_info=True)
+            job["status"] = "failed"
+            job["message"] = "离线分析时出了点小问题，请重新提交或联系技术同学。"
+            OFFLINE_BATCH_JOBS.inc(status="failed")
+    store.save(job)
+
+
+def start_offline_job_thread(job_id: str, poll_interval: float = None) -> threading.Thread:
+    """在后台线程中执行离线批量任务（daemon=True：主程序退出时自动结束，重启后由resume_offline_jobs继续）"""
+    thread = threading.Thread(
+        target=run_offline_job,
+        args=(job_id, poll_interval),
+        name=f"offline_batch_{job_id[:8]}",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def submit_offline_job(rows: list[tuple[int, str]]) -> dict:
+    """创建离线批量任务并在后台执行，立即返回任务状态"""
+    job = get_job_store().create(rows)
+    start_offline_job_thread(job["job_id"])
+    logger.info(f"离线批量任务{job['job_id']}已创建，共{len(rows)}行")
+    return job
+
+
+def get_offline_job(job_id: str) -> dict:
+    """任务状态（不含原始行数据）"""
+    job = get_job_store().load(job_id)
+    status = {key: value for key, value in job.items() if key not in ("rows", "batches")}
+    status["batches"] = [{key: value for key, value in item.items() if key != "rows"} for item in job["batches"]]
+    return status
+
+
+def resume_offline_jobs() -> int:
+    """服务启动时继续执行尚未结束的离线批量任务，返回任务数"""
+    jobs = get_job_store().unfinished()
+    for job in jobs:
+        start_offline_job_thread(job["job_id"])
+    if jobs:
+        logger.info(f"继续执行{len(jobs)}个未完成的离线批量任务")
+    return len(jobs)
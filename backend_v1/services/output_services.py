@@ -1,3 +1,168 @@
+import csv
+import io
+import json
+import re
+import logging
+from threading import Lock
+
+logger = logging.getLogger(__name__)
+
+# 单个候选人分析结果的字段（与前端 single.html 展示字段一致）
+SINGLE_RESULT_FIELDS = (
+    'cdd_score', 'job_match_1', 'job_match_1_contact', 'reason_1',
+    'job_match_2', 'job_match_2_contact', 'reason_2'
+)
+
+# 批量分析结果的字段（与输出CSV表头一致）
+BATCH_RESULT_FIELDS = (
+    'score', 'summary', 'tag_primary', 'contact_tag_primary',
+    'tag_secondary', 'contact_tag_secondary'
+)
+
+class LLMResponseParseError(Exception):
+    """大模型返回内容无法解析为合法JSON"""
+    pass
+
+class ParseStats:
+    """线程安全的解析统计：clean为直接解析成功，repaired为修复后成功，failed为修复失败"""
+    def __init__(self):
+        self._lock = Lock()
+        self._counts = {"total": 0, "clean": 0, "repaired": 0, "failed": 0}
+
+    def record(self, outcome: str) -> None:
+        with self._lock:
+            self._counts["total"] += 1
+            self._counts[outcome] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+# 全局解析统计
+parse_stats = ParseStats()
+
+_FENCE_PATTERN = re.compile(r'^(<\|FunctionCallEnd\|>|```json\n?|```\n?)', flags=re.IGNORECASE)
+_TRAILING_FENCE_PATTERN = re.compile(r'```\s*$')
+_TRAILING_COMMA_PATTERN = re.compile(r',\s*([}\]])')
+
+def _balanced_object_end(text: str, start: int) -> int:
+    """从start处的'{'开始扫描，返回与之配对的'}'下标（忽略字符串内的括号），找不到返回-1"""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0:
+                return i
+    return -1
+
+def _loads_object(candidate: str):
+    """尝试解析JSON对象，失败时去掉多余的尾逗号再试一次"""
+    for text in (candidate, _TRAILING_COMMA_PATTERN.sub(r'\1', candidate)):
+        try:
+            value = json.loads(text)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict):
+            return value
+    return None
+
+def extract_json_object(text: str, max_attempts: int = 20):
+    """
+    从带有多余文字的文本中提取第一个可解析的、括号配对的JSON对象
+    :return: 解析后的字典，找不到时返回None
+    """
+    start = text.find('{')
+    attempts = 0
+    while start != -1 and attempts < max_attempts:
+        attempts += 1
+        end = _balanced_object_end(text, start)
+        if end != -1:
+            value = _loads_object(text[start:end + 1])
+            if value is not None:
+                return value
+        # 例如 "{{...}}" 外层解析失败时，从下一个'{'继续尝试
+        start = text.find('{', start + 1)
+    return None
+
+def parse_llm_json(text: str, required_fields: tuple = (), stats: ParseStats = parse_stats) -> dict:
+    """
+    容错地解析大模型返回的JSON：
+    - 先直接解析；失败时去掉代码块标记、多余文字后提取第一个配对的JSON对象
+    - 按required_fields校验结构，缺失的字段补空字符串；一个都没有则视为失败
+    """
+    if not text or not text.strip():
+        stats.record("failed")
+        raise LLMResponseParseError("大模型返回内容为空")
+
+    text = text.strip()
+    repaired = False
+    try:
+        result = json.loads(text)
+        if not isinstance(result, dict):
+            raise json.JSONDecodeError("不是JSON对象", text, 0)
+    except json.JSONDecodeError:
+        repaired = True
+        cleaned = _TRAILING_FENCE_PATTERN.sub('', _FENCE_PATTERN.sub('', text))
+        result = extract_json_object(cleaned)
+
+    if result is None:
+        stats.record("failed")
+        logger.error(f"JSON解析失败 | 内容: {text[:100]}...")
+        raise LLMResponseParseError("大模型返回内容不是合法的JSON")
+
+    if required_fields:
+        missing = [field for field in required_fields if field not in result]
+        if len(missing) == len(required_fields):
+            stats.record("failed")
+            logger.error(f"JSON结构不符合要求 | 内容: {text[:100]}...")
+            raise LLMResponseParseError("大模型返回的JSON缺少必要字段")
+        if missing:
+            repaired = True
+            for field in missing:
+                result[field] = ""
+
+    stats.record("repaired" if repaired else "clean")
+    return result
+
+def write_batch_csv(result: dict) -> str:
+    """
+    将批量分析结果 {index: 结果字典} 按原始顺序写成CSV文本（带BOM，Excel可直接打开），
+    filename、预打分、级联层级tier等可选列只在结果中出现时输出
+    """
+    output = io.StringIO()
+    output.write('\ufeff')
+    fieldnames = ['index', 'link', *BATCH_RESULT_FIELDS]
+    if any('filename' in item for item in result.values()):
+        fieldnames.insert(1, 'filename')
+    for optional in ('best_jd', 'jd_similarity', 'tier'):
+        if any(optional in item for item in result.values()):
+            fieldnames.append(optional)
+
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    for idx in sorted(result):
+        item = result[idx]
+        # 确保每个条目都包含所有必要的字段
+        row = {'index': idx}
+        for field in fieldnames[1:]:
+            row[field] = item.get(field, '')
+        writer.writerow(row)
+    return output.getvalue()
+
 def clean_output(data: dict) -> dict:
     """
     清理LLM返回的数据：
@@ -29,4 +194,4 @@ def clean_output(data: dict) -> dict:
             # 其他类型保持不变
             return value
     
-    return {k: process_value(v) for k, v in data.items()}
\ No newline at end of file
+    return {k: process_value(v) for k, v in data.items()}
@@ -0,0 +1,298 @@
+import re
+import html
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future
+from urllib.parse import urlparse, urljoin
+from requests.exceptions import RequestException
+from config import Config
+from services.client_services import http_session
+from services.cache_services import get_paper_cache
+from services.input_services import get_batch_pdf_executor, read_pdf_bytes, PDFReadError
+from services.text_services import compact_text
+from services.metrics_services import track_stage, PAPER_FETCHES
+from services.deadline_services import stage_timeout, wait_result, DeadlineExceeded, StageCancelled, PAPER_FETCH_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# 论文页面里常见的元数据标签（arXiv、期刊、会议页面大多遵循 Highwire/Dublin Core/Open Graph 约定）
+_META_TAG = re.compile(r'<meta\s+[^>]*>', flags=re.IGNORECASE)
+_META_ATTR = re.compile(r'(name|property|content)\s*=\s*("([^"]*)"|\'([^\']*)\')', flags=re.IGNORECASE)
+_TITLE_TAG = re.compile(r'<title[^>]*>(.*?)</title>', flags=re.IGNORECASE | re.DOTALL)
+
+_TITLE_KEYS = ("citation_title", "dc.title", "og:title")
+_ABSTRACT_KEYS = ("citation_abstract", "dc.description", "description", "og:description")
+_SCRIPT_STYLE = re.compile(r'<(script|style|noscript)[^>]*>.*?</\1>', flags=re.IGNORECASE | re.DOTALL)
+_HTML_TAG = re.compile(r'<[^>]+>')
+_DOI = re.compile(r'^(?:doi:\s*|https?://(?:dx\.)?doi\.org/)?(10\.\d{4,9}/\S+)$', flags=re.IGNORECASE)
+# PDF正文中的摘要：从Abstract开始，到空行、Keywords或Introduction为止
+_PDF_ABSTRACT = re.compile(
+    r'\babstract\b[\s.:\-\u2014]*(.+?)(?:\n\s*\n|\bkeywords\b|\bindex terms\b|\b(?:1\.?|I\.)?\s*introduction\b)',
+    flags=re.IGNORECASE | re.DOTALL,
+)
+
+# 批量分析前是否先在本地下载论文并提取正文（关闭时只把链接交给大模型）
+PAPER_FETCH_ENABLED = getattr(Config, 'PAPER_FETCH_ENABLED', True)
+# 单篇论文下载大小上限（字节）和正文的token预算
+PAPER_MAX_BYTES = getattr(Config, 'PAPER_MAX_BYTES', 20 * 1024 * 1024)
+PAPER_TEXT_TOKEN_BUDGET = getattr(Config, 'PAPER_TEXT_TOKEN_BUDGET', 6000)
+_FETCH_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; hr-resume-match/1.0)",
+    "Accept": "text/html,application/pdf;q=0.9,*/*;q=0.8",
+}
+
+# 正在下载的论文（按规范化后的链接），同一篇论文被多行同时引用时只下载一次
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class PaperFetchError(Exception):
+    """论文下载或解析失败"""
+    pass
+
+
+class PaperFetchTimeout(PaperFetchError):
+    """下载或解析论文时请求的耗时预算用完（只说明当时负责下载的请求没有时间了，论文本身不一定有问题）"""
+    pass
+
+
+def normalize_paper_url(url: str) -> str:
+    """
+    arXiv的PDF链接换成摘要页（摘要页上有结构化的标题和摘要），
+    DOI（10.xxx/...、doi:10.xxx/...、dx.doi.org链接）统一为https://doi.org/链接
+    """
+    match = _DOI.match(url.strip())
+    if match:
+        return f"https://doi.org/{match.group(1)}"
+    parsed = urlparse(url.strip())
+    if parsed.netloc.endswith("arxiv.org") and parsed.path.startswith("/pdf/"):
+        paper_id = parsed.path[len("/pdf/"):].removesuffix(".pdf")
+        return f"https://arxiv.org/abs/{paper_id}"
+    return url.strip()
+
+
+def parse_html_metadata(page: str) -> dict:
+    """从HTML中提取论文标题和摘要"""
+    meta = {}
+    for tag in _META_TAG.findall(page):
+        attrs = {}
+        for key, _, double_quoted, single_quoted in _META_ATTR.findall(tag):
+            attrs[key.lower()] = double_quoted or single_quoted
+        name = (attrs.get("name") or attrs.get("property") or "").lower()
+        if name and "content" in attrs and name not in meta:
+            meta[name] = html.unescape(attrs["content"]).strip()
+
+    title = next((meta[key] for key in _TITLE_KEYS if meta.get(key)), "")
+    if not title:
+        match = _TITLE_TAG.search(page)
+        title = html.unescape(match.group(1)).strip() if match else ""
+    abstract = next((meta[key] for key in _ABSTRACT_KEYS if meta.get(key)), "")
+
+    return {
+        "title": re.sub(r'\s+', ' ', title),
+        "abstract": re.sub(r'\s+', ' ', abstract),
+        "pdf_url": meta.get("citation_pdf_url", ""),
+    }
+
+
+def html_to_text(page: str) -> str:
+    """去掉脚本、样式和标签，保留网页的可见文字"""
+    text = _HTML_TAG.sub(" ", _SCRIPT_STYLE.sub(" ", page))
+    return re.sub(r'\s+', ' ', html.unescape(text)).strip()
+
+
+def parse_pdf_metadata(text: str) -> dict:
+    """从PDF正文中粗略提取标题（第一行）和摘要"""
+    lines = [line.strip() for line in text.splitlines() if line.strip()]
+    title = lines[0][:300] if lines else ""
+    match = _PDF_ABSTRACT.search(text[:20000])
+    abstract = re.sub(r'\s+', ' ', match.group(1)).strip()[:3000] if match else ""
+    return {"title": title, "abstract": abstract}
+
+
+def fetch_paper_summary(url: str, timeout: float = PAPER_FETCH_TIMEOUT) -> dict:
+    """
+    获取论文链接对应的标题和摘要（用于相似度预打分），失败时返回空字段。
+    开启本地下载论文时复用fetch_paper的缓存，预打分下载过的论文在后续大模型分析时直接命中
+    :return: {"title": str, "abstract": str}
+    """
+    if PAPER_FETCH_ENABLED:
+        try:
+            paper = fetch_paper(url)
+            return {"title": paper["title"], "abstract": paper["abstract"]}
+        except PaperFetchError as e:
+            logger.warning(f"论文摘要获取失败: {url} | {str(e)}")
+            return {"title": "", "abstract": ""}
+    try:
+        response = http_session.get(normalize_paper_url(url), timeout=timeout, allow_redirects=True)
+        content_type = response.headers.get("Content-Type", "")
+        if response.status_code != 200 or "html" not in content_type:
+            return {"title": "", "abstract": ""}
+        meta = parse_html_metadata(response.text)
+        return {"title": meta["title"], "abstract": meta["abstract"]}
+    except RequestException as e:
+        logger.warning(f"论文摘要获取失败: {url} | {str(e)}")
+        return {"title": "", "abstract": ""}
+
+
+def _download(url: str) -> tuple[str, str, bytes]:
+    """
+    通过共享连接池下载，超过PAPER_MAX_BYTES时放弃
+    :return: (跳转后的最终链接, Content-Type, 内容)
+    """
+    try:
+        with track_stage("paper_fetch"):
+            response = http_session.get(
+                url,
+                headers=_FETCH_HEADERS,
+                timeout=stage_timeout("paper_fetch", PAPER_FETCH_TIMEOUT),
+                allow_redirects=True,
+                stream=True,
+            )
+            with response:
+                if response.status_code != 200:
+                    raise PaperFetchError(f"论文下载失败，状态码{response.status_code}: {url}")
+                chunks, size = [], 0
+                for chunk in response.iter_content(64 * 1024):
+                    size += len(chunk)
+                    if size > PAPER_MAX_BYTES:
+                        raise PaperFetchError(f"论文超过{PAPER_MAX_BYTES // 1024 // 1024}MB，已跳过: {url}")
+                    chunks.append(chunk)
+                return response.url, response.headers.get("Content-Type", ""), b"".join(chunks)
+    except RequestException as e:
+        raise PaperFetchError(f"论文下载失败: {url} | {str(e)}") from e
+
+
+def _response_encoding(content_type: str) -> str:
+    match = re.search(r'charset=([\w-]+)', content_type, flags=re.IGNORECASE)
+    return match.group(1) if match else "utf-8"
+
+
+def _get_cache():
+    return get_paper_cache(
+        getattr(Config, 'PAPER_CACHE_PATH', None),
+        getattr(Config, 'PAPER_CACHE_TTL', 7 * 24 * 3600),
+    )
+
+
+def _is_pdf(content_type: str, data: bytes) -> bool:
+    return "pdf" in content_type.lower() or data.startswith(b"%PDF")
+
+
+def _extract_pdf(data: bytes) -> str:
+    """PDF解析为CPU密集型任务，交给批量任务专用的PDF解析进程池（不占用单个分析的简历解析进程）"""
+    try:
+        return wait_result(get_batch_pdf_executor().submit(read_pdf_bytes, data), "paper_fetch")
+    except PDFReadError as e:
+        raise PaperFetchError(f"论文PDF解析失败: {str(e)}") from e
+
+
+def _fetch_and_extract(url: str) -> dict:
+    """
+    下载并提取论文，写入缓存；正文内容已在缓存中（其他链接下载过相同内容）时不再解析。
+    所有下载、解析和缓存的错误都转换为PaperFetchError（调用方退回只提供链接），预算用完时为PaperFetchTimeout
+    """
+    try:
+        return _fetch_and_extract_content(url)
+    except PaperFetchError:
+        raise
+    except DeadlineExceeded as e:
+        raise PaperFetchTimeout(f"论文下载超时: {url}") from e
+    except StageCancelled:
+        raise
+    except Exception as e:
+        raise PaperFetchError(f"论文获取失败: {url} | {type(e).__name__}: {str(e)}") from e
+
+
+def _fetch_and_extract_content(url: str) -> dict:
+    """下载并提取论文的实际流程（错误由_fetch_and_extract统一转换）"""
+    cache = _get_cache()
+    final_url, content_type, data = _download(url)
+    urls = [url] if final_url == url else [url, final_url]
+
+    meta = {"title": "", "abstract": "", "pdf_url": ""}
+    page_text = ""
+    if not _is_pdf(content_type, data):
+        # 网页（arXiv摘要页、DOI跳转后的出版社页面等）：取元数据，有PDF链接时再下载PDF获取正文
+        page = data.decode(_response_encoding(content_type), errors="replace")
+        meta = parse_html_metadata(page)
+        page_text = html_to_text(page)
+        if meta["pdf_url"]:
+            pdf_url = urljoin(final_url, meta["pdf_url"])
+            try:
+                _, content_type, pdf_data = _download(pdf_url)
+                if _is_pdf(content_type, pdf_data):
+                    data = pdf_data
+                    urls.append(pdf_url)
+            except PaperFetchError as e:
+                logger.warning(f"论文PDF下载失败，仅使用网页内容: {str(e)}")
+
+    content_hash = hashlib.sha256(data).hexdigest()
+    paper = cache.get_content(content_hash)
+    if paper is not None:
+        cache.put(urls, content_hash)
+        return paper
+
+    if _is_pdf("", data):
+        text = _extract_pdf(data)
+        pdf_meta = parse_pdf_metadata(text)
+        title, abstract = meta["title"] or pdf_meta["title"], meta["abstract"] or pdf_meta["abstract"]
+    else:
+        text, title, abstract = page_text, meta["title"], meta["abstract"]
+    paper = {
+        "title": title,
+        "abstract": abstract,
+        "text": compact_text(text, PAPER_TEXT_TOKEN_BUDGET)[0],
+        "source_url": final_url,
+    }
+    cache.put(urls, content_hash, paper)
+    return paper
+
+
+def fetch_paper(url: str) -> dict:
+    """
+    获取论文的标题、摘要和正文（识别arXiv/DOI/PDF链接），结果按内容哈希缓存；
+    同一篇论文被多个请求同时引用时只下载一次（负责下载的请求因自身预算用完而失败时，等待的请求在自己的预算内重新下载）
+    :return: {"title", "abstract", "text", "source_url"}
+    :raises PaperFetchError: 下载、解析或缓存失败（预算用完时为PaperFetchTimeout）
+    """
+    target = normalize_paper_url(url)
+    while True:
+        try:
+            paper = _get_cache().get(target)
+        except Exception as e:
+            raise PaperFetchError(f"论文缓存读取失败: {url} | {type(e).__name__}: {str(e)}") from e
+        if paper is not None:
+            PAPER_FETCHES.inc(result="cache_hit")
+            return paper
+
+        with _inflight_lock:
+            future = _inflight.get(target)
+            owner = future is None
+            if owner:
+                future = Future()
+                _inflight[target] = future
+        if owner:
+            break
+        PAPER_FETCHES.inc(result="shared")
+        try:
+            return wait_result(future, "paper_fetch")
+        except PaperFetchTimeout:
+            # 负责下载的请求预算先用完，不代表本请求也没有时间：在本请求的预算内重新下载
+            continue
+        except DeadlineExceeded as e:
+            raise PaperFetchTimeout(f"论文下载超时: {url}") from e
+
+    try:
+        paper = _fetch_and_extract(target)
+        PAPER_FETCHES.inc(result="fetched")
+        future.set_result(paper)
+        return paper
+    except BaseException as e:
+        PAPER_FETCHES.inc(result="failed")
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(target, None)
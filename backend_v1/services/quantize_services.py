@@ -0,0 +1,91 @@
+import json
+import base64
+import numpy as np
+
+# int8向量在多维表格中的文本格式前缀：int8:<base64(scale(float32) + 向量(int8))>
+INT8_PREFIX = "int8:"
+
+
+def truncate_mrl(matrix: np.ndarray, mrl_dim: int = None) -> np.ndarray:
+    """MRL截断：只保留前mrl_dim维并重新归一化（模型按MRL训练，前若干维本身就是有效的低维表示）"""
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    if mrl_dim is not None and matrix.shape[1] > mrl_dim:
+        matrix = matrix[:, :mrl_dim]
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return matrix / norms
+
+
+def quantize_int8(matrix: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    逐向量int8标量量化：每行按自身最大绝对值缩放到[-127, 127]
+    :return: (int8矩阵, 每行的缩放系数)
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    scales = np.abs(matrix).max(axis=1) / 127
+    scales[scales == 0] = 1
+    quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+
+class QuantizedMatrix:
+    """
+    int8量化后的向量矩阵。int8只用于存储和传输（体积约为float32的1/4）：
+    NumPy的整数矩阵乘法没有BLAS加速，逐块转换为float32计算反而比float32扫描更慢，
+    因此第一次计算内积时反量化出一份float32副本并缓存，之后的扫描与float32矩阵一样快，
+    代价是内存占用变为int8与float32之和（只需要低内存时可以只保存int8，不调用dot）
+    """
+    def __init__(self, quantized: np.ndarray, scales: np.ndarray):
+        self.quantized = quantized
+        self.scales = scales
+        self._dequantized = None
+
+    @classmethod
+    def from_float(cls, matrix: np.ndarray) -> "QuantizedMatrix":
+        return cls(*quantize_int8(matrix))
+
+    @property
+    def shape(self) -> tuple:
+        return self.quantized.shape
+
+    def __len__(self) -> int:
+        return len(self.quantized)
+
+    @property
+    def nbytes(self) -> int:
+        """int8存储（含缩放系数）的大小"""
+        return self.quantized.nbytes + self.scales.nbytes
+
+    @property
+    def resident_nbytes(self) -> int:
+        """当前实际占用的内存（含已缓存的float32副本）"""
+        return self.nbytes + (0 if self._dequantized is None else self._dequantized.nbytes)
+
+    def dequantize(self) -> np.ndarray:
+        """反量化为float32矩阵（结果缓存，只计算一次）"""
+        if self._dequantized is None:
+            self._dequantized = self.quantized.astype(np.float32) * self.scales[:, None]
+        return self._dequantized
+
+    def dot(self, queries: np.ndarray) -> np.ndarray:
+        """计算 queries @ 库向量.T，返回形状为 (查询数, 库向量数)"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        return queries @ self.dequantize().T
+
+
+def encode_vector_text(vector, quantization: str = "none") -> str:
+    """把向量编码为存入多维表格的文本：默认JSON数组，int8模式下为带前缀的base64"""
+    if quantization == "int8":
+        quantized, scales = quantize_int8(vector)
+        payload = scales[:1].tobytes() + quantized[0].tobytes()
+        return INT8_PREFIX + base64.b64encode(payload).decode("ascii")
+    return json.dumps(list(vector))
+
+
+def decode_vector_text(text: str) -> np.ndarray:
+    """解析多维表格中的向量文本（兼容JSON数组和int8两种格式），返回float32向量"""
+    if text.startswith(INT8_PREFIX):
+        payload = base64.b64decode(text[len(INT8_PREFIX):])
+        scale = np.frombuffer(payload[:4], dtype=np.float32)[0]
+        return np.frombuffer(payload[4:], dtype=np.int8).astype(np.float32) * scale
+    return np.array(json.loads(text), dtype=np.float32)
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+from config import Config
+from services.tracing_services import bind_current_span
+from services.deadline_services import deadline, bind_deadline, remaining, DeadlineExceeded
+from services.metrics_services import DEADLINE_EXCEEDED
+
+# 单个分析请求中各阶段（PDF解析、链接校验、获取prompt文档）共用的线程池
+_stage_executor = ThreadPoolExecutor(
+    max_workers=getattr(Config, 'STAGE_WORKER_COUNT', 32),
+    thread_name_prefix="single_stage",
+)
+
+
+class StageGroup:
+    """
+    并发执行同一请求的多个阶段，总耗时约等于最慢的阶段而不是各阶段之和。
+    任一阶段失败（或请求预算用完）时立即取消其余阶段：尚未开始的直接取消，
+    正在执行的阶段在下一次check_deadline时抛出StageCancelled
+    用法：
+        with StageGroup() as group:
+            group.submit("pdf_parse", read_pdfs_parallel, paths)
+            results = group.wait()   # {阶段名: [结果, ...]}
+    """
+    def __init__(self):
+        self.failed_stage = None
+        self._stages = []
+        self._scope = None
+        self._scope_cm = None
+
+    def __enter__(self):
+        self._scope_cm = deadline()
+        self._scope = self._scope_cm.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.cancel()
+        return self._scope_cm.__exit__(exc_type, exc, tb)
+
+    def submit(self, name: str, func, *args):
+        """提交一个阶段（同名阶段可以提交多个，如多个链接的校验）"""
+        future = _stage_executor.submit(bind_deadline(bind_current_span(func)), *args)
+        self._stages.append((name, future))
+        return future
+
+    def cancel(self) -> None:
+        self._scope.cancel()
+        for _, future in self._stages:
+            future.cancel()
+
+    def wait(self) -> dict:
+        """
+        等待所有阶段完成，返回 {阶段名: [各次提交的结果]}；
+        有阶段失败时取消其余阶段并抛出该阶段的异常（阶段名记录在failed_stage中，同时有多个阶段失败时取先提交的）
+        """
+        futures = [future for _, future in self._stages]
+        done, not_done = wait(futures, timeout=remaining(), return_when=FIRST_EXCEPTION)
+
+        for name, future in self._stages:
+            if future in done and not future.cancelled() and future.exception() is not None:
+                self.failed_stage = name
+                self.cancel()
+                raise future.exception()
+        if not_done:
+            self.failed_stage = next(name for name, future in self._stages if future in not_done)
+            self.cancel()
+            DEADLINE_EXCEEDED.inc(stage=self.failed_stage)
+            raise DeadlineExceeded(self.failed_stage)
+
+        results = {}
+        for name, future in self._stages:
+            results.setdefault(name, []).append(future.result())
+        return results
@@ -0,0 +1,178 @@
+import re
+from collections import Counter
+
+# tiktoken为可选依赖：安装了就用它做精确计数，否则使用本地估算
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# 参考文献、附录等章节标题（整行匹配），出现后的内容对评估帮助不大
+_BOILERPLATE_HEADINGS = re.compile(
+    r'^\s*(\d+\.?\s*)?(references|bibliography|appendix|appendices|acknowledg(e)?ments?|参考文献|附录|致谢)\s*:?\s*$',
+    flags=re.IGNORECASE,
+)
+# 页码行：1-4位数字（可带“Page”前缀或“/总页数”），只在每页的首行/末行才视为页码，避免误删电话号码、年份等
+_PAGE_NUMBER_LINE = re.compile(r'^\s*(page\s*)?\d{1,4}(\s*/\s*\d{1,4})?\s*$', flags=re.IGNORECASE)
+# 合并多份材料时每份至少保留的内容token数（放不下时整份舍弃，而不是只保留标题）
+MIN_DOCUMENT_TOKENS = 50
+# PDF提取文本时的分页符（extract_pdf_text用它连接各页）
+PAGE_BREAK = '\x0c'
+_CJK_CHAR = re.compile(r'[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    估算文本的token数：中文字符约1个token，其余字符约4个字符1个token
+    """
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    cjk_count = len(_CJK_CHAR.findall(text))
+    return cjk_count + (len(text) - cjk_count + 3) // 4
+
+
+def normalize_whitespace(text: str) -> str:
+    """合并连续空白、去掉断行连字符，多个空行只保留一个"""
+    text = text.replace('\r\n', '\n').replace('\x0c', '\n')
+    text = re.sub(r'(\w)-\n(\w)', r'\1\2', text)  # 英文单词跨行断字
+    text = re.sub(r'[ \t\u00a0]+', ' ', text)
+    text = re.sub(r' *\n *', '\n', text)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    return text.strip()
+
+
+def strip_boilerplate(text: str, min_keep_ratio: float = 0.3) -> str:
+    """
+    去掉页码、每页重复出现的页眉页脚，以及正文之后的参考文献/附录（需在合并空行之前调用）。
+    页码和页眉页脚只在每页的首行/末行中识别，分页依据PDF提取时的分页符，没有分页符的文本视为一页
+    :param min_keep_ratio: 只有标题出现在全文该比例之后才截断，避免误删简历前部的内容
+    """
+    pages = [page.split('\n') for page in text.split(PAGE_BREAK)]
+
+    # 每页第一个和最后一个非空行的位置（页眉页脚、页码只会出现在这里）
+    boundaries = []
+    for page in pages:
+        filled = [i for i, line in enumerate(page) if line.strip()]
+        boundaries.append({filled[0], filled[-1]} if filled else set())
+
+    # 1. 多数页面的首行/末行都出现的短行视为页眉页脚
+    repeated = set()
+    if len(pages) >= 3:
+        counts = Counter(
+            page[i].strip() for page, edges in zip(pages, boundaries) for i in edges if len(page[i].strip()) <= 80
+        )
+        repeated = {line for line, count in counts.items() if count >= max(3, len(pages) // 2)}
+
+    kept = []
+    for page_number, (page, edges) in enumerate(zip(pages, boundaries)):
+        if page_number > 0:
+            kept.append('')  # 页与页之间保留一个空行
+        for i, line in enumerate(page):
+            if i in edges and (_PAGE_NUMBER_LINE.match(line) or line.strip() in repeated):
+                continue
+            kept.append(line)
+
+    # 2. 截断参考文献/附录
+    total_length = sum(len(line) + 1 for line in kept)
+    position = 0
+    for i, line in enumerate(kept):
+        if position >= total_length * min_keep_ratio and _BOILERPLATE_HEADINGS.match(line):
+            kept = kept[:i]
+            break
+        position += len(line) + 1
+
+    return '\n'.join(kept)
+
+
+def truncate_to_budget(text: str, max_tokens: int) -> str:
+    """按token预算截断文本（保留开头部分），二分查找截断位置"""
+    if max_tokens <= 0 or estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if estimate_tokens(text[:mid]) <= max_tokens:
+            low = mid
+        else:
+            high = mid - 1
+    # 尽量在换行处截断，避免截断半句话
+    cut = text.rfind('\n', 0, low)
+    if cut > low * 0.8:
+        low = cut
+    return text[:low].rstrip() + "\n（内容过长，已截断）"
+
+
+def compact_text(text: str, max_tokens: int) -> tuple[str, dict]:
+    """
+    提示词前的文本预处理：规范空白 -> 去除样板内容 -> 按token预算截断
+    :return: (处理后的文本, token统计)
+    """
+    original_tokens = estimate_tokens(text)
+    if not text:
+        return text, {"original_tokens": 0, "final_tokens": 0, "saved_tokens": 0}
+
+    compacted = normalize_whitespace(strip_boilerplate(text))
+    compacted = truncate_to_budget(compacted, max_tokens)
+    final_tokens = estimate_tokens(compacted)
+
+    return compacted, {
+        "original_tokens": original_tokens,
+        "final_tokens": final_tokens,
+        "saved_tokens": original_tokens - final_tokens,
+    }
+
+
+def merge_texts_to_budget(documents: list[tuple[str, str]], max_tokens: int) -> tuple[str, dict]:
+    """
+    合并多份材料（简历+多篇论文）到同一个token预算内：
+    先逐份压缩，再按“均分预算、用不完的份额让给其他材料”的方式分配并截断；
+    预算连每份材料的标题和最少内容都放不下时，按原始顺序保留放得下的材料，其余整份舍弃
+    :param documents: [(材料名称, 文本), ...]
+    :return: (合并后的文本, token统计)
+    """
+    compacted = []
+    original_tokens = 0
+    for name, text in documents:
+        original_tokens += estimate_tokens(text)
+        text = normalize_whitespace(strip_boilerplate(text))
+        compacted.append((f"【材料{len(compacted) + 1}：{name}】", text, estimate_tokens(text)))
+
+    dropped = 0
+    if max_tokens > 0:
+        kept, used = [], 0
+        for header, text, tokens in compacted:
+            # 标题 + 截断提示 + 最少内容；第一份材料总是保留
+            cost = estimate_tokens(header) + 12 + min(tokens, MIN_DOCUMENT_TOKENS)
+            if kept and used + cost > max_tokens:
+                dropped += 1
+                continue
+            kept.append((header, text, tokens))
+            used += cost
+        compacted = kept
+
+    # 按文本长度从小到大分配预算，短材料用不完的份额留给长材料（先扣除标题和截断提示占用的token）
+    allocations = {}
+    remaining_budget = max(1, max_tokens - sum(estimate_tokens(header) + 12 for header, _, _ in compacted))
+    order = sorted(range(len(compacted)), key=lambda i: compacted[i][2])
+    for position, i in enumerate(order):
+        share = remaining_budget // (len(order) - position)
+        allocations[i] = min(compacted[i][2], max(1, share))
+        remaining_budget -= allocations[i]
+
+    sections = []
+    for i, (header, text, tokens) in enumerate(compacted):
+        if max_tokens > 0 and tokens > allocations[i]:
+            text = truncate_to_budget(text, allocations[i])
+        sections.append(f"{header}\n{text}")
+
+    merged = "\n\n".join(sections)
+    final_tokens = estimate_tokens(merged)
+    return merged, {
+        "original_tokens": original_tokens,
+        "final_tokens": final_tokens,
+        "saved_tokens": original_tokens - final_tokens,
+        "dropped_documents": dropped,
+    }
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import uuid
+import random
+import threading
+import contextvars
+from functools import wraps
+from contextlib import contextmanager
+from flask import request, make_response
+from config import Config
+
+# 采样率：0为关闭（默认），1为全部记录；未被采样的请求只生成request_id，不记录任何span
+TRACE_SAMPLE_RATE = float(getattr(Config, 'TRACE_SAMPLE_RATE', 0.0))
+# trace文件（每行一条OTLP JSON格式的trace，可直接导入兼容OTLP的工具）
+TRACE_FILE_PATH = getattr(Config, 'TRACE_FILE_PATH', 'traces.jsonl')
+# 单个trace最多记录的span数，避免超大批量任务占用过多内存
+MAX_SPANS_PER_TRACE = getattr(Config, 'TRACE_MAX_SPANS', 5000)
+SERVICE_NAME = "hr-resume-match"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_request_id = contextvars.ContextVar("request_id", default=None)
+_sink_lock = threading.Lock()
+
+
+class Span:
+    """一个处理阶段的耗时记录；trace为同一请求内所有span共享的状态"""
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, trace: dict, name: str, parent_id: str = "", start_ns: int = None, attributes: dict = None):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self, end_ns: int = None, error=None) -> None:
+        self.end_ns = end_ns or time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        with self.trace["lock"]:
+            if len(self.trace["spans"]) < MAX_SPANS_PER_TRACE:
+                self.trace["spans"].append(self)
+            else:
+                self.trace["dropped"] += 1
+
+    def child(self, name: str, start_ns: int = None, attributes: dict = None) -> "Span":
+        return Span(self.trace, name, self.span_id, start_ns, attributes)
+
+
+def _otlp_value(value) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_span(span: Span) -> dict:
+    return {
+        "traceId": span.trace["trace_id"],
+        "spanId": span.span_id,
+        "parentSpanId": span.parent_id,
+        "name": span.name,
+        "kind": 1,
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+        "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+    }
+
+
+def export_trace(root: Span) -> None:
+    """把一个已结束的trace以OTLP JSON格式追加写入trace文件（写入失败不影响业务）"""
+    with root.trace["lock"]:
+        spans = list(root.trace["spans"])
+        dropped = root.trace["dropped"]
+    if dropped:
+        root.set_attribute("trace.dropped_spans", dropped)
+    record = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": __name__}, "spans": [_otlp_span(span) for span in spans]}],
+        }]
+    }
+    try:
+        line = json.dumps(record, ensure_ascii=False)
+        with _sink_lock:
+            with open(TRACE_FILE_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except Exception:
+        pass
+
+
+def begin_trace(name: str, request_id: str, **attributes):
+    """按采样率开始一个trace，返回根span；未被采样时返回None"""
+    if TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    # request_id本身是32位十六进制时直接作为trace_id，便于用request_id查找trace
+    trace_id = request_id if len(request_id) == 32 and all(c in "0123456789abcdef" for c in request_id) else uuid.uuid4().hex
+    trace = {"trace_id": trace_id, "spans": [], "dropped": 0, "lock": threading.Lock()}
+    return Span(trace, name, attributes={"request_id": request_id, **attributes})
+
+
+def end_trace(root, error=None) -> None:
+    """结束根span并导出整个trace"""
+    if root is None:
+        return
+    root.end(error=error)
+    export_trace(root)
+
+
+def current_span():
+    """当前线程（上下文）中正在进行的span，未开启trace时为None"""
+    return _current_span.get()
+
+
+def get_request_id():
+    """当前请求的request_id（不在请求中时为None）"""
+    return _request_id.get()
+
+
+@contextmanager
+def use_span(parent, request_id: str = None):
+    """在其他线程中挂接到指定的span下（线程池/消费者线程不会自动继承上下文）"""
+    span_token = _current_span.set(parent)
+    request_token = _request_id.set(request_id or (parent.attributes.get("request_id") if parent else None) or _request_id.get())
+    try:
+        yield parent
+    finally:
+        _request_id.reset(request_token)
+        _current_span.reset(span_token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """在当前span下记录一个子阶段；未开启trace时直接执行，不产生任何开销"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = parent.child(name, attributes=attributes)
+    token = _current_span.set(child)
+    error = None
+    try:
+        yield child
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        _current_span.reset(token)
+        child.end(error=error)
+
+
+def record_span(parent, name: str, start_ns: int, end_ns: int = None, error=None, **attributes) -> None:
+    """补录一个已完成的span（用于进程池任务等无法在执行处记录的场景）"""
+    if parent is None:
+        return
+    parent.child(name, start_ns=start_ns, attributes=attributes).end(end_ns, error)
+
+
+def bind_current_span(func):
+    """包装提交到线程池的函数，使其在提交时的span下执行"""
+    parent = _current_span.get()
+    request_id = _request_id.get()
+    if parent is None and request_id is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with use_span(parent, request_id):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def trace_request(name: str):
+    """
+    接口装饰器：为每个请求生成request_id（优先使用请求头X-Request-ID），按采样率记录trace，
+    并在响应头中返回X-Request-ID；流式响应在输出结束后才结束trace
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+            root = begin_trace(name, request_id, **{"http.method": request.method, "http.route": request.path})
+            span_token = _current_span.set(root)
+            request_token = _request_id.set(request_id)
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException as e:
+                end_trace(root, error=e)
+                raise
+            finally:
+                _request_id.reset(request_token)
+                _current_span.reset(span_token)
+
+            response.headers["X-Request-ID"] = request_id
+            if root is not None:
+                root.set_attribute("http.status_code", response.status_code)
+                if response.is_streamed:
+                    response.call_on_close(lambda: end_trace(root))
+                else:
+                    end_trace(root)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,164 @@
+import logging
+import threading
+from collections import deque
+from config import Config
+from services.metrics_services import BATCH_QUEUE_DEPTH, LLM_POOL_ACTIVE_JOBS
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """
+    提交到共享线程池的一组任务（如一次批量上传）。
+    生产者用submit逐个提交（待执行任务过多时阻塞，起到背压作用），提交完毕后调用close，再用wait等待全部完成
+    """
+    def __init__(self, pool: "FairWorkerPool", name: str, weight: int, max_pending: int):
+        self.pool = pool
+        self.name = name
+        self.weight = max(1, int(weight))
+        self.max_pending = max(1, int(max_pending))
+        self._tasks = deque()
+        self._unfinished = 0
+        self._credits = self.weight
+        self._scheduled = False
+        self._closed = False
+        self._not_full = threading.Condition(pool._lock)
+        self._all_done = threading.Condition(pool._lock)
+
+    def submit(self, func, *args) -> None:
+        with self.pool._lock:
+            if self._closed:
+                raise RuntimeError(f"任务组{self.name}已关闭，不能继续提交")
+            while len(self._tasks) >= self.max_pending:
+                self._not_full.wait()
+            self._tasks.append((func, args))
+            self._unfinished += 1
+            BATCH_QUEUE_DEPTH.inc()
+            self.pool._schedule(self)
+
+    def cancel_pending(self) -> int:
+        """丢弃尚未开始执行的任务（正在执行的任务不受影响），返回丢弃的数量"""
+        with self.pool._lock:
+            dropped = len(self._tasks)
+            self._tasks.clear()
+            if self._scheduled:
+                self._scheduled = False
+                self.pool._ready.remove(self)
+            self._unfinished -= dropped
+            BATCH_QUEUE_DEPTH.dec(dropped)
+            self._not_full.notify_all()
+            if self._unfinished == 0:
+                self._all_done.notify_all()
+                self.pool._retire_if_finished(self)
+            return dropped
+
+    def close(self) -> None:
+        """提交完毕（已提交的任务会继续执行）"""
+        with self.pool._lock:
+            self._closed = True
+            self.pool._retire_if_finished(self)
+
+    def wait(self) -> None:
+        """等待已提交的任务全部执行完毕"""
+        with self.pool._lock:
+            while self._unfinished > 0:
+                self._all_done.wait()
+
+
+class FairWorkerPool:
+    """
+    进程内共享的长驻线程池，按任务组（Job）加权轮询调度：
+    每轮从当前任务组取weight个任务后轮到下一个任务组，因此多个批量任务同时运行时，
+    小任务不会被排在大任务的全部任务之后，大任务也能持续推进
+    """
+    def __init__(self, worker_count: int, name: str = "llm_worker"):
+        self.worker_count = worker_count
+        self.name = name
+        self._lock = threading.Lock()
+        self._work_available = threading.Condition(self._lock)
+        self._ready = deque()  # 有待执行任务的任务组，按轮询顺序排列
+        self._jobs = set()     # 尚未结束（未关闭或仍有任务在执行）的任务组
+        self._threads = []
+
+    def _ensure_started(self) -> None:
+        # 在持有锁时调用
+        if self._threads:
+            return
+        for i in range(self.worker_count):
+            t = threading.Thread(target=self._worker, name=f"{self.name}_{i + 1}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def create_job(self, name: str, weight: int = 1, max_pending: int = None) -> Job:
+        """
+        创建任务组
+        :param weight: 每轮可连续执行的任务数（权重越大分到的并发越多）
+        :param max_pending: 排队中任务数上限，默认为线程数的2倍
+        """
+        with self._lock:
+            self._ensure_started()
+            job = Job(self, name, weight, max_pending or self.worker_count * 2)
+            self._jobs.add(job)
+            LLM_POOL_ACTIVE_JOBS.set(len(self._jobs))
+            return job
+
+    def _retire_if_finished(self, job: Job) -> None:
+        # 在持有锁时调用：已关闭且没有未完成任务的任务组不再计入活跃任务组
+        if job._closed and job._unfinished == 0 and job in self._jobs:
+            self._jobs.discard(job)
+            LLM_POOL_ACTIVE_JOBS.set(len(self._jobs))
+
+    def _schedule(self, job: Job) -> None:
+        # 在持有锁时调用：任务组有新任务且不在轮询队列中时加入队尾
+        if not job._scheduled:
+            job._scheduled = True
+            job._credits = job.weight
+            self._ready.append(job)
+        self._work_available.notify()
+
+    def _next_task(self):
+        # 在持有锁时调用
+        while not self._ready:
+            self._work_available.wait()
+        job = self._ready[0]
+        task = job._tasks.popleft()
+        BATCH_QUEUE_DEPTH.dec()
+        job._not_full.notify()
+        job._credits -= 1
+        if not job._tasks:
+            job._scheduled = False
+            self._ready.popleft()
+        elif job._credits <= 0:
+            job._credits = job.weight
+            self._ready.rotate(-1)
+        return job, task
+
+    def _worker(self) -> None:
+        while True:
+            with self._lock:
+                job, (func, args) = self._next_task()
+            try:
+                func(*args)
+            except Exception as e:
+                # 任务函数应自行处理异常，这里只保证工作线程不会退出
+                logger.error(f"任务组{job.name}中的任务执行失败: {str(e)}", exc_info=True)
+            finally:
+                with self._lock:
+                    job._unfinished -= 1
+                    if job._unfinished == 0:
+                        job._all_done.notify_all()
+                        self._retire_if_finished(job)
+
+
+_llm_pool = None
+_llm_pool_lock = threading.Lock()
+
+
+def get_llm_worker_pool() -> FairWorkerPool:
+    """获取全局共享的大模型调用线程池（线程数在Config.LLM_WORKER_COUNT中配置）"""
+    global _llm_pool
+    if _llm_pool is None:
+        with _llm_pool_lock:
+            if _llm_pool is None:
+                _llm_pool = FairWorkerPool(getattr(Config, 'LLM_WORKER_COUNT', 20), name="llm_worker")
+    return _llm_pool